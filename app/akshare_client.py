@@ -2,14 +2,36 @@
 AKShare客户端 - 提供股票数据获取和K线图生成功能
 """
 import os
+import math
+import time
+import atexit
+import hashlib
 import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-import akshare as ak
 import mplfinance as mpf
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
-from .technical_indicators import TechnicalIndicators
+from .technical_indicators import TechnicalIndicators, chart_indicators
+from .incremental_indicators import IndicatorEngine, IndicatorStateStore
+from .market_indicators import MarketIndicators
+from .market_store import MarketDataStore
+from .data_cache import DataFrameCache
+from .single_flight import SingleFlight
+from .bar_resampler import resample_ohlcv, period_sessions, minute_period
+from .price_adjuster import attach_factors, apply_adjustment, normalize_adjust
+from .market_matrix import MarketMatrixStore
+from .stock_universe import StockUniverse
+from .data_providers import create_data_provider
+from .trading_calendar import TradingCalendar
+from .compact_frame import to_compact, from_compact, is_compact, day_number, index_days
+from .downsampler import downsample_ohlcv
+from .ring_buffer import BarRingBuffer, BAR_FIELDS
+from .bar_validator import validate_bars, find_gaps
 matplotlib.use('Agg')  # 使用非交互式后端，避免需要图形界面
 
 # 配置中文字体支持
@@ -24,11 +46,13 @@ except Exception as e:
 class AKShareClient:
     """AKShare数据获取和处理客户端"""
     
-    def __init__(self, image_save_path='app/static/images/charts'):
+    def __init__(self, image_save_path='app/static/images/charts', data_store_path=None, provider=None):
         """初始化客户端
         
         Args:
             image_save_path: K线图保存路径
+            data_store_path: 本地行情存储路径，默认读取环境变量 MARKET_DATA_DIR
+            provider: 行情数据源，默认按环境变量 STOCK_DATA_PROVIDER 创建（AKShare）
         """
         self.image_save_path = image_save_path
         # 确保保存路径存在
@@ -39,6 +63,65 @@ class AKShareClient:
         
         # 初始化技术指标计算器
         self.indicators = TechnicalIndicators()
+        
+        # 行情数据源（AKShare / 本地样本 / 模拟数据）
+        self.provider = provider or create_data_provider()
+        
+        # 本地行情存储，避免每次请求都下载全部历史数据
+        self.store = MarketDataStore(data_store_path)
+        # 交易日历，决定缓存过期、增量同步时机及按K线数量计算起始日期
+        self.calendar = TradingCalendar(self.store.base_path, fetcher=self.provider.fetch_trade_dates)
+        # 全市场日期×股票矩阵，与单股票存储放在同一目录下
+        self.matrix_store = MarketMatrixStore(os.path.join(self.store.base_path, 'matrix'))
+        # A股列表快照及搜索索引，常用指数一并加入索引
+        self.universe = StockUniverse(self.store.base_path, self.provider.fetch_stock_list,
+                                      extra=self.get_index_list())
+        # 本地数据尚不包含最近交易日K线时，同步结果的缓存秒数
+        self.sync_retry_seconds = int(os.getenv('SYNC_RETRY_SECONDS', '300'))
+        # 是否在缓存和本地存储中使用紧凑数据类型（float32价格、整数成交量、int32日期）
+        self.compact = os.getenv('STOCK_COMPACT_DTYPES', '0').lower() in ('1', 'true', 'yes')
+        # 预处理后数据的内存缓存，收盘后过期
+        self.cache = DataFrameCache(calendar=self.calendar)
+        # 合并相同(代码, 复权方式)的并发下载
+        self._single_flight = SingleFlight()
+        # 批量获取使用的共享线程池，限制同时访问上游的并发数
+        self.batch_workers = int(os.getenv('AKSHARE_BATCH_WORKERS', '8'))
+        self._batch_executor = ThreadPoolExecutor(max_workers=self.batch_workers,
+                                                  thread_name_prefix='akshare-batch')
+        # 分钟线环形缓冲区，按(代码, 分钟数)保存最近的K线，超过数量上限时淘汰最久未使用的
+        self.minute_capacity = int(os.getenv('MINUTE_BUFFER_BARS', '2048'))
+        self.minute_max_buffers = int(os.getenv('MINUTE_MAX_BUFFERS', '500'))
+        # 交易时段内分钟线的刷新间隔（秒）
+        self.minute_refresh = int(os.getenv('MINUTE_REFRESH_SECONDS', '60'))
+        self._minute_buffers = OrderedDict()  # (代码, 分钟数) -> (缓冲区, 最近同步时间, 上游最后一根K线的时间)
+        self._minute_lock = threading.Lock()
+        # 实时合成的已完成分钟线，由后台线程每 LIVE_BAR_FLUSH_SECONDS 秒及进程退出时批量写入本地存储
+        self.live_flush_seconds = int(os.getenv('LIVE_BAR_FLUSH_SECONDS', '300'))
+        self._live_bars = []  # [(代码, 分钟数, DataFrame)]
+        self._live_lock = threading.Lock()
+        self._live_flusher = None
+        atexit.register(self.flush_live_bars)
+        # 实时合成的当日日线，只在内存中临时使用，收盘后的增量同步取得正式日线后丢弃
+        self._provisional_daily = {}  # 代码 -> (日期, 字段值数组)
+        # 技术指标增量计算器，新K线只更新指标状态，不重新计算整段历史；
+        # 内存中保留最近使用的计算器，检查点写入本地存储目录，重启或被淘汰后从检查点继续。
+        # 检查点在距上次写入累计 INDICATOR_CHECKPOINT_BARS 根K线或 INDICATOR_CHECKPOINT_SECONDS 秒后、
+        # 以及进程退出时写入，不在每次追加时重写
+        self.indicator_max_engines = int(os.getenv('INDICATOR_MAX_ENGINES', '500'))
+        self.indicator_checkpoint_bars = int(os.getenv('INDICATOR_CHECKPOINT_BARS', '20'))
+        self.indicator_checkpoint_seconds = int(os.getenv('INDICATOR_CHECKPOINT_SECONDS', '3600'))
+        # (代码, 复权方式, 指标参数) -> (计算器, 检查点, 上次写入时的K线数, 上次写入时间)
+        self._indicator_engines = OrderedDict()
+        self.indicator_states = IndicatorStateStore(os.path.join(self.store.base_path, 'indicators'))
+        self._indicator_lock = threading.Lock()  # 只保护内存中的计算器字典
+        self._indicator_symbol_locks = {}  # 代码 -> 锁，同一股票的计算器串行更新
+        atexit.register(self.flush_indicator_states)
+        # 各股票最近一次入库时的数据校验报告
+        self._quality_reports = {}
+        # 上次同步时复权因子获取失败、下次同步需重新获取因子的股票
+        self._factor_retry = set()
+        # K线图最多绘制的K线数，超出时分桶合并，限制长区间的绘图耗时
+        self.chart_max_points = int(os.getenv('CHART_MAX_POINTS', '500'))
     
     def _check_chinese_font(self):
         """检查是否有可用的中文字体，如果没有则尝试注册系统中的中文字体"""
@@ -77,47 +160,718 @@ class AKShareClient:
         except Exception as e:
             print(f"检查中文字体失败: {e}")
 
-    def get_stock_data(self, symbol, period='daily', start_date=None, end_date=None, adjust='qfq'):
+    def get_stock_data(self, symbol, period='daily', start_date=None, end_date=None, adjust='qfq', limit=None):
         """获取股票数据
         
         Args:
             symbol: 股票代码，如"sh000001"(上证指数)，"sz000001"(平安银行)
-            period: 周期，可选 'daily'(日线), 'weekly'(周线), 'monthly'(月线)
-            start_date: 起始日期，格式"YYYY-MM-DD"，默认为90天前
+            period: 周期，可选 'daily'(日线), 'weekly'(周线), 'monthly'(月线), 'Nd'(N日线)，均由日线本地合成；
+                    'Nmin'(N分钟线，N为1/5/15/30/60)来自分钟线缓冲区
+            start_date: 起始日期，格式"YYYY-MM-DD"，默认按交易日历取最近约90根K线
             end_date: 结束日期，格式"YYYY-MM-DD"，默认为今天
-            adjust: 复权方式，可选 'qfq'(前复权), 'hfq'(后复权), None(不复权)
+            adjust: 复权方式，可选 'qfq'(前复权), 'hfq'(后复权), None或'none'(不复权)，由复权因子本地计算
+            limit: 只返回最近的limit根K线，在复权计算和周期合成之前截取
             
         Returns:
             处理后的DataFrame
         """
-        # 设置默认日期范围
-        if end_date is None:
+        try:
+            return self._query_stock_data(symbol, period, start_date, end_date, adjust, limit)
+        except Exception as e:
+            print(f"获取股票数据出错: {e}")
+            return None
+    
+    def _query_stock_data(self, symbol, period='daily', start_date=None, end_date=None, adjust='qfq', limit=None):
+        """获取股票数据，出错时抛出异常（参数同 get_stock_data）"""
+        minutes = minute_period(period)
+        
+        # 设置默认日期范围（表单提交的空字符串同样视为未指定）
+        if not end_date:
             end_date = datetime.datetime.now().strftime('%Y-%m-%d')
-        if start_date is None:
-            # 默认获取90天数据
-            start_date = (datetime.datetime.now() - datetime.timedelta(days=90)).strftime('%Y-%m-%d')
+        if not start_date:
+            # 默认获取约90根K线，分钟线按交易日历取足够的交易日后只保留最近90根
+            start_date = self.start_date_for_bars(90, period, end_date)
+            if minutes:
+                limit = limit or 90
+        if minutes:
+            return self._query_minute_data(symbol, minutes, start_date, end_date, adjust, limit)
         
-        try:
-            # 判断是指数还是个股
-            if symbol.startswith('sh00') or symbol.startswith('sz39'):
-                # 获取指数数据
-                df = ak.stock_zh_index_daily(symbol=symbol)
-            else:
-                # 获取个股数据
-                df = ak.stock_zh_a_daily(symbol=symbol, adjust=adjust)
+        # 读取本地存储并增量补齐（不复权数据及复权因子）
+        history = self._load_history(symbol, end_date)
+        if history is None:
+            return None
+        
+        # 按有序日期索引二分查找截取区间，得到零拷贝视图
+        df = self._slice_range(history, start_date, end_date)
+        if limit and period_sessions(period) == 1:
+            # 日线直接截取最近N根，后续计算只处理需要返回的行
+            df = df.iloc[-limit:]
+        # 紧凑格式只在返回前对截取后的行转换回来
+        df = from_compact(df)
+        
+        # 复权价格在本地计算，前复权以完整历史中最新的因子为基准
+        base_factor = history['Factor'].iloc[-1] if len(history) > 0 else None
+        df = apply_adjustment(df, adjust, base_factor)
+        
+        # 周线、月线等由日线本地合成
+        df = resample_ohlcv(df, period)
+        return df.iloc[-limit:] if limit else df
+    
+    @staticmethod
+    def _slice_range(df, start_date, end_date):
+        """在按日期升序的索引上用searchsorted截取[start_date, end_date]区间
+        
+        Returns:
+            原DataFrame的切片视图
+        """
+        if is_compact(df):
+            start, end = day_number(start_date), day_number(end_date)
+        else:
+            start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        i = df.index.searchsorted(start, side='left')
+        j = df.index.searchsorted(end, side='right')
+        return df.iloc[i:j]
+    
+    def start_date_for_bars(self, count, period='daily', end_date=None):
+        """按交易日历计算获取最近count根K线所需的起始日期
+        
+        Args:
+            count: K线数量
+            period: K线周期，周线、月线等按每根K线最多包含的交易日数估算
+            end_date: 结束日期，默认为今天
             
-            # 数据预处理
-            df = self._preprocess_data(df)
+        Returns:
+            起始日期字符串，格式"YYYY-MM-DD"
+        """
+        end_date = end_date or datetime.datetime.now().strftime('%Y-%m-%d')
+        per_bar = period_sessions(period)
+        if per_bar < 1:
+            # 分钟线多取一个交易日，当天尚未收盘时K线数不足一整天
+            sessions = math.ceil(count * per_bar) + 1
+        else:
+            # 非日线多取一根，保证第一根K线完整
+            sessions = count * per_bar + (per_bar if per_bar > 1 else 0)
+        return self.calendar.session_window_start(end_date, sessions).strftime('%Y-%m-%d')
+    
+    def get_batch_stock_data(self, symbols, period='daily', start_date=None, end_date=None, adjust='qfq',
+                             limit=None):
+        """并行获取多只股票数据
+        
+        Args:
+            symbols: 股票代码列表
+            period, start_date, end_date, adjust, limit: 同 get_stock_data
             
-            # 筛选日期范围
-            df = df[(df.index >= start_date) & (df.index <= end_date)]
+        Returns:
+            (frames, errors) 元组，frames为{代码: DataFrame}，errors为{代码: 错误信息}
+        """
+        futures = {
+            symbol: self._batch_executor.submit(
+                self._query_stock_data, symbol, period, start_date, end_date, adjust, limit)
+            for symbol in dict.fromkeys(symbols)
+        }
+        frames, errors = {}, {}
+        for symbol, future in futures.items():
+            try:
+                df = future.result()
+                if df is None:
+                    errors[symbol] = '无法获取股票数据'
+                else:
+                    frames[symbol] = df
+            except Exception as e:
+                errors[symbol] = str(e)
+        return frames, errors
+    
+    def _load_history(self, symbol, end_date=None):
+        """获取完整历史日线，依次读取内存缓存和本地存储，只下载最后存储日期之后的数据
+        
+        Args:
+            symbol: 股票代码
+            end_date: 请求的结束日期，本地数据已覆盖时不再同步
             
+        Returns:
+            不复权日线DataFrame，附带后复权因子列 Factor，各复权方式共用
+        """
+        df = self.cache.get(symbol)
+        if df is not None:
             return df
         
+        if end_date is not None and pd.Timestamp(end_date) < self.calendar.latest_closed_session():
+            # 历史区间可能已被本地数据覆盖，此时不必同步，也不放入缓存
+            stored = self._normalize_frame(self.store.load(symbol, 'none'))
+            last_date = from_compact(stored.iloc[-1:]).index[-1] if stored is not None and len(stored) > 0 else None
+            if last_date is not None and last_date >= pd.Timestamp(end_date):
+                return attach_factors(stored, self.store.load(symbol, 'hfq_factor'))
+        
+        # 并发请求同一数据时只有一个线程访问上游，其余线程等待并共享结果；合并的总是同步到最新交易日的调用，
+        # 与请求的结束日期无关
+        return self._single_flight.do(symbol, self._sync_history, symbol)
+    
+    def refresh_history(self, symbol):
+        """跳过内存缓存，读取本地存储并增量同步到最近交易日（收盘后预取使用）
+        
+        Returns:
+            同 _load_history，同步结果同时写入缓存
+        """
+        return self._single_flight.do(symbol, self._sync_history, symbol)
+    
+    def _sync_history(self, symbol):
+        """读取本地存储并增量同步到最新交易日，结果写入存储和缓存"""
+        stored = self._normalize_frame(self.store.load(symbol, 'none'))
+        latest_session = self.calendar.latest_closed_session()
+        has_stored = stored is not None and len(stored) > 0
+        stored_is_fresh = has_stored and MarketDataStore.is_fresh(stored, latest_session)
+        if stored_is_fresh and symbol not in self._factor_retry:
+            df = self._with_provisional(symbol, attach_factors(stored, self.store.load(symbol, 'hfq_factor')))
+            self.cache.put(symbol, df)
+            return df
+        
+        try:
+            if not has_stored:
+                bars = self._normalize_frame(self._ingest_daily(symbol, self.provider.fetch_daily(symbol)))
+            elif stored_is_fresh:
+                # 日线已是最新，只需重新获取上次失败的复权因子
+                bars = stored
+            else:
+                # 不复权数据不会因除权除息改变，只需获取最后存储日期之后的K线
+                last_date = from_compact(stored.iloc[-1:]).index[-1]
+                raw = self.provider.fetch_daily(symbol, start_date=last_date)
+                fresh = self._ingest_daily(symbol, raw) if raw is not None and len(raw) > 0 else None
+                bars = MarketDataStore.merge(stored, self._normalize_frame(fresh))
         except Exception as e:
-            print(f"获取股票数据出错: {e}")
+            if has_stored:
+                print(f"增量同步 {symbol} 失败，使用本地数据: {e}")
+                df = self._with_provisional(symbol, attach_factors(stored, self.store.load(symbol, 'hfq_factor')))
+                # 短时间缓存旧数据，避免上游故障时每个请求都重试
+                retry_at = datetime.datetime.now() + datetime.timedelta(seconds=60)
+                self.cache.put(symbol, df, expires_at=retry_at)
+                return df
+            raise
+        
+        # 复权因子与日线来自不同接口，因子获取失败不影响日线回退链取得的结果
+        factors, factors_ok = self._sync_factors(symbol)
+        if bars is not stored:
+            self.store.save(symbol, 'none', bars)
+            report = self._quality_reports.setdefault(symbol, {})
+            report.update(find_gaps(bars.index, self.calendar.sessions))
+        df = self._with_provisional(symbol, attach_factors(bars, factors))
+        if factors_ok and MarketDataStore.is_fresh(bars, latest_session):
+            self.cache.put(symbol, df)
+        else:
+            # 上游尚未发布最近交易日的K线（或当日停牌），或复权因子获取失败，只短时间缓存，稍后重新同步
+            retry_at = datetime.datetime.now() + datetime.timedelta(seconds=self.sync_retry_seconds)
+            self.cache.put(symbol, df, expires_at=retry_at)
+        return df
+    
+    def _sync_factors(self, symbol):
+        """获取后复权因子并写入本地存储
+
+        获取失败时沿用本地已存的因子（没有时按1处理，即不复权），并记录该股票，
+        下次同步时即使日线已是最新也会重新获取因子。
+
+        Returns:
+            (复权因子DataFrame或None, 是否获取成功)
+        """
+        try:
+            factors = self.provider.fetch_factors(symbol)
+        except Exception as e:
+            print(f"获取 {symbol} 复权因子失败，暂时沿用本地因子: {e}")
+            self._factor_retry.add(symbol)
+            return self.store.load(symbol, 'hfq_factor'), False
+        self._factor_retry.discard(symbol)
+        if factors is not None:
+            self.store.save(symbol, 'hfq_factor', factors)
+        return factors, True
+    
+    def _ingest_daily(self, symbol, raw):
+        """整理并校验新下载的日线，只在入库时执行一次"""
+        df, report = validate_bars(self._preprocess_data(raw), self.calendar.sessions)
+        report['checked_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        self._quality_reports[symbol] = report
+        dropped = report['rows'] - (len(df) if df is not None else 0)
+        if dropped or report['ohlc_repaired']:
+            print(f"{symbol} 日线校验: 删除{dropped}行，修正High/Low {report['ohlc_repaired']}行")
+        return df
+    
+    def get_quality_report(self, symbol):
+        """返回数据校验报告：最近一次入库时清洗的行数及当前历史中缺失的交易日"""
+        history = self._load_history(symbol)
+        if history is None:
+            return None
+        report = dict(self._quality_reports.get(symbol, {}))
+        if 'missing_sessions' not in report:
+            report.update(find_gaps(history.index, self.calendar.sessions))
+        report['bars'] = len(history)
+        return report
+    
+    def _query_minute_data(self, symbol, minutes, start_date=None, end_date=None, adjust='qfq', limit=None):
+        """从分钟线缓冲区读取数据，不复权时列数据直接引用缓冲区，调用方不应修改"""
+        df = self._minute_buffer(symbol, minutes).to_frame()
+        if start_date or end_date:
+            # 结束日期包含当天全部分钟线
+            i = df.index.searchsorted(pd.Timestamp(start_date), side='left') if start_date else 0
+            j = (df.index.searchsorted(pd.Timestamp(end_date) + pd.Timedelta(days=1), side='left')
+                 if end_date else len(df))
+            df = df.iloc[i:j]
+        if limit:
+            df = df.iloc[-limit:]
+        
+        # 复权因子取自日线历史，前复权同样以最新因子为基准
+        if normalize_adjust(adjust) and len(df) > 0:
+            history = self._load_history(symbol)
+            factors = history[['Factor']].rename(columns={'Factor': 'hfq_factor'})
+            df = apply_adjustment(attach_factors(df, factors), adjust, history['Factor'].iloc[-1])
+        return df
+    
+    def _minute_buffer(self, symbol, minutes):
+        """返回分钟线缓冲区，交易时段内超过刷新间隔、或收盘后尚未同步时先增量同步"""
+        key = (symbol, minutes)
+        with self._minute_lock:
+            entry = self._minute_buffers.get(key)
+            if entry is not None:
+                self._minute_buffers.move_to_end(key)
+        if entry is not None and self._minute_is_fresh(entry[1]):
+            return entry[0]
+        return self._single_flight.do(('minute', symbol, minutes), self._sync_minute, symbol, minutes)
+    
+    def _minute_is_fresh(self, synced_at, now=None):
+        now = now or datetime.datetime.now()
+        if self.calendar.is_trading_time(now):
+            return (now - synced_at).total_seconds() < self.minute_refresh
+        # 非交易时段，最近一次收盘之后同步过即可
+        return synced_at >= self.calendar.last_session_close(now)
+    
+    def _sync_minute(self, symbol, minutes):
+        """下载最近的分钟线并合并到缓冲区，与实时合成的K线时间相同时以上游为准
+        
+        新建缓冲区时先读回本地存储的实时分钟线（{代码}_{N}min）；缓冲区中有上次同步之后实时合成的K线时，
+        与上游数据合并后重建缓冲区；否则只把缓冲区最后一根之后的K线追加到缓冲区。
+        """
+        key = (symbol, minutes)
+        with self._minute_lock:
+            entry = self._minute_buffers.get(key)
+        synced_at = datetime.datetime.now()
+        df = self._preprocess_minute(self.provider.fetch_minute(symbol, minutes))
+        upstream_last = df.index.values[-1] if len(df) > 0 else (entry[2] if entry is not None else None)
+        
+        live = None
+        if entry is None:
+            live = self.store.load(symbol, f"{minutes}min")
+            if live is not None:
+                live = live[list(BAR_FIELDS)].astype(np.float64)
+        elif entry[0].last_time is not None and (entry[2] is None or entry[0].last_time > entry[2]):
+            live = entry[0].to_frame().copy()
+        if live is not None and len(live) > 0:
+            buffer = BarRingBuffer(max(self.minute_capacity, 1))
+            df = pd.concat([live, df]) if len(df) > 0 else live
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+        else:
+            buffer = entry[0] if entry is not None else BarRingBuffer(max(self.minute_capacity, 1))
+        self.append_minute_bars(buffer, df)
+        
+        with self._minute_lock:
+            self._minute_buffers[key] = (buffer, synced_at, upstream_last)
+            self._minute_buffers.move_to_end(key)
+            while len(self._minute_buffers) > self.minute_max_buffers:
+                self._minute_buffers.popitem(last=False)
+        return buffer
+    
+    def on_live_bars(self, kind, symbols, times, values, final):
+        """接收实时合成的K线（BarAggregator回调）
+        
+        分钟线只追加或更新缓冲区中上游最后一根K线之后的K线，不改变同步时间，下次同步时上游K线覆盖
+        同一时间的实时K线；上游没有的已完成分钟线由后台线程批量写入本地存储。已完成的日线作为临时日线
+        附加在历史之后，不写入存储，收盘后的增量同步取得上游正式日线后即被取代。
+        
+        Args:
+            kind: 分钟数或'daily'
+            symbols: 代码列表
+            times: K线时间数组
+            values: 形状为 (字段数, K线数) 的数组，字段顺序同 BAR_FIELDS
+            final: K线是否已完成
+        """
+        if kind == 'daily':
+            if final:
+                for i, symbol in enumerate(symbols):
+                    self._provisional_daily[symbol] = (pd.Timestamp(times[i]).normalize(), values[:, i].copy())
+                    # 下次读取时重新同步，上游尚未发布当日日线时附加临时日线
+                    self.cache.invalidate(symbol)
+            return
+        
+        finished = []
+        for i, symbol in enumerate(symbols):
+            with self._minute_lock:
+                entry = self._minute_buffers.get((symbol, kind))
+            if entry is None and not final:
+                continue
+            if entry is not None and entry[2] is not None and times[i] <= entry[2]:
+                # 上游已有该时间的K线，不覆盖也不写入存储
+                continue
+            bar = pd.DataFrame(values[:, i:i + 1].T, index=pd.DatetimeIndex(times[i:i + 1], name='Date'),
+                               columns=list(BAR_FIELDS))
+            if entry is not None:
+                self.append_minute_bars(entry[0], bar)
+            if final:
+                finished.append((symbol, kind, bar))
+        if finished:
+            with self._live_lock:
+                self._live_bars.extend(finished)
+                if self._live_flusher is None:
+                    self._live_flusher = threading.Thread(target=self._live_flush_loop, name='live-bar-flush',
+                                                          daemon=True)
+                    self._live_flusher.start()
+    
+    def _live_flush_loop(self):
+        """定时写入已完成的实时分钟线，与是否有新K线无关"""
+        while True:
+            time.sleep(self.live_flush_seconds)
+            try:
+                self.flush_live_bars()
+            except Exception as e:
+                print(f"写入实时分钟线出错: {e}")
+    
+    def flush_live_bars(self):
+        """把已完成的实时分钟线合并写入本地存储（{代码}_{N}min.parquet），建立分钟线缓冲区时读回"""
+        with self._live_lock:
+            pending, self._live_bars = self._live_bars, []
+        groups = {}
+        for symbol, minutes, bar in pending:
+            groups.setdefault((symbol, minutes), []).append(bar)
+        for (symbol, minutes), bars in groups.items():
+            kind = f"{minutes}min"
+            fresh = pd.concat(bars)
+            fresh = fresh[~fresh.index.duplicated(keep='last')].sort_index()
+            self.store.save(symbol, kind, MarketDataStore.merge(self.store.load(symbol, kind), fresh))
+    
+    def _with_provisional(self, symbol, df):
+        """在历史之后附加实时合成的临时日线，只在历史正好截止于其上一交易日时附加
+        
+        历史已包含该日（上游正式日线已同步）时丢弃临时日线。
+        """
+        entry = self._provisional_daily.get(symbol)
+        if entry is None or df is None or len(df) == 0:
+            return df
+        day, values = entry
+        last_date = from_compact(df.iloc[-1:]).index[-1]
+        if last_date >= day:
+            self._provisional_daily.pop(symbol, None)
+            return df
+        if last_date != self.calendar.previous_session(day):
+            return df
+        bar = self._normalize_frame(pd.DataFrame([values], index=pd.DatetimeIndex([day], name='Date'),
+                                                 columns=list(BAR_FIELDS)))
+        bar['Factor'] = df['Factor'].iloc[-1]
+        return pd.concat([df, bar[df.columns]])
+    
+    @staticmethod
+    def append_minute_bars(buffer, df):
+        """将分钟线追加到缓冲区：与最后一根时间相同的K线更新，之后的K线追加"""
+        if df is None or len(df) == 0:
+            return
+        times = df.index.values
+        values = df[list(BAR_FIELDS)].values.T
+        last_time = buffer.last_time
+        if last_time is not None:
+            i = np.searchsorted(times, last_time, side='left')
+            if i < len(times) and times[i] == last_time:
+                # 最后一根K线可能是未完成的K线，用最新数据覆盖
+                buffer.update_last(values[:, i])
+                i += 1
+            times, values = times[i:], values[:, i:]
+        if len(times) > 0:
+            buffer.extend(times, values)
+    
+    @staticmethod
+    def _preprocess_minute(df):
+        """整理并校验分钟线：以K线结束时间为Date索引，字段转换为float64"""
+        if df is None or len(df) == 0:
+            return pd.DataFrame(columns=list(BAR_FIELDS), index=pd.DatetimeIndex([], name='Date'), dtype=float)
+        df = df.rename(columns={'day': 'Date', 'date': 'Date', 'open': 'Open', 'high': 'High', 'low': 'Low',
+                                'close': 'Close', 'volume': 'Volume'})
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = df.set_index('Date').sort_index()
+        df = df[list(BAR_FIELDS)].apply(pd.to_numeric, errors='coerce').astype(np.float64)
+        # 分钟线不按交易日历检查，只去重并检查价格和OHLC关系
+        df, _ = validate_bars(df)
+        return df
+    
+    def build_market_matrix(self, adjust='qfq', symbols=None):
+        """由本地存储构建全市场矩阵，不访问上游
+        
+        Args:
+            adjust: 复权方式
+            symbols: 股票代码列表，默认为本地已存储的全部股票
+            
+        Returns:
+            新构建的 MarketMatrix
+        """
+        if symbols is None:
+            symbols = self.store.list_symbols('none')
+        frames = {}
+        for symbol in symbols:
+            bars = self.store.load(symbol, 'none')
+            if bars is None or len(bars) == 0:
+                continue
+            history = attach_factors(from_compact(bars), self.store.load(symbol, 'hfq_factor'))
+            frames[symbol] = apply_adjustment(history, adjust)
+        return self.matrix_store.build(frames)
+    
+    def open_market_matrix(self, build=False):
+        """以内存映射方式打开全市场矩阵
+        
+        Args:
+            build: 尚未构建且本地已有数据时是否由本地存储构建（并发调用只构建一次）
+        
+        Returns:
+            MarketMatrix，尚未构建（且未能构建）时返回None
+        """
+        matrix = self.matrix_store.open()
+        if matrix is None and build and self.store.list_symbols('none'):
+            matrix = self._single_flight.do('market_matrix', self.build_market_matrix)
+        return matrix
+    
+    def get_market_indicators(self, indicators=None, start_date=None, end_date=None, last=None):
+        """在全市场矩阵上一次性计算所有股票的技术指标，用于全市场扫描
+        
+        Args:
+            indicators: 指标名称列表或 {名称: 参数字典}，为None时计算全部指标
+            start_date: 开始日期，指标从该日起的K线开始计算（含预热期）
+            end_date: 结束日期
+            last: 只返回最后last个日期的结果，如扫描最新一天时传1
+        
+        Returns:
+            (日期数组, 股票代码数组, {列名: (日期数, 股票数) 的float32矩阵})，本地没有数据、构建矩阵或计算失败时返回None
+        
+        Raises:
+            ValueError: 指标名称或参数不支持
+        """
+        TechnicalIndicators.normalize_indicators(indicators)
+        try:
+            # 首次使用时由本地存储构建，之后由收盘后预取重建
+            matrix = self.open_market_matrix(build=True)
+            if matrix is None:
+                return None
+            calculator, dates, symbols = MarketIndicators.from_matrix(matrix, start_date, end_date)
+            results = calculator.calculate(indicators, last)
+        except Exception as e:
+            print(f"计算全市场技术指标出错: {e}")
+            return None
+        if last is not None:
+            dates = dates[max(len(dates) - int(last), 0):]
+        return dates, symbols, results
+        
+    def get_data_version(self, symbol, period='daily'):
+        """返回数据版本标识，由最后一根K线的日期、收盘价、成交量和最新复权因子组成，用于ETag和增量同步
+        
+        收盘价和成交量用于区分同一日期被修订的K线（如实时合成的日线被收盘后的正式数据替换）。
+        分钟线另外附加缓冲区最后一根K线的时间及其收盘价和成交量（未完成的K线会更新）。
+        
+        Returns:
+            版本字符串，获取失败时返回None
+        """
+        try:
+            history = self._load_history(symbol)
+            if history is None or len(history) == 0:
+                return None
+            last = from_compact(history.iloc[-1:])
+            version = (f"{last.index[-1]:%Y-%m-%d}:{last['Close'].iloc[-1]:.6g}:{last['Volume'].iloc[-1]:.0f}:"
+                       f"{history['Factor'].iloc[-1]:.6g}")
+            minutes = minute_period(period)
+            if minutes:
+                times, values = self._minute_buffer(symbol, minutes).window(1)
+                if len(times) == 0:
+                    return None
+                close, volume = values[BAR_FIELDS.index('Close'), -1], values[BAR_FIELDS.index('Volume'), -1]
+                version += f":{pd.Timestamp(times[-1]):%Y-%m-%d %H:%M}:{close:.6g}:{volume:.0f}"
+            return version
+        except Exception as e:
+            print(f"获取数据版本出错: {e}")
             return None
     
+    def get_indicators(self, symbol, adjust='qfq', indicators=None):
+        """获取基于完整日线历史计算的技术指标，按数据版本缓存到下一次收盘
+        
+        Args:
+            symbol: 股票代码
+            adjust: 复权方式
+            indicators: 指标名称列表或 {名称: 参数字典}，为None时计算全部指标
+        
+        Returns:
+            以日期为索引的技术指标DataFrame，获取失败时返回None
+        """
+        adjust = normalize_adjust(adjust)
+        version = self.get_data_version(symbol)
+        if version is None:
+            return None
+        requested = TechnicalIndicators.normalize_indicators(indicators)
+        key = ('indicators', symbol, adjust, version, repr(requested))
+        indicators_df = self.cache.get(key)
+        if indicators_df is not None:
+            return indicators_df
+        # 请求的指标均为默认参数且已缓存全部指标（如收盘后预取）时直接取其中的列
+        defaults = TechnicalIndicators.normalize_indicators()
+        full_df = self.cache.get(('indicators', symbol, adjust, version, repr(defaults)))
+        if full_df is not None and all(dict(defaults)[name] == params for name, params in requested):
+            indicators_df = full_df[[c for name, params in requested
+                                     for c in TechnicalIndicators.indicator_columns(name, params)]]
+        else:
+            indicators_df = self._indicator_frame(symbol, adjust, requested)
+            if indicators_df is None:
+                return None
+        self.cache.put(key, indicators_df)
+        return indicators_df
+    
+    def _indicator_frame(self, symbol, adjust, requested):
+        """计算完整历史的技术指标：已有计算器（内存或本地检查点）且历史只在末尾追加了新K线时逐根增量更新，否则重新建立
+        
+        同一股票的请求按股票加锁串行处理，读取检查点等磁盘操作不阻塞其他股票。
+        """
+        history = self._load_history(symbol)
+        base_factor = history['Factor'].iloc[-1]
+        state_key = (symbol, adjust, repr(requested))
+        with self._symbol_indicator_lock(symbol):
+            with self._indicator_lock:
+                entry = self._indicator_engines.get(state_key)
+            if entry is None:
+                loaded = self.indicator_states.load(*state_key)
+                if loaded is not None:
+                    entry = (*loaded, loaded[1]['rows'], time.monotonic())
+            if entry is not None:
+                engine, checkpoint, saved_rows, saved_at = entry
+                fresh = self._bars_since_checkpoint(history, checkpoint, adjust, base_factor)
+                if fresh is not None:
+                    try:
+                        engine.append(apply_adjustment(from_compact(fresh), adjust, base_factor))
+                        self._keep_indicator_engine(state_key, engine, history, saved_rows, saved_at)
+                        return engine.frame()
+                    except Exception as e:
+                        print(f"增量更新技术指标出错: {e}")
+                with self._indicator_lock:
+                    self._indicator_engines.pop(state_key, None)
+            
+            df = apply_adjustment(from_compact(history), adjust, base_factor)
+            engine = IndicatorEngine.from_history(df, dict(requested))
+            if engine is None:
+                return None
+            self._keep_indicator_engine(state_key, engine, history)
+            return engine.frame()
+    
+    def _symbol_indicator_lock(self, symbol):
+        with self._indicator_lock:
+            return self._indicator_symbol_locks.setdefault(symbol, threading.Lock())
+    
+    def _keep_indicator_engine(self, state_key, engine, history, saved_rows=0, saved_at=None):
+        """将计算器放入内存LRU，距上次写入的K线数或时间达到间隔时写入本地检查点，调用方需持有该股票的锁
+        
+        最后一根为实时合成的临时日线时不写检查点：正式日线到来后该检查点必然失效
+        """
+        checkpoint = self._indicator_checkpoint(history)
+        due = (saved_at is None or checkpoint['rows'] - saved_rows >= self.indicator_checkpoint_bars
+               or time.monotonic() - saved_at >= self.indicator_checkpoint_seconds)
+        if due and not self._is_provisional_checkpoint(state_key[0], checkpoint):
+            self.indicator_states.save(*state_key, engine, checkpoint)
+            saved_rows, saved_at = checkpoint['rows'], time.monotonic()
+        with self._indicator_lock:
+            self._indicator_engines[state_key] = (engine, checkpoint, saved_rows, saved_at)
+            self._indicator_engines.move_to_end(state_key)
+            while len(self._indicator_engines) > self.indicator_max_engines:
+                self._indicator_engines.popitem(last=False)
+    
+    def _is_provisional_checkpoint(self, symbol, checkpoint):
+        provisional = self._provisional_daily.get(symbol)
+        return provisional is not None and checkpoint['day'] == day_number(provisional[0])
+    
+    def flush_indicator_states(self):
+        """写入内存中尚未保存最新进度的计算器检查点（进程退出时调用）"""
+        with self._indicator_lock:
+            entries = list(self._indicator_engines.items())
+        for state_key, (engine, checkpoint, saved_rows, _) in entries:
+            if checkpoint['rows'] == saved_rows or self._is_provisional_checkpoint(state_key[0], checkpoint):
+                continue
+            with self._symbol_indicator_lock(state_key[0]):
+                with self._indicator_lock:
+                    current = self._indicator_engines.get(state_key)
+                if current is None or current[1] is not checkpoint:
+                    continue
+                self.indicator_states.save(*state_key, engine, checkpoint)
+                with self._indicator_lock:
+                    self._indicator_engines[state_key] = (engine, checkpoint, checkpoint['rows'], time.monotonic())
+    
+    @staticmethod
+    def _indicator_checkpoint(history):
+        """记录计算器已处理到的位置：K线数、最后一根的日期及不复权数据和复权因子"""
+        return {
+            'rows': len(history),
+            'day': int(index_days(history.index[-1:])[0]),
+            'last_bar': history.iloc[-1].values.astype(np.float64),
+            'base_factor': history['Factor'].iloc[-1]
+        }
+    
+    @staticmethod
+    def _bars_since_checkpoint(history, checkpoint, adjust, base_factor):
+        """返回检查点之后追加的K线；已处理的部分有变化（前复权基准因子变化、最后一根被修订等）时返回None"""
+        rows = checkpoint['rows']
+        if len(history) < rows or (adjust == 'qfq' and base_factor != checkpoint['base_factor']):
+            return None
+        if int(index_days(history.index[rows - 1:rows])[0]) != checkpoint['day']:
+            return None
+        if not np.array_equal(history.iloc[rows - 1].values.astype(np.float64), checkpoint['last_bar']):
+            return None
+        return history.iloc[rows:]
+    
+    def chart_title(self, symbol):
+        """K线图标题，包含股票名称和代码"""
+        stock_name = self.get_stock_name(symbol) or symbol
+        return f"{stock_name} ({symbol}) K线图"
+    
+    def render_chart(self, symbol, period='daily', adjust='qfq', days=60, start_date=None, end_date=None,
+                     show_volume=True, mav=(5, 20), max_points=None, indicators=None):
+        """获取数据并生成K线图，参数和数据版本相同的图表直接复用已生成的文件
+        
+        Args:
+            symbol, period, adjust, start_date, end_date: 同 get_stock_data
+            days, show_volume, mav, max_points: 同 generate_kline_chart
+            indicators: 要显示的技术指标列表，如 ['MACD', 'RSI']
+            
+        Returns:
+            图表文件路径，失败时返回None
+        """
+        indicators = sorted(set(indicators or []))
+        filename = None
+        version = self.get_data_version(symbol, period)
+        if version is not None:
+            key = '|'.join(str(part) for part in (symbol, period, normalize_adjust(adjust), days, start_date,
+                                                  end_date, show_volume, mav, max_points, indicators, version))
+            filename = f"kline_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.png"
+            file_path = os.path.join(self.image_save_path, filename)
+            if os.path.exists(file_path):
+                return file_path
+        
+        # 未指定起始日期时按交易日历只获取最近N根K线所需的区间
+        if not start_date:
+            start_date = self.start_date_for_bars(days, period, end_date)
+        df = self.get_stock_data(symbol, period, start_date=start_date, end_date=end_date,
+                                 adjust=adjust, limit=days)
+        if df is None:
+            return None
+        
+        # 日线使用完整历史上预先计算的指标，避免图表起始处的指标空值
+        indicators_df = None
+        if indicators and period_sessions(period) == 1:
+            indicators_df = self.get_indicators(symbol, adjust, chart_indicators(indicators))
+        return self.generate_kline_chart(df, title=self.chart_title(symbol), days=days, show_volume=show_volume,
+                                         mav=mav, filename=filename, show_indicators=indicators or None,
+                                         max_points=max_points, indicators_df=indicators_df)
+    
+    def _normalize_frame(self, df):
+        """按配置转换为紧凑格式或标准格式"""
+        return to_compact(df) if self.compact else from_compact(df)
+    
+    def cache_stats(self):
+        """返回内存缓存及请求合并统计信息"""
+        stats = self.cache.stats()
+        stats['single_flight'] = self._single_flight.stats()
+        return stats
+    
     def _preprocess_data(self, df):
         """预处理原始数据为mplfinance所需格式
         
@@ -160,7 +914,7 @@ class AKShareClient:
     
     def generate_kline_chart(self, df, title=None, days=60, show_volume=True, 
                             mav=(5, 20), style='binance', filename=None,
-                            show_indicators=None):
+                            show_indicators=None, max_points=None, indicators_df=None):
         """生成K线图
         
         Args:
@@ -172,6 +926,8 @@ class AKShareClient:
             style: 图表样式
             filename: 保存的文件名，默认使用随机名称
             show_indicators: 要显示的技术指标列表，如 ['MACD', 'RSI', 'BOLL']
+            max_points: 最多绘制的K线数，超出时相邻K线分桶合并，默认取 CHART_MAX_POINTS
+            indicators_df: 预先计算的日线技术指标，覆盖绘图区间且未降采样时直接使用
             
         Returns:
             生成的图表文件路径
@@ -187,6 +943,13 @@ class AKShareClient:
             else:
                 plot_data = df
             
+            # 长区间分桶合并，绘图耗时与区间长度无关
+            sampled = downsample_ohlcv(plot_data, max_points or self.chart_max_points)
+            if sampled is not plot_data or (
+                    indicators_df is not None and not plot_data.index.isin(indicators_df.index).all()):
+                indicators_df = None
+            plot_data = sampled
+            
             # 设置文件名
             if filename is None:
                 # 使用时间戳生成唯一文件名
@@ -217,8 +980,12 @@ class AKShareClient:
                 show_indicators = None if not show_indicators.strip() else show_indicators.split(',')
             
             if show_indicators and isinstance(show_indicators, list):
-                # 计算技术指标
-                indicators_df = TechnicalIndicators.calculate_all_indicators(plot_data)
+                # 计算技术指标，有预先计算的结果时按绘图区间对齐
+                if indicators_df is not None:
+                    indicators_df = indicators_df.reindex(plot_data.index)
+                else:
+                    indicators_df = TechnicalIndicators.calculate_indicators(plot_data,
+                                                                             chart_indicators(show_indicators))
                 if indicators_df is not None:
                     if 'MACD' in show_indicators:
                         # 添加MACD
@@ -298,9 +1065,11 @@ class AKShareClient:
                     if hasattr(ax, 'xaxis') and ax.xaxis.label.get_text():
                         ax.xaxis.label.set_fontproperties(FontProperties(family=plt.rcParams['font.sans-serif'][0]))
             
-            # 保存图表
-            fig.savefig(file_path, dpi=100, bbox_inches='tight')
+            # 保存图表，先写临时文件再替换，避免并发请求读到未写完的图片
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            fig.savefig(tmp_path, dpi=100, bbox_inches='tight', format='png')
             plt.close(fig)  # 关闭图表释放内存
+            os.replace(tmp_path, file_path)
             
             return file_path
             
@@ -315,22 +1084,25 @@ class AKShareClient:
             market: 市场类型，默认为'A股'
             
         Returns:
-            股票列表DataFrame
+            股票列表DataFrame，读取本地快照，过期后在后台刷新
         """
         try:
             if market == 'A股':
-                # 获取A股股票列表
-                stock_list = ak.stock_zh_a_spot()
-                # 提取代码和名称
-                stock_list = stock_list[['代码', '名称']].rename(
-                    columns={'代码': 'code', '名称': 'name'})
-                return stock_list
+                return self.universe.get_list()
             else:
                 return None
         except Exception as e:
             print(f"获取股票列表出错: {e}")
             return None
     
+    def search_stocks(self, query, limit=20):
+        """按代码、名称或拼音首字母前缀搜索股票和常用指数"""
+        return self.universe.search(query, limit)
+    
+    def get_stock_name(self, symbol):
+        """返回股票或指数名称，未知时返回None"""
+        return self.universe.get_name(symbol)
+    
     def get_index_list(self):
         """获取常用指数列表
         
@@ -0,0 +1,228 @@
+"""
+实时K线合成 - 由实时行情快照在本地同时合成多个周期的分钟线及当日日线
+
+所有股票的状态保存在按股票编号排列的NumPy数组中，每次快照对所有股票一次性向量化更新。
+分钟线按新浪的标注方式以K线结束时间为时间戳（如60分钟线为10:30、11:30、14:00、15:00），
+午间休市及收盘后的行情并入上一根K线。
+股票在交易中途首次出现时，只以首个快照作为成交量和价格的基准，当时所在的K线只包含部分行情，不回调；
+当日第一根K线除外，其开高低量与行情中的当日今开、最高、最低、累计成交量一致。
+"""
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from .bar_resampler import MINUTE_PERIODS, SESSION_MINUTES
+from .ring_buffer import BAR_FIELDS
+
+# 上午、下午交易时段的开始时间（自零点起的分钟数），每段120分钟
+MORNING_START = 9 * 60 + 30
+AFTERNOON_START = 13 * 60
+HALF_SESSION = SESSION_MINUTES // 2
+
+
+def trading_minute(now):
+    """当日已经过的交易分钟数（可含小数），开盘前为0，午间休市为120，收盘后为240"""
+    minute = now.hour * 60 + now.minute + now.second / 60
+    if minute <= MORNING_START:
+        return 0.0
+    if minute <= MORNING_START + HALF_SESSION:
+        return minute - MORNING_START
+    if minute <= AFTERNOON_START:
+        return float(HALF_SESSION)
+    return min(HALF_SESSION + minute - AFTERNOON_START, float(SESSION_MINUTES))
+
+
+def bar_end_time(day, index, minutes):
+    """返回当日第index根（从1开始）minutes分钟K线的结束时间"""
+    end = index * minutes
+    offset = MORNING_START + end if end <= HALF_SESSION else AFTERNOON_START + end - HALF_SESSION
+    return pd.Timestamp(day) + pd.Timedelta(minutes=offset)
+
+
+class _BarState:
+    """单一周期所有股票的未完成K线，key = 日期序号 * 1000 + 当日K线序号，0表示没有未完成的K线"""
+
+    def __init__(self, capacity):
+        self.key = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((len(BAR_FIELDS), capacity), dtype=np.float64)
+        self.volume_start = np.zeros(capacity, dtype=np.float64)  # K线开始时的当日累计成交量
+        self.partial = np.zeros(capacity, dtype=bool)  # 只包含部分行情的K线，不回调
+
+    def grow(self, capacity):
+        size = len(self.key)
+        self.key = np.r_[self.key, np.zeros(capacity - size, dtype=np.int64)]
+        self.values = np.hstack([self.values, np.zeros((len(BAR_FIELDS), capacity - size))])
+        self.volume_start = np.r_[self.volume_start, np.zeros(capacity - size)]
+        self.partial = np.r_[self.partial, np.zeros(capacity - size, dtype=bool)]
+
+
+class BarAggregator:
+    """实时K线合成器
+
+    每根K线完成时、以及每次快照更新未完成的K线时调用 on_bars(kind, symbols, times, values, final)：
+    kind为分钟数或'daily'，values形状为 (字段数, K线数)，字段顺序同 BAR_FIELDS，final表示K线已完成。
+    """
+
+    def __init__(self, calendar, minutes=MINUTE_PERIODS, on_bars=None, initial_capacity=256):
+        """初始化合成器
+
+        Args:
+            calendar: 交易日历，非交易日及交易时段外的快照被忽略
+            minutes: 需要合成的分钟线周期
+            on_bars: K线回调
+            initial_capacity: 初始股票容量，不足时自动扩容
+        """
+        self.calendar = calendar
+        self.minutes = tuple(minutes)
+        self.on_bars = on_bars
+        self._lock = threading.Lock()
+        self._slots = {}  # 代码 -> 编号
+        self._symbols = []
+        capacity = initial_capacity
+        self._states = {m: _BarState(capacity) for m in self.minutes}
+        self._daily = _BarState(capacity)
+        self._last_day = np.zeros(capacity, dtype=np.int64)  # 最近一次行情的日期序号
+        self._last_volume = np.zeros(capacity, dtype=np.float64)  # 最近一次行情的当日累计成交量
+        self._updates = 0
+        self._completed = 0
+
+    def _slots_for(self, symbols):
+        """返回代码对应的编号数组，新代码分配编号并按需扩容"""
+        for symbol in symbols:
+            if symbol not in self._slots:
+                self._slots[symbol] = len(self._symbols)
+                self._symbols.append(symbol)
+        capacity = len(self._last_day)
+        if len(self._symbols) > capacity:
+            capacity = max(capacity * 2, len(self._symbols))
+            for state in list(self._states.values()) + [self._daily]:
+                state.grow(capacity)
+            self._last_day = np.r_[self._last_day, np.zeros(capacity - len(self._last_day), dtype=np.int64)]
+            self._last_volume = np.r_[self._last_volume, np.zeros(capacity - len(self._last_volume))]
+        return np.fromiter((self._slots[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def update(self, quotes, now=None):
+        """处理一次实时行情快照
+
+        Args:
+            quotes: 以代码为索引的实时行情DataFrame，包含 price/open/high/low/volume 列，volume为当日累计成交量
+            now: 快照时间，默认为当前时间
+        """
+        now = now or datetime.datetime.now()
+        if not self.calendar.is_trading_time(now):
+            # 交易时段结束后完成所有未完成的K线
+            self.finalize()
+            return
+        # 停牌或尚未成交的股票没有最新价
+        quotes = quotes[(quotes['price'] > 0) & (quotes['volume'] >= 0)]
+        if len(quotes) == 0:
+            return
+
+        emitted = []
+        with self._lock:
+            day = np.datetime64(now.date(), 'D').astype(np.int64)
+            slots = self._slots_for(list(quotes.index))
+            price = quotes['price'].values.astype(np.float64)
+            volume = quotes['volume'].values.astype(np.float64)
+            open_ = quotes['open'].values.astype(np.float64)
+            open_ = np.where(open_ > 0, open_, price)
+            high = np.fmax(quotes['high'].values.astype(np.float64), price)
+            low = quotes['low'].values.astype(np.float64)
+            low = np.where(low > 0, np.fmin(low, price), price)
+            # 当天第一次出现的股票从0开始计算成交量，其余从上一次快照的累计成交量开始
+            first_seen = self._last_day[slots] != day
+            previous_volume = np.where(first_seen, 0.0, self._last_volume[slots])
+            elapsed = trading_minute(now)
+
+            for m, state in self._states.items():
+                index = max(int(np.ceil(elapsed / m)), 1)
+                key = day * 1000 + index
+                emitted.extend(self._complete(m, state, key))
+                starting = state.key[slots] != key
+                start_slots = slots[starting]
+                state.values[:4, start_slots] = price[starting]
+                state.volume_start[start_slots] = previous_volume[starting]
+                if index == 1:
+                    # 当日第一根K线的开高低即当日今开、最高、最低
+                    first = starting & first_seen
+                    state.values[0, slots[first]] = open_[first]
+                    state.values[1, slots[first]] = high[first]
+                    state.values[2, slots[first]] = low[first]
+                    state.partial[start_slots] = False
+                else:
+                    # 中途首次出现的股票，当前K线缺少首个快照之前的行情和成交量
+                    state.partial[start_slots] = first_seen[starting]
+                state.key[slots] = key
+                ongoing = slots[~starting]
+                state.values[1, ongoing] = np.maximum(state.values[1, ongoing], price[~starting])
+                state.values[2, ongoing] = np.minimum(state.values[2, ongoing], price[~starting])
+                state.values[3, slots] = price
+                state.values[4, slots] = np.maximum(volume - state.volume_start[slots], 0.0)
+                live = slots[~state.partial[slots]]
+                if len(live) > 0:
+                    emitted.append((m, live, np.full(len(live), bar_end_time(now.date(), index, m)),
+                                    state.values[:, live].copy(), False))
+
+            # 当日日线直接取行情中的今开、最高、最低
+            emitted.extend(self._complete('daily', self._daily, day))
+            self._daily.values[0, slots] = open_
+            self._daily.values[1, slots] = high
+            self._daily.values[2, slots] = low
+            self._daily.values[3, slots] = price
+            self._daily.values[4, slots] = volume
+            self._daily.key[slots] = day
+            emitted.append(('daily', slots, np.full(len(slots), pd.Timestamp(now.date())),
+                            self._daily.values[:, slots].copy(), False))
+
+            self._last_day[slots] = day
+            self._last_volume[slots] = volume
+            self._updates += 1
+        self._emit(emitted)
+
+    def finalize(self):
+        """完成所有未完成的K线（收盘后调用）"""
+        with self._lock:
+            emitted = []
+            for m, state in self._states.items():
+                emitted.extend(self._complete(m, state, np.iinfo(np.int64).max))
+            emitted.extend(self._complete('daily', self._daily, np.iinfo(np.int64).max))
+        self._emit(emitted)
+
+    def _complete(self, kind, state, key):
+        """取出key之前的未完成K线并清空，返回待回调的K线（只包含部分行情的K线清空后丢弃）"""
+        done = np.flatnonzero((state.key != 0) & (state.key < key))
+        if len(done) == 0:
+            return []
+        partial = state.partial[done]
+        state.key[done[partial]] = 0
+        state.partial[done] = False
+        done = done[~partial]
+        if len(done) == 0:
+            return []
+        keys = state.key[done]
+        if kind == 'daily':
+            times = keys.astype('datetime64[D]').astype('datetime64[ns]')
+        else:
+            ends = (keys % 1000) * kind
+            offsets = np.where(ends <= HALF_SESSION, MORNING_START + ends, AFTERNOON_START + ends - HALF_SESSION)
+            times = (keys // 1000).astype('datetime64[D]') + offsets.astype('timedelta64[m]')
+        values = state.values[:, done].copy()
+        state.key[done] = 0
+        self._completed += len(done)
+        return [(kind, done, times, values, True)]
+
+    def _emit(self, emitted):
+        if self.on_bars is None:
+            return
+        for kind, slots, times, values, final in emitted:
+            symbols = [self._symbols[i] for i in slots]
+            self.on_bars(kind, symbols, np.asarray(times, dtype='datetime64[ns]'), values, final)
+
+    def stats(self):
+        """返回合成器状态"""
+        return {
+            'symbols': len(self._symbols),
+            'periods': list(self.minutes),
+            'updates': self._updates,
+            'completed_bars': self._completed
+        }
@@ -0,0 +1,114 @@
+"""
+K线周期转换 - 由日线在本地合成周线、月线及N日线；分钟线周期解析
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# 各周期一根K线最多包含的交易日数，用于按交易日历估算取数区间
+PERIOD_SESSIONS = {'daily': 1, 'weekly': 5, 'monthly': 23}
+
+# 数据源支持的分钟线周期，及每个交易日的交易分钟数
+MINUTE_PERIODS = (1, 5, 15, 30, 60)
+SESSION_MINUTES = 240
+
+
+def parse_period(period):
+    """解析周期参数
+
+    Args:
+        period: 'daily'、'weekly'、'monthly'、'Nd'（如'5d'表示5日线）或 'Nmin'（如'5min'表示5分钟线）
+
+    Returns:
+        ('daily'|'weekly'|'monthly'|'ndays'|'minute', N) 元组，未指定时为日线
+
+    Raises:
+        ValueError: 无法识别的周期
+    """
+    period = (period or 'daily').strip().lower()
+    if period in PERIOD_SESSIONS:
+        return period, 1
+    match = re.fullmatch(r'(\d+)d', period)
+    if match and int(match.group(1)) > 0:
+        n = int(match.group(1))
+        return ('daily', 1) if n == 1 else ('ndays', n)
+    match = re.fullmatch(r'(\d+)(?:min|m)', period)
+    if match and int(match.group(1)) in MINUTE_PERIODS:
+        return 'minute', int(match.group(1))
+    minutes = '/'.join(str(n) for n in MINUTE_PERIODS)
+    raise ValueError(f"不支持的周期: {period}，可选: daily、weekly、monthly、Nd（N日线）或 Nmin（N为{minutes}）")
+
+
+def period_sessions(period):
+    """返回一根K线最多包含的交易日数，分钟线为小数"""
+    kind, n = parse_period(period)
+    if kind == 'minute':
+        return n / SESSION_MINUTES
+    return n if kind == 'ndays' else PERIOD_SESSIONS[kind]
+
+
+def minute_period(period):
+    """分钟线周期返回分钟数，其他周期返回None"""
+    kind, n = parse_period(period)
+    return n if kind == 'minute' else None
+
+
+def bucket_start(date, period):
+    """返回date所在K线区间的第一天（周线为周一，月线为1日），日线及分钟线返回date本身
+
+    N日线从最新一根K线向前分组，区间随新K线移动，没有固定的起始日，返回None。
+    """
+    kind, _ = parse_period(period)
+    date = pd.Timestamp(date).normalize()
+    if kind == 'weekly':
+        return date - pd.Timedelta(days=date.weekday())
+    if kind == 'monthly':
+        return date.replace(day=1)
+    if kind == 'ndays':
+        return None
+    return date
+
+
+def resample_ohlcv(df, period):
+    """将日线OHLCV数据合成为更大周期的K线
+
+    每根K线以该区间最后一个交易日作为日期；N日线从最新一根K线向前分组，
+    保证最新一根K线完整。
+
+    Args:
+        df: 以DatetimeIndex为索引、按日期升序的日线DataFrame
+        period: 周期参数，见 parse_period
+
+    Returns:
+        合成后的DataFrame，日线及分钟线时原样返回
+    """
+    kind, n = parse_period(period)
+    if kind in ('daily', 'minute') or df is None or len(df) == 0:
+        return df
+
+    days = df.index.values.astype('datetime64[D]').astype(np.int64)
+    if kind == 'weekly':
+        # 1970-01-01为周四，加3后按7整除得到以周一开始的周编号
+        keys = (days + 3) // 7
+    elif kind == 'monthly':
+        keys = df.index.year.values * 12 + df.index.month.values
+    else:
+        keys = (len(df) - 1 - np.arange(len(df))) // n
+
+    # 数据按日期有序，同一分组连续存放，用reduceat一次完成聚合
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    data = {}
+    if 'Open' in df.columns:
+        data['Open'] = df['Open'].values[starts]
+    if 'High' in df.columns:
+        data['High'] = np.maximum.reduceat(df['High'].values, starts)
+    if 'Low' in df.columns:
+        data['Low'] = np.minimum.reduceat(df['Low'].values, starts)
+    if 'Close' in df.columns:
+        data['Close'] = df['Close'].values[ends]
+    if 'Volume' in df.columns:
+        data['Volume'] = np.add.reduceat(df['Volume'].values, starts)
+
+    return pd.DataFrame(data, index=df.index[ends])
@@ -0,0 +1,93 @@
+"""
+K线数据校验 - 入库前一次性向量化清洗上游数据，并按交易日历统计缺失的交易日
+
+只在下载后写入存储和缓存之前执行，读取路径不再做任何清洗。
+"""
+import numpy as np
+from .compact_frame import index_days
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+# 报告中最多列出的缺口区间数
+MAX_GAP_RANGES = 20
+
+
+def validate_bars(df, sessions=None):
+    """清洗K线数据
+
+    - 日期重复时保留最后一条，并按日期排序
+    - 删除价格缺失、非正数或成交量为负的行
+    - 删除成交量为0且OHLC全部相同的停牌占位行
+    - 提供交易日时删除非交易日的行
+    - High/Low 不满足 High >= max(Open, Close)、Low <= min(Open, Close) 时按四个价格修正
+
+    Args:
+        df: 以DatetimeIndex为索引、包含OHLCV列的DataFrame
+        sessions: 有序交易日数组（datetime64[D]），为None时不按交易日历检查
+
+    Returns:
+        (清洗后的DataFrame, 校验报告字典)
+    """
+    report = {'rows': 0 if df is None else len(df), 'duplicates': 0, 'invalid': 0, 'suspended': 0,
+              'non_session': 0, 'ohlc_repaired': 0, 'zero_volume': 0}
+    if df is None or len(df) == 0:
+        return df, report
+
+    duplicated = df.index.duplicated(keep='last')
+    report['duplicates'] = int(duplicated.sum())
+    if report['duplicates']:
+        df = df[~duplicated]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    prices = df[PRICE_COLUMNS].values
+    volume = df['Volume'].values
+    invalid = ~np.isfinite(prices).all(axis=1) | (prices <= 0).any(axis=1) | ~(volume >= 0)
+    suspended = ~invalid & (volume == 0) & (prices.max(axis=1) == prices.min(axis=1))
+    drop = invalid | suspended
+    if sessions is not None:
+        days = index_days(df.index).astype('datetime64[D]')
+        non_session = ~np.isin(days, sessions) & ~drop
+        report['non_session'] = int(non_session.sum())
+        drop |= non_session
+    report['invalid'] = int(invalid.sum())
+    report['suspended'] = int(suspended.sum())
+    if drop.any():
+        df = df[~drop]
+        prices = prices[~drop]
+        volume = volume[~drop]
+
+    high, low = prices.max(axis=1), prices.min(axis=1)
+    broken = (df['High'].values != high) | (df['Low'].values != low)
+    report['ohlc_repaired'] = int(broken.sum())
+    if broken.any():
+        df = df.copy()
+        df['High'] = high
+        df['Low'] = low
+    report['zero_volume'] = int((volume == 0).sum())
+    return df, report
+
+
+def find_gaps(index, sessions):
+    """统计首尾日期之间缺失的交易日
+
+    Args:
+        index: 有序日期索引（Date或紧凑格式的Day）
+        sessions: 有序交易日数组（datetime64[D]）
+
+    Returns:
+        {'missing_sessions': 缺失交易日数, 'gap_ranges': [[开始, 结束], ...]}，区间最多 MAX_GAP_RANGES 个
+    """
+    if len(index) == 0:
+        return {'missing_sessions': 0, 'gap_ranges': []}
+    days = index_days(index).astype('datetime64[D]')
+    expected = sessions[np.searchsorted(sessions, days[0]):np.searchsorted(sessions, days[-1], side='right')]
+    positions = np.flatnonzero(~np.isin(expected, days))
+    if len(positions) == 0:
+        return {'missing_sessions': 0, 'gap_ranges': []}
+    # 连续缺失的交易日合并为一个区间
+    breaks = np.flatnonzero(np.diff(positions) != 1)
+    starts = positions[np.r_[0, breaks + 1]]
+    ends = positions[np.r_[breaks, len(positions) - 1]]
+    ranges = [[str(expected[s]), str(expected[e])] for s, e in zip(starts[-MAX_GAP_RANGES:], ends[-MAX_GAP_RANGES:])]
+    return {'missing_sessions': int(len(positions)), 'gap_ranges': ranges}
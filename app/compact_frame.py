@@ -0,0 +1,84 @@
+"""
+紧凑数据类型 - 缓存和本地存储中以float32价格、uint32/uint64成交量、int32日期序号保存日线
+
+紧凑格式的索引名为 Day，值为自1970-01-01起的天数；返回给调用方之前再转换回
+以Date为索引的float64格式。价格达到 FLOAT32_PRICE_LIMIT 的数据（如深证成指等点位上万的指数）
+float32无法还原到3位小数，保留float64价格。
+"""
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+# 还原价格时保留的小数位数（A股价格最多3位小数）
+PRICE_DECIMALS = 3
+
+# float32的有效数字约7位：低于2^13时相邻值间隔不超过0.0005，按3位小数四舍五入可还原原值；
+# 2^13到2^14之间只剩很小的余量，2^14以上间隔约0.002，必然还原出错
+FLOAT32_PRICE_LIMIT = 8192.0
+
+UINT32_MAX = np.iinfo(np.uint32).max
+
+
+def is_compact(df):
+    """是否为紧凑格式"""
+    return df is not None and df.index.name == 'Day'
+
+
+def day_number(date):
+    """将日期转换为自1970-01-01起的天数"""
+    return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+
+def index_days(index):
+    """将日期索引（Date或Day）转换为天数数组"""
+    if index.name == 'Day':
+        return index.values
+    return index.values.astype('datetime64[D]').astype(np.int64)
+
+
+def to_compact(df):
+    """转换为紧凑格式，已是紧凑格式时原样返回"""
+    if df is None or is_compact(df):
+        return df
+    days = index_days(df.index).astype(np.int32)
+    price_dtype = np.float32 if _fits_float32(df) else np.float64
+    data = {}
+    for column in df.columns:
+        values = df[column].values
+        if column in PRICE_COLUMNS:
+            values = values.astype(price_dtype)
+        elif column == 'Volume':
+            values = _compact_volume(values)
+        data[column] = values
+    return pd.DataFrame(data, index=pd.Index(days, name='Day'))
+
+
+def from_compact(df):
+    """转换回以Date为索引的float64格式，非紧凑格式时原样返回"""
+    if df is None or not is_compact(df):
+        return df
+    dates = pd.DatetimeIndex(df.index.values.astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
+    data = {}
+    for column in df.columns:
+        values = df[column].values
+        if column in PRICE_COLUMNS:
+            # float32无法精确表示两位小数，按A股价格精度还原（float64价格不受影响）
+            values = np.round(values.astype(np.float64), PRICE_DECIMALS)
+        elif column == 'Volume':
+            values = values.astype(np.float64)
+        data[column] = values
+    return pd.DataFrame(data, index=dates)
+
+
+def _fits_float32(df):
+    """价格是否都低于 FLOAT32_PRICE_LIMIT，可用float32保存并按3位小数还原"""
+    prices = df[[column for column in PRICE_COLUMNS if column in df.columns]].values
+    return not (np.abs(prices) >= FLOAT32_PRICE_LIMIT).any()
+
+
+def _compact_volume(values):
+    """成交量为非负整数时使用uint32，超出范围时使用uint64，否则保留float64"""
+    if len(values) == 0 or np.isnan(values).any() or (values < 0).any() or (values != np.floor(values)).any():
+        return values.astype(np.float64)
+    return values.astype(np.uint32 if values.max() <= UINT32_MAX else np.uint64)
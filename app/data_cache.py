@@ -0,0 +1,96 @@
+"""
+行情数据内存缓存 - 按交易日收盘时间过期、按内存上限LRU淘汰
+"""
+import os
+import datetime
+import threading
+from collections import OrderedDict
+from .trading_calendar import TradingCalendar
+
+
+class DataFrameCache:
+    """预处理后DataFrame的进程内缓存，键为股票代码，各复权方式共用同一条目"""
+
+    def __init__(self, max_bytes=None, calendar=None):
+        """初始化缓存
+
+        Args:
+            max_bytes: 内存上限（字节），默认读取环境变量 STOCK_CACHE_MAX_MB（默认256MB）
+            calendar: 交易日历，用于计算下一次收盘时间，默认按工作日计算
+        """
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('STOCK_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.calendar = calendar or TradingCalendar()
+        self._entries = OrderedDict()  # key -> (df, nbytes, expires_at)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, now=None):
+        """读取缓存，过期或不存在时返回None"""
+        now = now or datetime.datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            df, nbytes, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return df
+
+    def put(self, key, df, expires_at=None):
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            df: 要缓存的DataFrame
+            expires_at: 过期时间，默认为下一个交易日收盘
+        """
+        if df is None:
+            return
+        expires_at = expires_at or self.calendar.next_session_close()
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (df, nbytes, expires_at)
+            self.current_bytes += nbytes
+            # 超出内存上限时淘汰最久未使用的条目
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """删除指定缓存"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,484 @@
+"""
+行情数据源 - AKShare在线数据、本地CSV/Parquet样本数据及随机游走模拟数据
+
+通过环境变量 STOCK_DATA_PROVIDER 选择数据源（akshare / fixture / synthetic），
+STOCK_PROVIDER_LATENCY_MS 可为任意数据源附加固定延迟，用于模拟上游耗时。
+"""
+import os
+import re
+import time
+import zlib
+import datetime
+import numpy as np
+import pandas as pd
+import requests
+from .market_store import check_file_symbol
+from .source_chain import SourceChain
+
+
+# 实时行情字段：最新价、涨跌额、涨跌幅、今开、最高、最低、昨收、成交量、成交额
+SPOT_COLUMNS = ['price', 'change', 'change_pct', 'open', 'high', 'low', 'prev_close', 'volume', 'amount']
+
+# 新浪行情批量报价接口，list参数为逗号分隔的带交易所前缀代码，个股与指数均可
+SINA_QUOTE_URL = 'https://hq.sinajs.cn/list='
+SINA_QUOTE_HEADERS = {'Referer': 'https://finance.sina.com.cn/'}
+# 单次请求最多的代码数，限制URL长度
+SINA_QUOTE_BATCH = 400
+
+
+def is_index_symbol(symbol):
+    """判断是否为指数代码"""
+    return symbol.startswith('sh00') or symbol.startswith('sz39')
+
+
+class DataProvider:
+    """行情数据源接口
+
+    fetch_daily 返回的原始DataFrame需包含 date/open/high/low/close/volume 列
+    （或AKShare个股接口的中文列名），由 AKShareClient._preprocess_data 统一处理。
+    """
+
+    name = 'base'
+
+    def fetch_daily(self, symbol, start_date=None):
+        """获取不复权日线
+
+        Args:
+            symbol: 股票代码
+            start_date: 起始日期（Timestamp或字符串），为None时返回全部历史
+
+        Returns:
+            原始日线DataFrame
+        """
+        raise NotImplementedError
+
+    def fetch_factors(self, symbol):
+        """获取后复权因子
+
+        Returns:
+            以Date为索引、包含 hfq_factor 列的DataFrame，没有复权因子时返回None
+        """
+        return None
+
+    def fetch_stock_list(self):
+        """获取A股代码和名称
+
+        Returns:
+            包含 code、name 两列的DataFrame
+        """
+        raise NotImplementedError
+
+    def fetch_trade_dates(self):
+        """获取历史及当年交易日
+
+        Returns:
+            交易日序列，不支持时返回None（交易日历按工作日处理）
+        """
+        return None
+
+    def source_stats(self):
+        """返回各上游接口的耗时、错误及熔断统计，没有回退链的数据源返回空字典"""
+        return {}
+
+    def fetch_minute(self, symbol, minutes):
+        """获取最近的不复权分钟线
+
+        Args:
+            symbol: 股票代码
+            minutes: 周期分钟数，1、5、15、30 或 60
+
+        Returns:
+            包含 day/open/high/low/close/volume 列的原始DataFrame，day为K线结束时间
+        """
+        raise NotImplementedError
+
+    def fetch_spot(self, symbols):
+        """批量获取实时行情
+
+        Args:
+            symbols: 股票或指数代码列表
+
+        Returns:
+            以代码为索引、包含 SPOT_COLUMNS 各列的DataFrame，不在行情中的代码不返回
+        """
+        raise NotImplementedError
+
+
+class AKShareProvider(DataProvider):
+    """AKShare在线数据源
+
+    每类数据由一条回退链依次尝试多个AKShare接口：个股日线为新浪、东方财富，
+    指数日线为东方财富、新浪；各接口的超时、熔断及耗时统计见 SourceChain。
+    """
+
+    name = 'akshare'
+
+    def __init__(self):
+        import akshare as ak
+        self.ak = ak
+        self.chains = {
+            'stock_daily': SourceChain('stock_daily', [
+                ('sina.stock_zh_a_daily', self._stock_daily_sina),
+                ('eastmoney.stock_zh_a_hist', self._stock_daily_eastmoney)]),
+            'index_daily': SourceChain('index_daily', [
+                ('eastmoney.stock_zh_index_daily_em', self._index_daily_eastmoney),
+                ('sina.stock_zh_index_daily', self._index_daily_sina)]),
+            'factors': SourceChain('factors', [('sina.stock_zh_a_daily', self._factors_sina)]),
+            'minute': SourceChain('minute', [('sina.stock_zh_a_minute', self._minute_sina)]),
+            'spot': SourceChain('spot', [('sina.spot', self._spot_sina)]),
+        }
+
+    def fetch_daily(self, symbol, start_date=None):
+        chain = 'index_daily' if is_index_symbol(symbol) else 'stock_daily'
+        return self.chains[chain].call(symbol, start_date)
+
+    def fetch_factors(self, symbol):
+        if is_index_symbol(symbol):
+            return None
+        return self.chains['factors'].call(symbol)
+
+    def fetch_stock_list(self):
+        stock_list = self.ak.stock_zh_a_spot()
+        # 提取代码和名称
+        return stock_list[['代码', '名称']].rename(
+            columns={'代码': 'code', '名称': 'name'})
+
+    def fetch_trade_dates(self):
+        return self.ak.tool_trade_date_hist_sina()['trade_date']
+
+    def fetch_minute(self, symbol, minutes):
+        return self.chains['minute'].call(symbol, minutes)
+
+    def fetch_spot(self, symbols):
+        return self.chains['spot'].call(symbols)
+
+    def source_stats(self):
+        return {name: chain.stats() for name, chain in self.chains.items()}
+
+    @staticmethod
+    def _begin(start_date):
+        return pd.Timestamp(start_date).strftime('%Y%m%d') if start_date is not None else None
+
+    def _stock_daily_sina(self, symbol, start_date=None):
+        begin = self._begin(start_date)
+        if begin is None:
+            return self.ak.stock_zh_a_daily(symbol=symbol, adjust='')
+        return self.ak.stock_zh_a_daily(symbol=symbol, start_date=begin, adjust='')
+
+    def _stock_daily_eastmoney(self, symbol, start_date=None):
+        # 东方财富接口使用不带交易所前缀的代码，成交量单位为手
+        df = self.ak.stock_zh_a_hist(symbol=symbol[2:], period='daily',
+                                     start_date=self._begin(start_date) or '19700101', adjust='')
+        df = df.rename(columns={'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low',
+                                '收盘': 'close', '成交量': 'volume'})
+        df['volume'] = pd.to_numeric(df['volume']) * 100
+        return df[['date', 'open', 'high', 'low', 'close', 'volume']]
+
+    def _index_daily_eastmoney(self, symbol, start_date=None):
+        # 东方财富指数接口支持按日期范围获取，成交量单位为手
+        df = self.ak.stock_zh_index_daily_em(symbol=symbol, start_date=self._begin(start_date) or '19900101')
+        df['volume'] = pd.to_numeric(df['volume']) * 100
+        return df
+
+    def _index_daily_sina(self, symbol, start_date=None):
+        # 新浪指数接口只能获取全部历史
+        df = self.ak.stock_zh_index_daily(symbol=symbol)
+        if start_date is not None:
+            df = df[pd.to_datetime(df['date']) >= pd.Timestamp(start_date)]
+        return df
+
+    def _factors_sina(self, symbol):
+        return _normalize_factors(self.ak.stock_zh_a_daily(symbol=symbol, adjust='hfq-factor'))
+
+    def _minute_sina(self, symbol, minutes):
+        # 新浪分钟线接口，最多返回最近1970根
+        return self.ak.stock_zh_a_minute(symbol=symbol, period=str(minutes), adjust='')
+
+    def _spot_sina(self, symbols):
+        # 只请求订阅的代码，每 SINA_QUOTE_BATCH 个代码一次请求（全市场分页抓取需要数十次请求，且频繁调用会被封IP）
+        symbols = list(symbols)
+        rows = {}
+        for i in range(0, len(symbols), SINA_QUOTE_BATCH):
+            response = requests.get(SINA_QUOTE_URL + ','.join(symbols[i:i + SINA_QUOTE_BATCH]),
+                                    headers=SINA_QUOTE_HEADERS, timeout=10)
+            response.raise_for_status()
+            rows.update(_parse_sina_quotes(response.content.decode('gbk', errors='replace')))
+        return pd.DataFrame.from_dict(rows, orient='index', columns=SPOT_COLUMNS)
+
+
+class FixtureProvider(DataProvider):
+    """本地样本数据源
+
+    目录中每只股票一个文件：{symbol}.csv、{symbol}.parquet 或本地行情存储格式
+    {symbol}_none.parquet；复权因子文件为 {symbol}_hfq_factor.csv/.parquet；
+    分钟线为 {symbol}_{N}min.csv/.parquet（day/open/high/low/close/volume）；
+    股票列表为 stock_list.csv（code,name），缺省时由文件名生成；
+    交易日历为 trade_calendar.csv（trade_date），缺省时按工作日处理。
+    """
+
+    name = 'fixture'
+
+    def __init__(self, base_path=None):
+        self.base_path = base_path or os.getenv('STOCK_FIXTURE_DIR', 'data/fixtures')
+
+    def _find(self, stem):
+        # stem 以股票代码开头，只允许字母、数字及数据类型后缀中的下划线
+        check_file_symbol(stem.replace('_', ''))
+        for suffix in ('.parquet', '.csv'):
+            path = os.path.join(self.base_path, stem + suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _read(path):
+        df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+        df.columns = [str(column).lower() for column in df.columns]
+        return df
+
+    def fetch_daily(self, symbol, start_date=None):
+        path = self._find(symbol) or self._find(f"{symbol}_none")
+        if path is None:
+            raise FileNotFoundError(f"没有找到 {symbol} 的样本数据: {self.base_path}")
+        df = self._read(path)
+        if start_date is not None:
+            df = df[pd.to_datetime(df['date']) >= pd.Timestamp(start_date)]
+        return df
+
+    def fetch_factors(self, symbol):
+        path = self._find(f"{symbol}_hfq_factor")
+        if path is None:
+            return None
+        return _normalize_factors(self._read(path))
+
+    def fetch_stock_list(self):
+        path = os.path.join(self.base_path, 'stock_list.csv')
+        if os.path.exists(path):
+            return pd.read_csv(path, dtype=str)[['code', 'name']]
+        symbols = set()
+        for file_name in os.listdir(self.base_path):
+            match = re.fullmatch(r'((?:sh|sz|bj)\d{6})(?:_none)?\.(?:csv|parquet)', file_name)
+            if match and not is_index_symbol(match.group(1)):
+                symbols.add(match.group(1))
+        symbols = sorted(symbols)
+        return pd.DataFrame({'code': symbols, 'name': symbols})
+
+    def fetch_trade_dates(self):
+        path = os.path.join(self.base_path, 'trade_calendar.csv')
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path)['trade_date']
+
+    def fetch_minute(self, symbol, minutes):
+        path = self._find(f"{symbol}_{minutes}min")
+        if path is None:
+            raise FileNotFoundError(f"没有找到 {symbol} 的{minutes}分钟线样本数据: {self.base_path}")
+        return self._read(path)
+
+    def fetch_spot(self, symbols):
+        # 以最后两根日线作为最新行情和昨收
+        rows = {}
+        for symbol in symbols:
+            path = self._find(symbol) or self._find(f"{symbol}_none")
+            if path is None:
+                continue
+            df = self._read(path)
+            if len(df) == 0:
+                continue
+            last = df.iloc[-1]
+            prev_close = df['close'].iloc[-2] if len(df) > 1 else last['open']
+            rows[symbol] = _spot_row(last['open'], last['high'], last['low'], last['close'], prev_close,
+                                     last['volume'])
+        return pd.DataFrame.from_dict(rows, orient='index', columns=SPOT_COLUMNS)
+
+
+class SyntheticProvider(DataProvider):
+    """随机游走模拟数据源，同一代码每次生成的数据相同
+
+    SYNTHETIC_SYMBOLS 控制股票列表数量，SYNTHETIC_YEARS 控制历史长度。
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, symbol_count=None, years=None):
+        self.symbol_count = int(symbol_count or os.getenv('SYNTHETIC_SYMBOLS', '5000'))
+        self.years = float(years or os.getenv('SYNTHETIC_YEARS', '10'))
+
+    def _sessions(self):
+        today = datetime.date.today()
+        start = today - datetime.timedelta(days=int(self.years * 365))
+        return pd.bdate_range(start, today)
+
+    def fetch_daily(self, symbol, start_date=None):
+        dates = self._sessions()
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        n = len(dates)
+        base = 3000.0 if is_index_symbol(symbol) else rng.uniform(3, 100)
+        close = base * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n)))
+        prev_close = np.r_[base, close[:-1]]
+        open_ = prev_close * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, n)))
+        volume = np.round(rng.lognormal(15, 0.6, n))
+        df = pd.DataFrame({
+            'date': dates,
+            'open': open_.round(2),
+            'high': high.round(2),
+            'low': low.round(2),
+            'close': close.round(2),
+            'volume': volume
+        })
+        if start_date is not None:
+            df = df[df['date'] >= pd.Timestamp(start_date)]
+        return df
+
+    def fetch_factors(self, symbol):
+        if is_index_symbol(symbol):
+            return None
+        dates = self._sessions()
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()) + 1)
+        # 每年大约一次除权除息
+        events = np.sort(rng.choice(len(dates), size=max(int(self.years), 1), replace=False))
+        factors = np.cumprod(np.r_[1.0, 1 + rng.uniform(0.01, 0.1, len(events))])
+        factor_dates = np.r_[np.datetime64('1900-01-01'), dates.values[events].astype('datetime64[D]')]
+        return pd.DataFrame({'hfq_factor': factors}, index=pd.DatetimeIndex(factor_dates, name='Date'))
+
+    def fetch_stock_list(self):
+        codes = [f"sh{600000 + i:06d}" if i % 2 == 0 else f"sz{i:06d}" for i in range(self.symbol_count)]
+        names = [f"模拟股票{i:04d}" for i in range(self.symbol_count)]
+        return pd.DataFrame({'code': codes, 'name': names})
+
+    def fetch_trade_dates(self):
+        return self._sessions()
+
+    def fetch_minute(self, symbol, minutes, count=1970):
+        # 每个交易日9:31-11:30、13:01-15:00共240个分钟，N分钟线取每N分钟的结束时间
+        day_minutes = np.r_[np.arange(9 * 60 + 31, 11 * 60 + 31), np.arange(13 * 60 + 1, 15 * 60 + 1)]
+        bar_minutes = day_minutes[minutes - 1::minutes]
+        sessions = self._sessions()[-int(np.ceil(count / len(bar_minutes))):]
+        times = (sessions.values.astype('datetime64[D]')[:, None]
+                 + bar_minutes.astype('timedelta64[m]')[None, :]).ravel()[-count:]
+        rng = np.random.default_rng(zlib.crc32(f"{symbol}:{minutes}".encode()))
+        n = len(times)
+        base = self.fetch_daily(symbol)['close'].values[-1]
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.001 * np.sqrt(minutes), n)))
+        open_ = np.r_[base, close[:-1]]
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+        return pd.DataFrame({
+            'day': pd.DatetimeIndex(times),
+            'open': open_.round(2),
+            'high': high.round(2),
+            'low': low.round(2),
+            'close': close.round(2),
+            'volume': np.round(rng.lognormal(11, 0.6, n) * minutes)
+        })
+
+    def fetch_spot(self, symbols):
+        # 在最后一根日线附近随机波动，每次调用价格都会变化
+        rng = np.random.default_rng()
+        rows = {}
+        for symbol in symbols:
+            daily = self.fetch_daily(symbol).iloc[-2:]
+            prev_close, close = daily['close'].values[0], daily['close'].values[-1]
+            price = round(close * (1 + rng.normal(0, 0.002)), 2)
+            rows[symbol] = _spot_row(daily['open'].values[-1], max(daily['high'].values[-1], price),
+                                     min(daily['low'].values[-1], price), price, prev_close,
+                                     daily['volume'].values[-1])
+        return pd.DataFrame.from_dict(rows, orient='index', columns=SPOT_COLUMNS)
+
+
+class LatencyProvider(DataProvider):
+    """为数据源的每次调用附加固定延迟，用于压测时模拟上游耗时"""
+
+    def __init__(self, provider, latency_ms):
+        self.provider = provider
+        self.latency = latency_ms / 1000.0
+        self.name = provider.name
+
+    def fetch_daily(self, symbol, start_date=None):
+        time.sleep(self.latency)
+        return self.provider.fetch_daily(symbol, start_date)
+
+    def fetch_factors(self, symbol):
+        time.sleep(self.latency)
+        return self.provider.fetch_factors(symbol)
+
+    def fetch_stock_list(self):
+        time.sleep(self.latency)
+        return self.provider.fetch_stock_list()
+
+    def fetch_trade_dates(self):
+        time.sleep(self.latency)
+        return self.provider.fetch_trade_dates()
+
+    def source_stats(self):
+        return self.provider.source_stats()
+
+    def fetch_minute(self, symbol, minutes):
+        time.sleep(self.latency)
+        return self.provider.fetch_minute(symbol, minutes)
+
+    def fetch_spot(self, symbols):
+        time.sleep(self.latency)
+        return self.provider.fetch_spot(symbols)
+
+
+PROVIDERS = {
+    'akshare': AKShareProvider,
+    'fixture': FixtureProvider,
+    'synthetic': SyntheticProvider,
+}
+
+
+def create_data_provider(name=None):
+    """按名称或环境变量 STOCK_DATA_PROVIDER 创建数据源，默认为AKShare"""
+    name = (name or os.getenv('STOCK_DATA_PROVIDER', 'akshare')).strip().lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"不支持的数据源: {name}，可选: {', '.join(PROVIDERS)}")
+    provider = PROVIDERS[name]()
+    latency_ms = float(os.getenv('STOCK_PROVIDER_LATENCY_MS', '0'))
+    if latency_ms > 0:
+        provider = LatencyProvider(provider, latency_ms)
+    return provider
+
+
+def _normalize_factors(df):
+    """将复权因子表整理为以Date为索引的DataFrame"""
+    df = df.rename(columns={'date': 'Date'})
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['hfq_factor'] = pd.to_numeric(df['hfq_factor'])
+    df = df.set_index('Date').sort_index()
+    return df[~df.index.duplicated(keep='last')]
+
+
+def _spot_row(open_, high, low, price, prev_close, volume):
+    """由日线字段构造一行实时行情（样本及模拟数据源使用）"""
+    change = round(price - prev_close, 3)
+    return [price, change, round(change / prev_close * 100, 3) if prev_close else 0.0,
+            open_, high, low, prev_close, volume, round(price * volume, 2)]
+
+
+def _parse_sina_quotes(text):
+    """解析新浪批量报价，返回 {代码: SPOT_COLUMNS 各列的值}
+
+    每个代码一行 var hq_str_sh600000="名称,今开,昨收,最新价,最高,最低,买一,卖一,成交量(股),成交额(元),...";
+    不存在的代码内容为空，不返回；未开盘或停牌时最新价为0，按缺失处理。
+    """
+    rows = {}
+    for symbol, content in re.findall(r'hq_str_(\w+)="([^"]*)"', text):
+        fields = content.split(',')
+        if len(fields) < 10:
+            continue
+        try:
+            open_, prev_close, price, high, low = (float(fields[i]) for i in (1, 2, 3, 4, 5))
+            volume, amount = float(fields[8]), float(fields[9])
+        except ValueError:
+            continue
+        if price <= 0:
+            rows[symbol] = [np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, prev_close, volume, amount]
+            continue
+        change = round(price - prev_close, 3)
+        rows[symbol] = [price, change, round(change / prev_close * 100, 3) if prev_close else 0.0,
+                        open_, high, low, prev_close, volume, amount]
+    return rows
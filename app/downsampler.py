@@ -0,0 +1,82 @@
+"""
+K线降采样 - 长区间数据在序列化或绘图前压缩到指定点数以内
+
+ohlc：按相邻K线分桶合并，保留每桶的最高、最低价，适合K线图；
+lttb：Largest-Triangle-Three-Buckets，按收盘价选取最能保持走势形状的原始K线，适合折线图。
+"""
+import numpy as np
+from .bar_resampler import resample_ohlcv
+
+DOWNSAMPLE_METHODS = ('ohlc', 'lttb')
+
+
+def lttb_indices(y, max_points):
+    """LTTB降采样，返回保留点的位置
+
+    首尾两点固定保留，其余点分为 max_points-2 个桶，每桶选取与上一个选中点、
+    下一桶均值构成三角形面积最大的点。横坐标使用序号（K线等间距）。
+
+    每桶的三角形顶点依赖上一桶的选中点，因此按桶逐个循环（共 max_points-2 次），
+    桶内各点面积及各桶均值用NumPy向量化计算；耗时随 max_points 而非原始K线数线性增长。
+
+    Args:
+        y: 一维数值数组
+        max_points: 最多保留的点数
+
+    Returns:
+        升序的位置数组（int64）
+    """
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([n - 1] if max_points == 1 else [0, n - 1], dtype=np.int64)
+
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    # 中间各桶边界，第i桶为 [edges[i], edges[i+1])
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+    # 各桶均值一次算出，作为前一桶选点时的第三个顶点
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    mean_x = np.r_[mean_x[1:], x[-1]]
+    mean_y = np.r_[mean_y[1:], y[-1]]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    # 逐桶选点：第i桶的顶点a为第i-1桶的选中点，无法跨桶向量化
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 桶内所有点的三角形面积（省略1/2系数）一次向量化计算
+        area = np.abs((x[a] - mean_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_ohlcv(df, max_points, method='ohlc'):
+    """将K线数据压缩到 max_points 根以内
+
+    Args:
+        df: 以DatetimeIndex为索引、按日期升序的OHLCV DataFrame
+        max_points: 最多保留的K线数，为None或不大于0时不处理
+        method: 'ohlc' 分桶合并（默认），'lttb' 按收盘价选取原始K线
+
+    Returns:
+        降采样后的DataFrame，数量未超过限制时原样返回
+
+    Raises:
+        ValueError: 不支持的降采样方式
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方式: {method}，可选: {', '.join(DOWNSAMPLE_METHODS)}")
+    if df is None or not max_points or max_points <= 0 or len(df) <= max_points:
+        return df
+    if method == 'lttb':
+        return df.iloc[lttb_indices(df['Close'].values, max_points)]
+    # 每桶K线数向上取整，从最新一根向前分组，桶数不超过 max_points
+    bucket = -(-len(df) // max_points)
+    return resample_ohlcv(df, f"{bucket}d")
@@ -0,0 +1,104 @@
+"""
+行情数据序列化 - 逐行JSON、按列JSON、Arrow IPC及小端float32二进制格式
+
+按列和二进制格式直接由列数组生成，不构造逐行的Python字典。日线的时间列为天数 Day；
+分钟线（索引带时刻）为自1970-01-01起的分钟数 Minute，float32格式为 Day 加当日分钟数 MinuteOfDay。
+"""
+import io
+import numpy as np
+from .compact_frame import index_days
+
+# 支持的输出格式
+FORMATS = ('records', 'columnar', 'arrow', 'f32')
+
+
+def epoch_days(index):
+    """将DatetimeIndex转换为自1970-01-01起的天数数组（int32）"""
+    return index_days(index).astype(np.int32)
+
+
+def epoch_minutes(index):
+    """将DatetimeIndex转换为自1970-01-01起的分钟数数组（int32）"""
+    return index.values.astype('datetime64[m]').astype(np.int64).astype(np.int32)
+
+
+def is_intraday(index):
+    """索引是否带有时刻（分钟线），日线的时间均为0点"""
+    return index.name != 'Day' and len(index) > 0 and bool(
+        (index.values.astype('datetime64[m]') != index.values.astype('datetime64[D]')).any())
+
+
+def time_unit(df):
+    """时间列的单位：分钟线为 'minute'，日线为 'day'"""
+    return 'minute' if is_intraday(df.index) else 'day'
+
+
+def time_column(index):
+    """返回 (列名, int32数组)：日线为天数 Day，分钟线为分钟数 Minute"""
+    if is_intraday(index):
+        return 'Minute', epoch_minutes(index)
+    return 'Day', epoch_days(index)
+
+
+def float32_columns(df):
+    """float32格式的列名：分钟数超出float32可精确表示的范围，分钟线拆为 Day 和 MinuteOfDay 两列"""
+    time_columns = ['Day', 'MinuteOfDay'] if is_intraday(df.index) else ['Day']
+    return time_columns + list(df.columns)
+
+
+def frame_to_records(df):
+    """逐行格式：[{'Date': 'YYYY-MM-DD HH:MM:SS', 'Open': ...}, ...]，与旧接口保持一致"""
+    dates = df.index.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    columns = [df[column].tolist() for column in df.columns]
+    names = ['Date'] + list(df.columns)
+    return [dict(zip(names, row)) for row in zip(dates, *columns)]
+
+
+def frame_to_columns(df, date_format='iso'):
+    """按列格式：每个字段一个数组
+
+    Args:
+        df: 以DatetimeIndex为索引的DataFrame
+        date_format: 'iso' 日期为YYYY-MM-DD字符串（分钟线带时刻，键为Date），
+                     'epoch_day' 为天数（键为Day），分钟线为分钟数（键为Minute）
+
+    Returns:
+        {字段名: 列表} 字典
+    """
+    if date_format == 'epoch_day':
+        name, values = time_column(df.index)
+        columns = {name: values.tolist()}
+    else:
+        date_format = '%Y-%m-%d %H:%M:%S' if is_intraday(df.index) else '%Y-%m-%d'
+        columns = {'Date': df.index.strftime(date_format).tolist()}
+    for column in df.columns:
+        columns[column] = df[column].tolist()
+    return columns
+
+
+def frame_to_arrow(df):
+    """Arrow IPC 流格式，时间列为int32天数 Day（分钟线为分钟数 Minute），其余列保持原数据类型"""
+    import pyarrow as pa
+    name, values = time_column(df.index)
+    arrays = [pa.array(values)] + [pa.array(df[column].values) for column in df.columns]
+    batch = pa.RecordBatch.from_arrays(arrays, names=[name] + list(df.columns))
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+
+def frame_to_float32(df):
+    """小端float32按列打包：列顺序见 float32_columns，每列长度为行数
+
+    float32可精确表示天数及当日分钟数；成交量超过2^24时会损失精度。
+    """
+    names = float32_columns(df)
+    time_count = len(names) - len(df.columns)
+    matrix = np.empty((len(names), len(df)), dtype='<f4')
+    matrix[0] = epoch_days(df.index)
+    if time_count == 2:
+        matrix[1] = epoch_minutes(df.index) - matrix[0].astype(np.int32) * 1440
+    for i, column in enumerate(df.columns, start=time_count):
+        matrix[i] = df[column].values
+    return matrix.tobytes()
@@ -0,0 +1,461 @@
+"""
+增量技术指标 - 保存各指标的内部状态（EMA值、滑动窗口合计、Wilder平均涨跌幅等），新K线到来时逐根O(1)更新
+
+各状态严格按 TA-Lib 的计算顺序实现（包括MACD快线的起始位置、SMA的累加/扣减顺序）。MA、MACD、KDJ
+与 TA-Lib 批量计算结果逐位相同；TA-Lib 以FMA指令编译时，EMA平滑、Wilder平均及布林带的乘加运算只做一次舍入，
+MACD信号线、RSI、布林带可能在末位不同（相对误差在1e-12以内，且不随追加的K线累积）。
+
+计算器及检查点由 IndicatorStateStore 保存到本地，进程重启后从检查点继续追加，不必重放完整历史。
+"""
+import os
+import math
+import uuid
+import pickle
+import hashlib
+from collections import deque
+import numpy as np
+import pandas as pd
+from .market_store import check_file_symbol
+from .technical_indicators import TechnicalIndicators
+
+NAN = float('nan')
+
+# 本地检查点的格式版本，状态类的字段变化时递增，旧文件读取后丢弃
+STATE_FORMAT = 2
+
+
+def _is_zero(value):
+    # 同 TA-Lib 的 TA_IS_ZERO
+    return -0.00000001 < value < 0.00000001
+
+
+class SMAState:
+    """简单移动平均：合计加上新值后输出，再扣减窗口中最早的值（同 TA-Lib）"""
+
+    def __init__(self, period):
+        self.period = period
+        self.total = 0.0
+        self.window = deque()
+
+    def update(self, value):
+        self.total += value
+        self.window.append(value)
+        if len(self.window) < self.period:
+            return NAN
+        result = self.total / self.period
+        self.total -= self.window.popleft()
+        return result
+
+    def replay(self, values):
+        """依次处理一批数据，只更新状态"""
+        total, window, period = self.total, self.window, self.period
+        for value in values:
+            total += value
+            window.append(value)
+            if len(window) == period:
+                total -= window.popleft()
+        self.total = total
+
+
+class EMAState:
+    """指数移动平均：以前period个值的简单平均为初值，k = 2 / (period + 1)"""
+
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.value = None
+        self._seed_total = 0.0
+        self._seed_count = 0
+
+    def update(self, value):
+        if self.value is None:
+            self._seed_total += value
+            self._seed_count += 1
+            if self._seed_count < self.period:
+                return NAN
+            self.value = self._seed_total / self.period
+            return self.value
+        self.value = (value - self.value) * self.k + self.value
+        return self.value
+
+    def replay(self, values):
+        values = iter(values)
+        if self.value is None:
+            for value in values:
+                if not math.isnan(self.update(value)):
+                    break
+        if self.value is None:
+            return
+        current, k = self.value, self.k
+        for value in values:
+            current = (value - current) * k + current
+        self.value = current
+
+
+class MACDState:
+    """MACD：快线从第 slow - fast 根开始计算，使快慢线在同一根K线完成初值（同 TA-Lib）"""
+
+    columns = ('MACD', 'Signal', 'Histogram')
+
+    def __init__(self, fastperiod, slowperiod, signalperiod):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fast = EMAState(fastperiod)
+        self.slow = EMAState(slowperiod)
+        self.signal = EMAState(signalperiod)
+        self.skip = slowperiod - fastperiod  # 快线跳过的K线数
+        self.count = 0
+
+    def update(self, high, low, close):
+        self.count += 1
+        slow = self.slow.update(close)
+        if self.count <= self.skip:
+            return NAN, NAN, NAN
+        fast = self.fast.update(close)
+        if math.isnan(slow):
+            return NAN, NAN, NAN
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if math.isnan(signal):
+            return NAN, NAN, NAN
+        return macd, signal, macd - signal
+
+    def replay(self, high, low, close):
+        warmup = min(len(close), self.slow.period)
+        for value in close[:warmup]:
+            self.update(NAN, NAN, value)
+        if warmup == len(close):
+            return
+        # 慢线完成初值后逐根计算MACD值，信号线只需要MACD序列
+        rest = close[warmup:]
+        fast, slow = self.fast, self.slow
+        fast_value, fast_k = fast.value, fast.k
+        slow_value, slow_k = slow.value, slow.k
+        macd = []
+        for value in rest:
+            fast_value = (value - fast_value) * fast_k + fast_value
+            slow_value = (value - slow_value) * slow_k + slow_value
+            macd.append(fast_value - slow_value)
+        fast.value, slow.value = fast_value, slow_value
+        self.count += len(rest)
+        self.signal.replay(macd)
+
+
+class RSIState:
+    """Wilder RSI：前period个涨跌幅的简单平均为初值，之后按 (前值 * (period - 1) + 当前) / period 平滑"""
+
+    columns = ('RSI',)
+
+    def __init__(self, period):
+        self.period = period
+        self.previous = None
+        self.gain = 0.0
+        self.loss = 0.0
+        self.count = 0
+
+    def update(self, high, low, close):
+        if self.previous is None:
+            self.previous = close
+            return (NAN,)
+        change = close - self.previous
+        self.previous = close
+        period = self.period
+        if self.count < period:
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+            self.count += 1
+            if self.count < period:
+                return (NAN,)
+        else:
+            self.loss *= (period - 1)
+            self.gain *= (period - 1)
+            if change < 0:
+                self.loss -= change
+            else:
+                self.gain += change
+        self.loss /= period
+        self.gain /= period
+        total = self.gain + self.loss
+        return (0.0 if _is_zero(total) else 100.0 * (self.gain / total),)
+
+    def replay(self, high, low, close):
+        position = 0
+        while position < len(close) and self.count < self.period:
+            self.update(NAN, NAN, close[position])
+            position += 1
+        previous, gain, loss, period = self.previous, self.gain, self.loss, self.period
+        for value in close[position:]:
+            change = value - previous
+            previous = value
+            loss *= (period - 1)
+            gain *= (period - 1)
+            if change < 0:
+                loss -= change
+            else:
+                gain += change
+            loss /= period
+            gain /= period
+        self.previous, self.gain, self.loss = previous, gain, loss
+
+
+class BollState:
+    """布林带：中轨为SMA，标准差由平方和的滑动合计与中轨计算（同 TA-Lib 复用SMA的算法）"""
+
+    columns = ('BB_Upper', 'BB_Middle', 'BB_Lower')
+
+    def __init__(self, period, nbdevup, nbdevdn):
+        self.middle = SMAState(period)
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.squares = SMAState(period)  # 只使用其滑动合计
+
+    def update(self, high, low, close):
+        middle = self.middle.update(close)
+        squares = self.squares
+        squares.total += close * close
+        squares.window.append(close * close)
+        if len(squares.window) < squares.period:
+            return NAN, NAN, NAN
+        variance = squares.total / squares.period
+        squares.total -= squares.window.popleft()
+        variance -= middle * middle
+        deviation = math.sqrt(variance) if variance >= 0.00000001 else 0.0
+        if self.nbdevup == self.nbdevdn:
+            width = deviation * self.nbdevup
+            return middle + width, middle, middle - width
+        return middle + deviation * self.nbdevup, middle, middle - deviation * self.nbdevdn
+
+    def replay(self, high, low, close):
+        self.middle.replay(close)
+        self.squares.replay(close * close)
+
+
+class MAState:
+    """多个周期的简单移动平均"""
+
+    def __init__(self, periods):
+        self.columns = tuple(f'MA{period}' for period in periods)
+        self.states = [SMAState(period) for period in periods]
+
+    def update(self, high, low, close):
+        return tuple(state.update(close) for state in self.states)
+
+    def replay(self, high, low, close):
+        for state in self.states:
+            state.replay(close)
+
+
+class KDJState:
+    """KDJ：快速%K取最近fastk_period根的最高/最低价，K、D依次为SMA平滑，J = 3K - 2D"""
+
+    columns = ('K', 'D', 'J')
+
+    def __init__(self, fastk_period, slowk_period, slowd_period):
+        self.highs = deque(maxlen=fastk_period)
+        self.lows = deque(maxlen=fastk_period)
+        self.slow_k = SMAState(slowk_period)
+        self.slow_d = SMAState(slowd_period)
+
+    def _fast_k(self, close):
+        # 同 TA-Lib：先把区间缩小100倍再相除，运算顺序不同时末位会有差异
+        lowest = min(self.lows)
+        diff = (max(self.highs) - lowest) / 100.0
+        return (close - lowest) / diff if diff != 0.0 else 0.0
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return NAN, NAN, NAN
+        k = self.slow_k.update(self._fast_k(close))
+        if math.isnan(k):
+            return NAN, NAN, NAN
+        d = self.slow_d.update(k)
+        if math.isnan(d):
+            return NAN, NAN, NAN
+        return k, d, 3 * k - 2 * d
+
+    def replay(self, high, low, close):
+        period = self.highs.maxlen
+        if len(close) < period:
+            for values in zip(high, low, close):
+                self.update(*values)
+            return
+        # 快速%K可以对整段数据向量化计算
+        windows = np.lib.stride_tricks.sliding_window_view
+        highest = windows(high, period).max(axis=1)
+        lowest = windows(low, period).min(axis=1)
+        diff = (highest - lowest) / 100.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fast_k = np.where(diff != 0.0, (close[period - 1:] - lowest) / diff, 0.0)
+        self.highs.extend(high[-period:])
+        self.lows.extend(low[-period:])
+        # 慢速K值序列用于D的滑动合计
+        slow_k = self.slow_k
+        total, window, k_period = slow_k.total, slow_k.window, slow_k.period
+        ks = []
+        for value in fast_k.tolist():
+            total += value
+            window.append(value)
+            if len(window) == k_period:
+                ks.append(total / k_period)
+                total -= window.popleft()
+        slow_k.total = total
+        self.slow_d.replay(ks)
+
+
+_STATES = {'MACD': MACDState, 'RSI': RSIState, 'BOLL': BollState, 'MA': MAState, 'KDJ': KDJState}
+
+
+class IndicatorEngine:
+    """一组技术指标的增量计算器，状态与已计算的指标序列一起保存
+
+    序列保存在按需扩容的数组中，frame 返回其前n行的视图；追加只写入第n行之后，
+    已返回的DataFrame不会被修改。
+    """
+
+    def __init__(self, indicators=None):
+        """初始化计算器
+
+        Args:
+            indicators: 指标名称列表或 {名称: 参数字典}，格式同 TechnicalIndicators.calculate_indicators
+        """
+        self.requested = TechnicalIndicators.normalize_indicators(indicators)
+        self.states = [_STATES[name](**params) for name, params in self.requested]
+        self.columns = [column for state in self.states for column in state.columns]
+        self._times = np.empty(0, dtype='datetime64[ns]')
+        self._values = np.empty((0, len(self.columns)))
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def from_history(cls, df, indicators=None):
+        """由完整历史建立计算器：指标序列由 TA-Lib 批量计算，各状态按顺序重放得到
+
+        Args:
+            df: 以Date为索引的OHLC DataFrame（已复权）
+            indicators: 同 __init__
+
+        Returns:
+            IndicatorEngine，批量计算失败时返回None
+        """
+        engine = cls(indicators)
+        frame = TechnicalIndicators.calculate_indicators(df, dict(engine.requested))
+        if frame is None:
+            return None
+        high, low, close = (np.ascontiguousarray(df[column].values, dtype=np.float64)
+                            for column in ('High', 'Low', 'Close'))
+        for state in engine.states:
+            state.replay(high, low, close)
+        engine._reserve(len(frame))
+        engine._times[:len(frame)] = frame.index.values
+        engine._values[:len(frame)] = frame.values
+        engine._size = len(frame)
+        return engine
+
+    def append(self, df):
+        """追加新K线并逐根更新各指标
+
+        Args:
+            df: 以Date为索引的OHLC DataFrame（已复权），日期须晚于已有的最后一根
+        """
+        if len(df) == 0:
+            return
+        self._reserve(self._size + len(df))
+        rows = zip(df['High'].values.tolist(), df['Low'].values.tolist(), df['Close'].values.tolist())
+        for position, (high, low, close) in enumerate(rows, start=self._size):
+            self._values[position] = [value for state in self.states for value in state.update(high, low, close)]
+        self._times[self._size:self._size + len(df)] = df.index.values
+        self._size += len(df)
+
+    def __getstate__(self):
+        # 只保存已使用的部分，扩容留出的空位不落盘
+        state = self.__dict__.copy()
+        state['_times'] = self._times[:self._size].copy()
+        state['_values'] = self._values[:self._size].copy()
+        return state
+
+    def _reserve(self, size):
+        """容量不足时按两倍扩容；旧数组仍被已返回的DataFrame引用，不做原地修改"""
+        if size <= len(self._times):
+            return
+        capacity = max(size, 2 * len(self._times), 256)
+        times = np.empty(capacity, dtype='datetime64[ns]')
+        values = np.full((capacity, len(self.columns)), np.nan)
+        times[:self._size] = self._times[:self._size]
+        values[:self._size] = self._values[:self._size]
+        self._times, self._values = times, values
+
+    def frame(self):
+        """以Date为索引的指标DataFrame，列顺序与 TechnicalIndicators.calculate_indicators 相同"""
+        return pd.DataFrame(self._values[:self._size], index=pd.DatetimeIndex(self._times[:self._size], name='Date'),
+                            columns=self.columns, copy=False)
+
+
+class IndicatorStateStore:
+    """计算器检查点的本地存储，每个(代码, 复权方式, 指标参数)一个pickle文件
+
+    文件只由本进程写入，读取失败、格式版本或指标参数不一致时视为不存在，由调用方重新建立。
+    """
+
+    def __init__(self, base_path):
+        """初始化存储
+
+        Args:
+            base_path: 检查点文件目录
+        """
+        self.base_path = base_path
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def _file_path(self, symbol, adjust, requested):
+        digest = hashlib.md5(requested.encode('utf-8')).hexdigest()[:12]
+        # 检查点为pickle文件，代码不合法时不拼接路径，避免读取目录外的文件
+        return os.path.join(self.base_path, f"{check_file_symbol(symbol)}_{adjust}_{digest}.pkl")
+
+    def load(self, symbol, adjust, requested):
+        """读取检查点
+
+        Args:
+            symbol: 股票代码
+            adjust: 复权方式
+            requested: 标准化后指标参数的 repr
+
+        Returns:
+            (IndicatorEngine, 检查点字典)，不存在或无法使用时返回None
+        """
+        file_path = self._file_path(symbol, adjust, requested)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('format') != STATE_FORMAT or state.get('requested') != requested:
+                return None
+            return state['engine'], state['checkpoint']
+        except Exception as e:
+            print(f"读取技术指标检查点出错 {file_path}: {e}")
+            return None
+
+    def save(self, symbol, adjust, requested, engine, checkpoint):
+        """写入检查点（先写临时文件再原子替换）
+
+        Args:
+            symbol, adjust, requested: 同 load
+            engine: IndicatorEngine
+            checkpoint: 计算器已处理到的位置
+        """
+        file_path = self._file_path(symbol, adjust, requested)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        state = {'format': STATE_FORMAT, 'requested': requested, 'engine': engine, 'checkpoint': checkpoint}
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            print(f"写入技术指标检查点出错 {file_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
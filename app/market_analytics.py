@@ -0,0 +1,330 @@
+"""
+行情分析查询 - 以嵌入式DuckDB直接查询本地Parquet行情存储
+
+只开放预先定义的具名查询，调用方只能传入经过类型和范围校验的参数，无法执行任意SQL；
+结果行数有上限，并按本地数据版本缓存查询结果。duckdb为可选依赖，未安装时查询不可用。
+"""
+import os
+import threading
+import datetime
+from collections import OrderedDict
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class AnalyticsUnavailableError(Exception):
+    """未安装duckdb或本地尚无行情数据"""
+
+
+class QueryParameterError(ValueError):
+    """查询名称或参数不合法"""
+
+
+# 具名查询：bars 视图的列为 symbol, date, open, high, low, close, volume, factor（后复权因子），
+# 收益率、新高等按 close * factor 计算，不受除权影响；$as_of 为空时取全部数据
+QUERIES = {
+    'top_return': {
+        'description': '最近window日涨幅最大的股票，且最新成交量高于近volume_window日均量',
+        'params': {
+            'window': (int, 20, 1, 250),
+            'volume_window': (int, 60, 1, 250),
+        },
+        'sql': """
+            WITH ranked AS (
+                SELECT symbol, date, close, close * factor AS price, volume,
+                       row_number() OVER (PARTITION BY symbol ORDER BY date DESC) AS age
+                FROM bars
+                WHERE $as_of IS NULL OR date <= $as_of
+            ), summary AS (
+                SELECT symbol,
+                       max(date) FILTER (WHERE age = 1) AS date,
+                       max(close) FILTER (WHERE age = 1) AS close,
+                       max(price) FILTER (WHERE age = 1) AS price,
+                       max(price) FILTER (WHERE age = $window + 1) AS base_price,
+                       max(volume) FILTER (WHERE age = 1) AS volume,
+                       avg(volume) FILTER (WHERE age <= $volume_window) AS volume_mean,
+                       count(*) FILTER (WHERE age <= $volume_window) AS volume_bars
+                FROM ranked
+                WHERE age <= greatest($window, $volume_window) + 1
+                GROUP BY symbol
+            )
+            SELECT symbol, date, close, round(price / base_price - 1, 6) AS return,
+                   volume, round(volume_mean, 2) AS volume_mean
+            FROM summary
+            WHERE base_price > 0 AND volume_bars = $volume_window AND volume > volume_mean
+            ORDER BY return DESC, symbol
+            LIMIT $limit
+        """,
+    },
+    'new_high': {
+        'description': '最新收盘价创近window日新高的股票',
+        'params': {
+            'window': (int, 60, 2, 1000),
+        },
+        'sql': """
+            WITH ranked AS (
+                SELECT symbol, date, close, close * factor AS price,
+                       row_number() OVER (PARTITION BY symbol ORDER BY date DESC) AS age
+                FROM bars
+                WHERE $as_of IS NULL OR date <= $as_of
+            ), summary AS (
+                SELECT symbol,
+                       max(date) FILTER (WHERE age = 1) AS date,
+                       max(close) FILTER (WHERE age = 1) AS close,
+                       max(price) FILTER (WHERE age = 1) AS price,
+                       max(price) FILTER (WHERE age > 1) AS previous_high,
+                       count(*) AS bars
+                FROM ranked
+                WHERE age <= $window
+                GROUP BY symbol
+            )
+            SELECT symbol, date, close, round(price / previous_high - 1, 6) AS above_previous_high
+            FROM summary
+            WHERE bars = $window AND price > previous_high
+            ORDER BY above_previous_high DESC, symbol
+            LIMIT $limit
+        """,
+    },
+    'volume_surge': {
+        'description': '最新成交量达到此前window日均量ratio倍以上的股票',
+        'params': {
+            'window': (int, 20, 1, 250),
+            'ratio': (float, 2.0, 1.0, 100.0),
+        },
+        'sql': """
+            WITH ranked AS (
+                SELECT symbol, date, close, volume,
+                       row_number() OVER (PARTITION BY symbol ORDER BY date DESC) AS age
+                FROM bars
+                WHERE $as_of IS NULL OR date <= $as_of
+            ), summary AS (
+                SELECT symbol,
+                       max(date) FILTER (WHERE age = 1) AS date,
+                       max(close) FILTER (WHERE age = 1) AS close,
+                       max(volume) FILTER (WHERE age = 1) AS volume,
+                       avg(volume) FILTER (WHERE age > 1) AS volume_mean,
+                       count(*) AS bars
+                FROM ranked
+                WHERE age <= $window + 1
+                GROUP BY symbol
+            )
+            SELECT symbol, date, close, volume, round(volume_mean, 2) AS volume_mean,
+                   round(volume / volume_mean, 3) AS volume_ratio
+            FROM summary
+            WHERE bars = $window + 1 AND volume_mean > 0 AND volume >= volume_mean * $ratio
+            ORDER BY volume_ratio DESC, symbol
+            LIMIT $limit
+        """,
+    },
+}
+
+
+class MarketAnalytics:
+    """本地行情存储上的只读具名查询"""
+
+    def __init__(self, base_path, max_rows=None, cache_size=None, timeout=None):
+        """初始化查询引擎
+
+        Args:
+            base_path: 本地行情存储目录（与 MarketDataStore 相同）
+            max_rows: 单次查询最多返回的行数，默认读取 ANALYTICS_MAX_ROWS
+            cache_size: 缓存的查询结果数，默认读取 ANALYTICS_CACHE_SIZE
+            timeout: 单次查询超时秒数，超时后中断查询，默认读取 ANALYTICS_TIMEOUT_SECONDS
+        """
+        self.base_path = base_path
+        self.max_rows = int(max_rows or os.getenv('ANALYTICS_MAX_ROWS', '500'))
+        self.cache_size = int(cache_size or os.getenv('ANALYTICS_CACHE_SIZE', '64'))
+        self.timeout = float(timeout or os.getenv('ANALYTICS_TIMEOUT_SECONDS', '30'))
+        self._lock = threading.Lock()
+        self._connection = None
+        self._views_version = None
+        self._cache = OrderedDict()  # (查询名, 参数, 数据版本) -> 结果
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def available():
+        return duckdb is not None
+
+    @staticmethod
+    def describe():
+        """返回可用查询及其参数说明"""
+        return {
+            name: {
+                'description': query['description'],
+                'params': {key: {'type': kind.__name__, 'default': default, 'min': low, 'max': high}
+                           for key, (kind, default, low, high) in query['params'].items()}
+            }
+            for name, query in QUERIES.items()
+        }
+
+    def data_version(self):
+        """本地日线及复权因子文件的数量和最新修改时间，文件变化后缓存自动失效"""
+        count, latest = 0, 0
+        with os.scandir(self.base_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(('_none.parquet', '_hfq_factor.parquet')):
+                    count += 1
+                    latest = max(latest, entry.stat().st_mtime_ns)
+        return count, latest
+
+    def parse_params(self, name, args):
+        """按查询定义校验参数，缺省的参数取默认值
+
+        Args:
+            name: 查询名称
+            args: 请求参数字典，值为字符串或数值
+
+        Returns:
+            绑定到SQL的参数字典（含 limit 和 as_of）
+        """
+        if name not in QUERIES:
+            raise QueryParameterError(f"未知的查询: {name}")
+        params = {}
+        for key, (kind, default, low, high) in QUERIES[name]['params'].items():
+            value = args.get(key)
+            try:
+                value = default if value in (None, '') else kind(value)
+            except (TypeError, ValueError):
+                raise QueryParameterError(f"参数 {key} 应为 {kind.__name__}")
+            if not low <= value <= high:
+                raise QueryParameterError(f"参数 {key} 应在 {low} 到 {high} 之间")
+            params[key] = value
+        try:
+            limit = int(args.get('limit') or 50)
+        except (TypeError, ValueError):
+            raise QueryParameterError("参数 limit 应为 int")
+        params['limit'] = max(1, min(limit, self.max_rows))
+        as_of = args.get('as_of')
+        try:
+            params['as_of'] = pd.Timestamp(as_of).date() if as_of else None
+        except ValueError:
+            raise QueryParameterError("参数 as_of 应为日期")
+        return params
+
+    def run(self, name, args=None):
+        """执行具名查询
+
+        Args:
+            name: 查询名称，见 QUERIES
+            args: 查询参数，另可包含 limit（不超过 max_rows）和 as_of（截止日期）
+
+        Returns:
+            {'query', 'params', 'columns', 'rows', 'row_count', 'data_version', 'cached', 'elapsed_ms'}
+        """
+        if duckdb is None:
+            raise AnalyticsUnavailableError('未安装duckdb，行情分析查询不可用')
+        params = self.parse_params(name, args or {})
+        version = self.data_version()
+        if version[0] == 0:
+            raise AnalyticsUnavailableError('本地尚无行情数据')
+        key = (name, tuple(sorted(params.items())), version)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return dict(self._cache[key], cached=True)
+            self._misses += 1
+            self._ensure_views(version)
+            cursor = self._connection.cursor()
+
+        started = datetime.datetime.now()
+        # DuckDB没有语句超时，到时由定时器中断查询
+        timer = threading.Timer(self.timeout, cursor.interrupt)
+        timer.start()
+        try:
+            df = cursor.execute(QUERIES[name]['sql'], params).df()
+        except duckdb.InterruptException:
+            raise AnalyticsUnavailableError(f"查询超时（{self.timeout:g}秒）")
+        finally:
+            timer.cancel()
+            cursor.close()
+
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        result = {
+            'query': name,
+            'params': {k: (v.isoformat() if isinstance(v, datetime.date) else v) for k, v in params.items()},
+            'columns': list(df.columns),
+            'rows': df.astype(object).where(df.notna(), None).values.tolist(),
+            'row_count': len(df),
+            'data_version': f"{version[0]}-{version[1]}",
+            'elapsed_ms': round((datetime.datetime.now() - started).total_seconds() * 1000, 1)
+        }
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(result, cached=False)
+
+    def _ensure_views(self, version):
+        """创建（或在文件变化后重建）bars 视图，需持有 _lock"""
+        if self._connection is None:
+            self._connection = duckdb.connect(':memory:')
+        if self._views_version == version:
+            return
+        bars_glob = self._glob('none')
+        factor_glob = self._glob('hfq_factor')
+        self._connection.execute(f"""
+            CREATE OR REPLACE VIEW raw_bars AS
+            SELECT {self._symbol_expression('none')} AS symbol, {self._date_expression(bars_glob)} AS date,
+                   -- 紧凑格式以float32保存价格，按A股价格精度还原（同 from_compact）
+                   round(CAST("Open" AS DOUBLE), 3) AS open, round(CAST("High" AS DOUBLE), 3) AS high,
+                   round(CAST("Low" AS DOUBLE), 3) AS low, round(CAST("Close" AS DOUBLE), 3) AS close,
+                   CAST("Volume" AS DOUBLE) AS volume
+            FROM read_parquet('{bars_glob}', filename = true, union_by_name = true)
+        """)
+        has_factors = self._connection.execute(f"SELECT count(*) FROM glob('{factor_glob}')").fetchone()[0] > 0
+        if has_factors:
+            self._connection.execute(f"""
+                CREATE OR REPLACE VIEW factors AS
+                SELECT {self._symbol_expression('hfq_factor')} AS symbol, {self._date_expression(factor_glob)} AS date,
+                       CAST(hfq_factor AS DOUBLE) AS factor
+                FROM read_parquet('{factor_glob}', filename = true, union_by_name = true)
+            """)
+            # 与 attach_factors 一致：取日期不晚于该K线的最近一个因子，早于第一个因子时取第一个因子
+            self._connection.execute("""
+                CREATE OR REPLACE VIEW bars AS
+                SELECT b.*, coalesce(f.factor, first.factor, 1.0) AS factor
+                FROM raw_bars b
+                ASOF LEFT JOIN factors f ON b.symbol = f.symbol AND b.date >= f.date
+                LEFT JOIN (SELECT symbol, arg_min(factor, date) AS factor FROM factors GROUP BY symbol) first
+                       ON b.symbol = first.symbol
+            """)
+        else:
+            self._connection.execute("CREATE OR REPLACE VIEW bars AS SELECT *, 1.0 AS factor FROM raw_bars")
+        self._views_version = version
+
+    def _glob(self, kind):
+        return os.path.join(self.base_path, f'*_{kind}.parquet').replace("'", "''")
+
+    @staticmethod
+    def _symbol_expression(kind):
+        """由文件名提取股票代码的SQL表达式"""
+        return f"regexp_extract(filename, '([^/\\\\]+)_{kind}\\.parquet$', 1)"
+
+    def _date_expression(self, glob):
+        """日期列的SQL表达式：文件以Date（时间戳）或紧凑格式的Day（天数）为日期列，按实际存在的列转换"""
+        columns = {row[0] for row in self._connection.execute(
+            f"DESCRIBE SELECT * FROM read_parquet('{glob}', union_by_name = true)").fetchall()}
+        dates = []
+        if 'Date' in columns:
+            dates.append('CAST("Date" AS DATE)')
+        if 'Day' in columns:
+            dates.append('DATE \'1970-01-01\' + CAST("Day" AS INTEGER)')
+        return f"COALESCE({', '.join(dates)})" if len(dates) > 1 else dates[0]
+
+    def stats(self):
+        """返回查询引擎状态"""
+        with self._lock:
+            return {
+                'available': self.available(),
+                'max_rows': self.max_rows,
+                'cached_results': len(self._cache),
+                'cache_hits': self._hits,
+                'cache_misses': self._misses
+            }
@@ -0,0 +1,296 @@
+"""
+全市场技术指标 - 对日期×股票矩阵沿时间轴一次性向量化计算所有股票的MA、EMA/MACD、RSI、布林带及KDJ
+
+矩阵中股票未上市或停牌的日期为NaN。计算前先把每只股票的有效K线按顺序压紧到各列顶部，
+所有股票的预热期因此对齐，结果与对单只股票的K线序列逐一计算一致（指标口径同 TechnicalIndicators），
+最后再按原日期位置展开。结果为float32；滑动窗口合计使用float64累加，避免长序列的精度损失。
+"""
+import numpy as np
+from .technical_indicators import TechnicalIndicators
+
+
+class MarketIndicators:
+    """全市场指标计算器，同一组价格矩阵上的多个指标共用压紧后的输入和临时缓冲区"""
+
+    def __init__(self, close, high=None, low=None):
+        """初始化计算器
+
+        Args:
+            close: 收盘价矩阵，形状为 (日期数, 股票数)，NaN表示该日没有K线
+            high: 最高价矩阵，计算KDJ时需要
+            low: 最低价矩阵，计算KDJ时需要
+        """
+        close = np.asarray(close)
+        self.shape = close.shape
+        rows, columns = self.shape
+        valid = ~np.isnan(close)
+        # 各列的有效K线均从第一行开始连续排列时（没有未上市及停牌的空行）无需压紧和展开
+        self._identity = not (valid[1:] & ~valid[:-1]).any()
+        if self._identity:
+            self.lengths = valid.sum(axis=0, dtype=np.int32)
+        else:
+            # 有效K线在原矩阵及压紧后矩阵中的扁平位置，逐行累加得到各K线在本列中的序号
+            ranks = valid.astype(np.int32)
+            for t in range(1, rows):
+                np.add(ranks[t - 1], ranks[t], out=ranks[t])
+            self.lengths = ranks[-1]
+            self._source = np.flatnonzero(valid)
+            self._target = (ranks.ravel()[self._source] - 1).astype(np.intp) * columns + self._source % columns
+        self.rows = int(self.lengths.max()) if close.size else 0
+        self.close = self._pack(close)
+        self.high = self._pack(high) if high is not None else None
+        self.low = self._pack(low) if low is not None else None
+        self._scratch = [None, None]
+        self._close_cumulative = None
+
+    @classmethod
+    def from_matrix(cls, matrix, start_date=None, end_date=None):
+        """由 MarketMatrix 的日期区间建立计算器
+
+        Returns:
+            (计算器, 日期数组, 股票代码数组)
+        """
+        rows = matrix.date_range(start_date, end_date)
+        return (cls(matrix['close'][rows], matrix['high'][rows], matrix['low'][rows]),
+                matrix.dates[rows], matrix.symbols)
+
+    def _pack(self, values):
+        """把各列的有效K线依次压紧到顶部，之后的位置为NaN"""
+        values = np.asarray(values, dtype=np.float32)
+        if self._identity:
+            return np.array(values[:self.rows], dtype=np.float32)
+        packed = np.full((self.rows, self.shape[1]), np.nan, dtype=np.float32)
+        packed.ravel()[self._target] = values.ravel()[self._source]
+        return packed
+
+    def _unpack(self, packed, last=None):
+        """按原日期位置展开压紧的结果
+
+        Args:
+            packed: 压紧矩阵上的计算结果
+            last: 只展开最后last个日期，默认全部展开
+        """
+        rows, columns = self.shape
+        first = 0 if last is None else max(rows - int(last), 0)
+        if self._identity:
+            if rows == self.rows:
+                return packed[first:]
+            out = np.full((rows - first, columns), np.nan, dtype=np.float32)
+            out[:max(self.rows - first, 0)] = packed[first:]
+            return out
+        out = np.full((rows - first, columns), np.nan, dtype=np.float32)
+        start = np.searchsorted(self._source, first * columns)
+        out.ravel()[self._source[start:] - first * columns] = packed.ravel()[self._target[start:]]
+        return out
+
+    def _running_sum(self, values, start=0, square=False, slot=1):
+        """压紧矩阵从第start行起、相对该行取值的偏移量（或其平方）的float64累计和，首行为0
+
+        以偏移量累加可减小float64合计的舍入误差；逐行累加，避免沿第0轴cumsum的跨步访存。
+        slot 指定使用的临时缓冲区，0号固定保存收盘价的累计和。
+        """
+        if self._scratch[slot] is None:
+            self._scratch[slot] = np.empty((self.rows + 1, self.shape[1]), dtype=np.float64)
+        cumulative = self._scratch[slot][:len(values) - start + 1]
+        cumulative[0] = 0.0
+        body = cumulative[1:]
+        body[:] = values[start:]
+        body -= values[start]
+        if square:
+            np.square(body, out=body)
+        for t in range(1, len(body)):
+            np.add(body[t - 1], body[t], out=body[t])
+        return cumulative
+
+    def _close_sum(self):
+        """收盘价的累计和，MA各周期及布林带中轨共用"""
+        if self._close_cumulative is None:
+            self._close_cumulative = self._running_sum(self.close, slot=0)
+        return self._close_cumulative
+
+    def _sma(self, values, period, out, start=0, cumulative=None):
+        """对压紧矩阵从第start行起计算简单移动平均，写入out（float32）
+
+        cumulative 为已算好的 values 自第start行起的累计和，省略时现算。
+        """
+        out[:] = np.nan
+        if len(values) - start < period:
+            return out
+        if cumulative is None:
+            cumulative = self._running_sum(values, start)
+        window = out[start + period - 1:]
+        np.subtract(cumulative[period:], cumulative[:-period], out=window, casting='same_kind')
+        window /= period
+        window += values[start]
+        return out
+
+    @staticmethod
+    def _rolling_extreme(values, period, reduce):
+        """滑动窗口最大/最小值，返回第period-1行起的结果
+
+        窗口宽度逐次翻倍，最后用两个重叠窗口合并，只需约 log2(period) 次向量比较。
+        """
+        current, spare = values, np.empty_like(values)
+        width = 1
+        while width * 2 <= period:
+            # 各行只依赖本行及之前width行，前width行的结果无效也不会被用到
+            reduce(current[width:], current[:-width], out=spare[width:])
+            current, spare = spare, (np.empty_like(values) if current is values else current)
+            width *= 2
+        return reduce(current[period - 1:], current[width - 1:len(values) - period + width])
+
+    @staticmethod
+    def _smooth(values, alpha, out, seed_row):
+        """指数平滑递推 out[t] = (values[t] - out[t-1]) * alpha + out[t-1]，out[seed_row]须已写入初值
+
+        values/out 的第二维可以堆叠多组序列，alpha按组广播，每个日期只需三次向量运算。
+        """
+        for t in range(seed_row + 1, len(values)):
+            row, previous = out[t], out[t - 1]
+            np.subtract(values[t], previous, out=row)
+            row *= alpha
+            row += previous
+        return out
+
+    def ma(self, period, last=None):
+        """简单移动平均"""
+        out = self._sma(self.close, period, np.empty_like(self.close), cumulative=self._close_sum())
+        return self._unpack(out, last)
+
+    def macd(self, fastperiod=12, slowperiod=26, signalperiod=9, last=None):
+        """MACD，快线从第 slow - fast 根开始计算，快慢线在同一行完成初值（同 TA-Lib）
+
+        Returns:
+            (MACD, Signal, Histogram)
+        """
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        close = self.close
+        rows, columns = close.shape
+        macd = np.full_like(close, np.nan)
+        signal = np.full_like(close, np.nan)
+        seed = slowperiod - 1
+        if rows >= slowperiod:
+            # 快慢两条EMA堆叠为 (日期, 2, 股票) 同时递推
+            emas = np.empty((rows, 2, columns), dtype=np.float32)
+            emas[seed, 0] = close[slowperiod - fastperiod:slowperiod].mean(axis=0, dtype=np.float64)
+            emas[seed, 1] = close[:slowperiod].mean(axis=0, dtype=np.float64)
+            alpha = np.array([[2.0 / (fastperiod + 1)], [2.0 / (slowperiod + 1)]], dtype=np.float32)
+            self._smooth(np.broadcast_to(close[:, None, :], emas.shape), alpha, emas, seed)
+            np.subtract(emas[seed:, 0], emas[seed:, 1], out=macd[seed:])
+        signal_seed = seed + signalperiod - 1
+        if rows > signal_seed:
+            signal[signal_seed] = macd[seed:signal_seed + 1].mean(axis=0, dtype=np.float64)
+            self._smooth(macd, np.float32(2.0 / (signalperiod + 1)), signal, signal_seed)
+        # 信号线完成初值之前MACD也不输出
+        macd[:signal_seed] = np.nan
+        histogram = np.subtract(macd, signal)
+        return self._unpack(macd, last), self._unpack(signal, last), self._unpack(histogram, last)
+
+    def rsi(self, period=14, last=None):
+        """Wilder RSI：前period个涨跌幅的简单平均为初值，之后以 1/period 为系数平滑"""
+        close = self.close
+        rows, columns = close.shape
+        out = np.full_like(close, np.nan)
+        if rows <= period:
+            return self._unpack(out, last)
+        # 上涨、下跌幅度堆叠为 (日期, 2, 股票) 同时平滑，第t行为第t-1到第t根的变化
+        moves = np.empty((rows, 2, columns), dtype=np.float32)
+        np.subtract(close[1:], close[:-1], out=moves[1:, 0])
+        np.negative(moves[1:, 0], out=moves[1:, 1])
+        np.maximum(moves[1:], 0, out=moves[1:])
+        averages = np.empty_like(moves)
+        averages[period] = moves[1:period + 1].mean(axis=0, dtype=np.float64)
+        self._smooth(moves, np.float32(1.0 / period), averages, period)
+        gain, loss = averages[period:, 0], averages[period:, 1]
+        total = gain + loss
+        target = out[period:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(gain, total, out=target)
+        target *= 100
+        target[np.abs(total) < 1e-8] = 0.0
+        return self._unpack(out, last)
+
+    def bollinger(self, period=20, nbdevup=2, nbdevdn=2, last=None):
+        """布林带，标准差为总体标准差（同 TA-Lib）
+
+        Returns:
+            (BB_Upper, BB_Middle, BB_Lower)
+        """
+        close = self.close
+        middle = np.full_like(close, np.nan)
+        deviation = np.full_like(close, np.nan)
+        if len(close) >= period:
+            # 均值及方差均由偏移量（以每列第一个值为基准）的float64滑动合计计算
+            cumulative = self._close_sum()
+            mean = cumulative[period:] - cumulative[:-period]
+            mean /= period
+            squares = self._running_sum(close, square=True)
+            variance = squares[period:] - squares[:-period]
+            variance /= period
+            variance -= np.square(mean)
+            np.maximum(variance, 0.0, out=variance)
+            np.sqrt(variance, out=variance)
+            deviation[period - 1:] = variance
+            mean += close[0]
+            middle[period - 1:] = mean
+        upper = deviation * np.float32(nbdevup)
+        upper += middle
+        lower = deviation
+        lower *= np.float32(-nbdevdn)
+        lower += middle
+        return self._unpack(upper, last), self._unpack(middle, last), self._unpack(lower, last)
+
+    def kdj(self, fastk_period=9, slowk_period=3, slowd_period=3, last=None):
+        """KDJ：K、D为快速%K的两次简单移动平均，J = 3K - 2D
+
+        Returns:
+            (K, D, J)
+        """
+        if self.high is None or self.low is None:
+            raise ValueError('计算KDJ需要最高价和最低价矩阵')
+        close = self.close
+        rows = len(close)
+        fast_k = np.full_like(close, np.nan)
+        if rows >= fastk_period:
+            highest = self._rolling_extreme(self.high, fastk_period, np.maximum)
+            lowest = self._rolling_extreme(self.low, fastk_period, np.minimum)
+            target = fast_k[fastk_period - 1:]
+            np.subtract(close[fastk_period - 1:], lowest, out=target)
+            highest -= lowest
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.divide(target, highest, out=target)
+            target *= 100
+            target[highest == 0] = 0.0
+        k = self._sma(fast_k, slowk_period, np.empty_like(close), start=fastk_period - 1)
+        d = self._sma(k, slowd_period, np.empty_like(close), start=fastk_period + slowk_period - 2)
+        # D完成初值之前K也不输出（同 TA-Lib）
+        k[:fastk_period + slowk_period + slowd_period - 3] = np.nan
+        j = k * np.float32(3)
+        j -= d * np.float32(2)
+        return self._unpack(k, last), self._unpack(d, last), self._unpack(j, last)
+
+    def calculate(self, indicators=None, last=None):
+        """计算一组指标
+
+        Args:
+            indicators: 指标名称列表或 {名称: 参数字典}，格式同 TechnicalIndicators.calculate_indicators
+            last: 只返回最后last个日期的结果（如扫描只需要最新一天），默认返回全部日期
+
+        Returns:
+            {列名: (日期数, 股票数) 的float32矩阵}，列名与 TechnicalIndicators 相同
+        """
+        results = {}
+        for name, params in TechnicalIndicators.normalize_indicators(indicators):
+            if name == 'MA':
+                values = [self.ma(period, last) for period in params['periods']]
+            elif name == 'MACD':
+                values = self.macd(**params, last=last)
+            elif name == 'RSI':
+                values = [self.rsi(**params, last=last)]
+            elif name == 'BOLL':
+                values = self.bollinger(**params, last=last)
+            else:
+                values = self.kdj(**params, last=last)
+            results.update(zip(TechnicalIndicators.indicator_columns(name, params), values))
+        return results
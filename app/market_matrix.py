@@ -0,0 +1,209 @@
+"""
+全市场行情矩阵 - 以日期×股票的内存映射NumPy文件存储全市场日线数据
+"""
+import os
+import time
+import uuid
+import shutil
+import contextlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，构建锁不生效，不要在多个进程中同时构建
+    fcntl = None
+
+# 矩阵字段及其数据类型
+MATRIX_FIELDS = {
+    'open': np.float32,
+    'high': np.float32,
+    'low': np.float32,
+    'close': np.float32,
+    'volume': np.float64,
+}
+
+# DataFrame列名与矩阵字段的对应关系
+COLUMN_FIELDS = {'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}
+
+# 版本目录写完所有文件后写入的完成标记，内容为构建完成时间（纳秒），没有标记的目录可能仍在写入
+COMPLETE_MARKER = 'COMPLETE'
+
+
+class MarketMatrix:
+    """只读的全市场矩阵视图，各字段均为 (日期数, 股票数) 的内存映射数组"""
+
+    def __init__(self, path):
+        """打开矩阵目录
+
+        Args:
+            path: 某一版本矩阵所在目录
+        """
+        self.path = path
+        self.dates = np.load(os.path.join(path, 'dates.npy'))
+        self.symbols = np.load(os.path.join(path, 'symbols.npy'))
+        self._symbol_positions = {symbol: i for i, symbol in enumerate(self.symbols.tolist())}
+        self.fields = {
+            field: np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r')
+            for field in MATRIX_FIELDS
+        }
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    @property
+    def shape(self):
+        return len(self.dates), len(self.symbols)
+
+    def symbol_position(self, symbol):
+        """返回股票所在列号，不存在时返回None"""
+        return self._symbol_positions.get(symbol)
+
+    def date_range(self, start_date=None, end_date=None):
+        """返回日期区间对应的行切片（二分查找，结果用于零拷贝切片）"""
+        start = 0 if start_date is None else int(np.searchsorted(self.dates, np.datetime64(start_date, 'D'), side='left'))
+        end = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='right'))
+        return slice(start, end)
+
+
+class MarketMatrixStore:
+    """全市场矩阵存储，每次构建写入新版本目录，并原子更新 CURRENT 指针
+
+    构建和切换版本由文件锁 BUILD.lock 串行化（如 run.py matrix 与收盘后预取同时构建）。
+    切换后只删除比被替换版本更早的已完成版本：被替换的版本保留到下一次构建，
+    刚读到旧 CURRENT 指针、尚未打开文件的读者不会找不到目录。
+    """
+
+    def __init__(self, base_path):
+        """初始化存储
+
+        Args:
+            base_path: 矩阵存放目录，通常位于本地行情存储目录下
+        """
+        self.base_path = base_path
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def _current_pointer(self):
+        return os.path.join(self.base_path, 'CURRENT')
+
+    def _current_version(self):
+        """读取 CURRENT 指针，尚未构建时返回None"""
+        try:
+            with open(self._current_pointer()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @contextlib.contextmanager
+    def _build_lock(self):
+        """跨进程的构建锁，同一时间只有一个进程构建及切换版本"""
+        with open(os.path.join(self.base_path, 'BUILD.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def build(self, frames):
+        """由各股票日线构建全市场矩阵
+
+        Args:
+            frames: {股票代码: 以Date为索引的OHLCV DataFrame}
+
+        Returns:
+            新版本的 MarketMatrix
+        """
+        with self._build_lock():
+            version_path = self._write_version(frames)
+            version = os.path.basename(version_path)
+            replaced = self._current_version()
+
+            # 先写临时指针再替换，读者始终看到完整的版本
+            tmp_pointer = f"{self._current_pointer()}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_pointer, 'w') as f:
+                f.write(version)
+            os.replace(tmp_pointer, self._current_pointer())
+
+            self._remove_old_versions(replaced, keep=version)
+        return MarketMatrix(version_path)
+
+    def _write_version(self, frames):
+        """写入一个新版本目录，所有文件写完后写入完成标记
+
+        Returns:
+            版本目录路径
+        """
+        symbols = sorted(symbol for symbol, df in frames.items() if df is not None and len(df) > 0)
+        if symbols:
+            dates = np.unique(np.concatenate([
+                frames[symbol].index.values.astype('datetime64[D]') for symbol in symbols
+            ]))
+        else:
+            dates = np.array([], dtype='datetime64[D]')
+
+        version_path = os.path.join(self.base_path, f"v{uuid.uuid4().hex[:12]}")
+        os.makedirs(version_path)
+
+        np.save(os.path.join(version_path, 'dates.npy'), dates)
+        np.save(os.path.join(version_path, 'symbols.npy'), np.array(symbols, dtype=str))
+
+        shape = (len(dates), len(symbols))
+        matrices = {
+            field: np.lib.format.open_memmap(os.path.join(version_path, f'{field}.npy'),
+                                             mode='w+', dtype=dtype, shape=shape)
+            for field, dtype in MATRIX_FIELDS.items()
+        }
+        for matrix in matrices.values():
+            matrix[:] = np.nan
+
+        for column_index, symbol in enumerate(symbols):
+            df = frames[symbol]
+            rows = np.searchsorted(dates, df.index.values.astype('datetime64[D]'))
+            for column, field in COLUMN_FIELDS.items():
+                if column in df.columns:
+                    matrices[field][rows, column_index] = df[column].values
+
+        for matrix in matrices.values():
+            matrix.flush()
+        del matrices
+
+        with open(os.path.join(version_path, COMPLETE_MARKER), 'w') as f:
+            f.write(str(time.time_ns()))
+        return version_path
+
+    def open(self):
+        """打开当前版本矩阵，尚未构建时返回None"""
+        for _ in range(3):
+            version = self._current_version()
+            if version is None:
+                return None
+            try:
+                return MarketMatrix(os.path.join(self.base_path, version))
+            except FileNotFoundError:
+                # 读取指针后版本被其他进程删除（极少发生），重新读取指针
+                continue
+        return None
+
+    def _completed_at(self, name):
+        """返回版本的构建完成时间（纳秒），不是已完成的版本目录时返回None"""
+        try:
+            with open(os.path.join(self.base_path, name, COMPLETE_MARKER)) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _remove_old_versions(self, replaced, keep):
+        """删除比被替换版本更早完成的版本目录（已打开的内存映射在Linux/macOS下仍然有效）
+
+        被替换的版本、当前版本及没有完成标记的目录（其他进程可能正在写入）均保留。
+        """
+        cutoff = self._completed_at(replaced) if replaced else None
+        if cutoff is None:
+            return
+        for name in os.listdir(self.base_path):
+            if name in (keep, replaced) or not name.startswith('v'):
+                continue
+            completed_at = self._completed_at(name)
+            if completed_at is not None and completed_at < cutoff:
+                shutil.rmtree(os.path.join(self.base_path, name), ignore_errors=True)
@@ -0,0 +1,110 @@
+"""
+本地行情存储 - 按股票代码持久化不复权日线OHLCV数据及复权因子
+"""
+import os
+import re
+import uuid
+import pandas as pd
+from .compact_frame import index_days, day_number
+
+# 拼接进文件名的股票代码只允许字母和数字，防止路径穿越
+FILE_SYMBOL_PATTERN = re.compile(r'[A-Za-z0-9]+')
+
+
+def check_file_symbol(symbol):
+    """校验用于拼接文件路径的股票代码
+
+    Raises:
+        ValueError: 代码为空或包含字母、数字以外的字符
+    """
+    if not isinstance(symbol, str) or not FILE_SYMBOL_PATTERN.fullmatch(symbol):
+        raise ValueError(f"股票代码格式错误: {symbol!r}")
+    return symbol
+
+
+class MarketDataStore:
+    """日线数据本地存储，每个(股票代码, 数据类型)对应一个Parquet文件"""
+
+    def __init__(self, base_path=None):
+        """初始化存储
+
+        Args:
+            base_path: 数据存放目录，默认读取环境变量 MARKET_DATA_DIR，否则为 data/market
+        """
+        self.base_path = base_path or os.getenv('MARKET_DATA_DIR', 'data/market')
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def _file_path(self, symbol, kind):
+        """返回数据文件路径，代码不合法时抛出ValueError"""
+        return os.path.join(self.base_path, f"{check_file_symbol(symbol)}_{kind}.parquet")
+
+    def load(self, symbol, kind):
+        """读取本地数据
+
+        Args:
+            symbol: 股票代码
+            kind: 数据类型，'none'为不复权日线，'hfq_factor'为后复权因子
+
+        Returns:
+            以Date（紧凑格式为Day）为索引的DataFrame，不存在时返回None
+        """
+        file_path = self._file_path(symbol, kind)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            df = pd.read_parquet(file_path)
+            # 紧凑格式以int32天数 Day 作为索引列
+            index_column = 'Date' if 'Date' in df.columns else 'Day'
+            return df.set_index(index_column).sort_index()
+        except Exception as e:
+            print(f"读取本地行情数据出错 {file_path}: {e}")
+            return None
+
+    def save(self, symbol, kind, df):
+        """写入本地数据（先写临时文件再原子替换，避免并发读到半个文件）
+
+        Args:
+            symbol: 股票代码
+            kind: 数据类型，'none'为不复权日线，'hfq_factor'为后复权因子
+            df: 以Date为索引的DataFrame
+        """
+        file_path = self._file_path(symbol, kind)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.reset_index().to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            print(f"写入本地行情数据出错 {file_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def list_symbols(self, kind='none'):
+        """返回本地已存储指定类型数据的股票代码列表"""
+        suffix = f"_{kind}.parquet"
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.base_path) if name.endswith(suffix))
+
+    @staticmethod
+    def is_fresh(df, session):
+        """判断本地数据是否已包含指定交易日（通常为最近一个已收盘的交易日）的K线
+
+        只看最后一根K线的日期，不看文件修改时间：收盘后上游尚未发布当日K线时同步的数据不算最新。
+        """
+        return df is not None and len(df) > 0 and int(index_days(df.index[-1:])[0]) >= day_number(session)
+
+    @staticmethod
+    def merge(stored, fresh):
+        """合并已有数据与新增数据，日期重复时以新数据为准
+
+        Args:
+            stored: 本地已有DataFrame
+            fresh: 新获取的DataFrame
+
+        Returns:
+            合并后按日期排序的DataFrame
+        """
+        if stored is None or len(stored) == 0:
+            return fresh
+        if fresh is None or len(fresh) == 0:
+            return stored
+        df = pd.concat([stored[stored.index < fresh.index[0]], fresh])
+        return df[~df.index.duplicated(keep='last')].sort_index()
@@ -0,0 +1,196 @@
+"""
+收盘后预取调度 - 每个交易日收盘后刷新A股列表快照，同步自选股及常用指数的本地数据，
+预先计算技术指标并生成默认K线图，最后由本地存储重建全市场矩阵
+
+早盘集中访问时直接命中内存缓存和已生成的图表；预取使用少量线程并限制访问上游的频率。
+"""
+import os
+import json
+import time
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 预先生成的默认K线图参数，与页面默认选项一致
+DEFAULT_CHART = {'period': 'daily', 'adjust': 'qfq', 'days': 60, 'show_volume': True, 'mav': (5, 20)}
+
+
+class RateLimiter:
+    """限制调用频率，相邻两次调用至少间隔 min_interval 秒"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        """阻塞到允许下一次调用"""
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+class PrefetchScheduler:
+    """收盘后预取调度器"""
+
+    def __init__(self, client, symbols=None, workers=None, min_interval=None, delay_minutes=None):
+        """初始化调度器
+
+        Args:
+            client: AKShareClient实例
+            symbols: 自选股代码列表，默认读取 STOCK_WATCHLIST（逗号分隔）
+            workers: 预取线程数，默认读取 PREFETCH_WORKERS
+            min_interval: 相邻两只股票同步的最小间隔（秒），默认读取 PREFETCH_MIN_INTERVAL_MS
+            delay_minutes: 收盘后延迟多少分钟开始预取，等待数据源更新当日数据，默认读取 PREFETCH_DELAY_MINUTES
+        """
+        self.client = client
+        if symbols is None:
+            symbols = [s.strip() for s in os.getenv('STOCK_WATCHLIST', '').split(',') if s.strip()]
+        self.symbols = symbols
+        self.workers = workers or int(os.getenv('PREFETCH_WORKERS', '2'))
+        if min_interval is None:
+            min_interval = int(os.getenv('PREFETCH_MIN_INTERVAL_MS', '500')) / 1000
+        self.rate_limiter = RateLimiter(min_interval)
+        if delay_minutes is None:
+            delay_minutes = int(os.getenv('PREFETCH_DELAY_MINUTES', '30'))
+        self.delay = datetime.timedelta(minutes=delay_minutes)
+        # 记录最近一次完成预取的交易日，重启后不重复预取
+        self.state_path = os.path.join(client.store.base_path, 'prefetch_state.json')
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.last_run = None
+
+    def watchlist(self):
+        """返回需要预取的代码：常用指数在前，自选股在后，去重"""
+        indices = self.client.get_index_list()['code'].tolist()
+        return list(dict.fromkeys(indices + self.symbols))
+
+    def run_once(self):
+        """刷新股票列表，同步所有代码的数据，计算技术指标并生成默认K线图，然后重建全市场矩阵
+
+        Returns:
+            本次预取的统计信息
+        """
+        with self._lock:
+            started = time.time()
+            # 股票列表在这里定时刷新，请求中不会遇到过期的快照
+            universe_size = self._refresh_universe()
+            symbols = self.watchlist()
+            errors = {}
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch') as executor:
+                for symbol, error in zip(symbols, executor.map(self._prefetch_symbol, symbols)):
+                    if error:
+                        errors[symbol] = error
+            matrix_shape = self._rebuild_matrix()
+            session = self.client.calendar.latest_closed_session().strftime('%Y-%m-%d')
+            self.last_run = {
+                'session': session,
+                'finished_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'seconds': round(time.time() - started, 2),
+                'symbols': len(symbols),
+                'universe': universe_size,
+                'matrix_shape': matrix_shape,
+                'errors': errors
+            }
+            self._save_state()
+            logging.info(f"收盘后预取完成: {len(symbols)}个代码，失败{len(errors)}个，"
+                         f"耗时{self.last_run['seconds']}秒")
+            return self.last_run
+
+    def _prefetch_symbol(self, symbol):
+        """预取单个代码，返回错误信息，成功时返回None"""
+        try:
+            self.rate_limiter.wait()
+            # 跳过内存缓存，避免收盘后过早同步的不完整数据被当作最新
+            if self.client.refresh_history(symbol) is None:
+                return '无法获取股票数据'
+            self.client.get_indicators(symbol, DEFAULT_CHART['adjust'])
+            if self.client.render_chart(symbol, **DEFAULT_CHART) is None:
+                return '生成K线图失败'
+            return None
+        except Exception as e:
+            logging.error(f"预取{symbol}出错: {e}")
+            return str(e)
+
+    def _refresh_universe(self):
+        """从上游刷新A股列表快照，返回股票数，失败时返回None（继续使用旧快照）"""
+        try:
+            stocks = self.client.universe.refresh()
+            return len(stocks) if stocks is not None else None
+        except Exception as e:
+            logging.error(f"刷新股票列表出错: {e}")
+            return None
+
+    def _rebuild_matrix(self):
+        """由本地存储重建全市场矩阵（包含本地已存储的全部股票），返回 [日期数, 股票数]，失败时返回None"""
+        try:
+            return list(self.client.build_market_matrix().shape)
+        except Exception as e:
+            logging.error(f"重建全市场矩阵出错: {e}")
+            return None
+
+    def next_run_time(self, now=None):
+        """下一次预取时间：最近一次收盘尚未预取时为收盘后延迟时间，否则为下一次收盘后"""
+        now = now or datetime.datetime.now()
+        last_close = self.client.calendar.last_session_close(now)
+        state = self._load_state()
+        if state.get('session') != last_close.strftime('%Y-%m-%d'):
+            return max(now, last_close + self.delay)
+        return self.client.calendar.next_session_close(now) + self.delay
+
+    def start(self):
+        """启动后台线程，已启动时不重复启动"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='prefetch-scheduler', daemon=True)
+        self._thread.start()
+        logging.info(f"收盘后预取已启动，自选股{len(self.symbols)}只")
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            wait_seconds = (self.next_run_time() - datetime.datetime.now()).total_seconds()
+            if wait_seconds > 0 and self._stop.wait(wait_seconds):
+                break
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"收盘后预取出错: {e}")
+                # 出错后稍后重试，避免连续访问上游
+                self._stop.wait(600)
+
+    def stats(self):
+        """返回调度器状态"""
+        running = self._thread is not None and self._thread.is_alive()
+        return {
+            'running': running,
+            'symbols': len(self.symbols),
+            'next_run': self.next_run_time().isoformat(timespec='seconds') if running else None,
+            'last_run': self.last_run or self._load_state() or None
+        }
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.last_run, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logging.error(f"保存预取状态出错: {e}")
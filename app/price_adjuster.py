@@ -0,0 +1,73 @@
+"""
+复权计算 - 由不复权日线和后复权因子在本地计算前复权、后复权价格
+"""
+import numpy as np
+import pandas as pd
+from .compact_frame import index_days
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+def normalize_adjust(adjust):
+    """统一复权参数，'none'、None、空字符串均表示不复权"""
+    adjust = (adjust or '').strip().lower()
+    return adjust if adjust in ('qfq', 'hfq') else ''
+
+
+def attach_factors(bars, factors):
+    """为日线数据附加后复权因子列 Factor
+
+    每根K线取日期不晚于该K线的最近一个因子；早于第一个因子的K线使用第一个因子。
+
+    Args:
+        bars: 不复权日线DataFrame，以Date（或紧凑格式的Day）为索引
+        factors: 后复权因子DataFrame，以Date为索引，包含 hfq_factor 列；为None时因子均为1
+
+    Returns:
+        增加 Factor 列后的DataFrame
+    """
+    bars = bars.copy()
+    if factors is None or len(factors) == 0:
+        bars['Factor'] = 1.0
+        return bars
+    # 统一按天数比较，兼容紧凑格式的Day索引
+    positions = np.searchsorted(index_days(factors.index), index_days(bars.index), side='right') - 1
+    bars['Factor'] = factors['hfq_factor'].values[np.clip(positions, 0, None)]
+    return bars
+
+
+def apply_adjustment(df, adjust, base_factor=None):
+    """按复权方式计算价格
+
+    后复权价格 = 不复权价格 × 后复权因子；
+    前复权价格 = 不复权价格 × 后复权因子 / 最新后复权因子。
+
+    Args:
+        df: 带 Factor 列的不复权日线DataFrame
+        adjust: 复权方式 'qfq'、'hfq' 或 ''
+        base_factor: 前复权基准因子，应取完整历史中最新的因子；默认为df中最后一个因子
+
+    Returns:
+        不含 Factor 列的OHLCV DataFrame，复权价格保留两位小数；
+        没有复权因子（如指数）或因子比值均为1时原样返回不复权价格
+    """
+    if 'Factor' not in df.columns:
+        return df
+    adjust = normalize_adjust(adjust)
+    if not adjust or len(df) == 0:
+        return df.drop(columns='Factor')
+
+    factor = df['Factor'].values
+    if adjust == 'qfq':
+        if base_factor is None:
+            base_factor = factor[-1]
+        factor = factor / base_factor
+    if np.all(factor == 1):
+        return df.drop(columns='Factor')
+    prices = np.round(df[PRICE_COLUMNS].values * factor[:, None], 2)
+
+    result = pd.DataFrame(prices, index=df.index, columns=PRICE_COLUMNS)
+    for column in df.columns:
+        if column not in PRICE_COLUMNS and column != 'Factor':
+            result[column] = df[column].values
+    return result
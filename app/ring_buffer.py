@@ -0,0 +1,101 @@
+"""
+K线环形缓冲区 - 固定容量的NumPy数组保存最近N根K线，追加为O(1)，按窗口读取为零拷贝视图
+
+每根K线同时写入位置 i 和 i+capacity，任意最近 count 根K线在数组中都是连续的一段，
+读取时无需拼接首尾两段。
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+BAR_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+class BarRingBuffer:
+    """单只股票单一周期的K线环形缓冲区
+
+    返回的视图在之后 capacity - count 次追加内不会被覆盖，需要长期持有时请复制。
+    """
+
+    def __init__(self, capacity, fields=BAR_FIELDS):
+        """初始化缓冲区
+
+        Args:
+            capacity: 最多保留的K线数
+            fields: 字段名，按字段分别连续存放
+        """
+        self.capacity = int(capacity)
+        self.fields = tuple(fields)
+        self._times = np.zeros(2 * self.capacity, dtype='datetime64[ns]')
+        self._values = np.zeros((len(self.fields), 2 * self.capacity), dtype=np.float64)
+        self._count = 0  # 累计写入的K线数
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def last_time(self):
+        """最后一根K线的时间，缓冲区为空时返回None"""
+        if self._count == 0:
+            return None
+        return self._times[(self._count - 1) % self.capacity + self.capacity]
+
+    def append(self, time, values):
+        """追加一根K线
+
+        Args:
+            time: K线时间
+            values: 与 fields 顺序一致的字段值
+        """
+        with self._lock:
+            i = self._count % self.capacity
+            time = np.datetime64(time, 'ns')
+            self._times[i] = self._times[i + self.capacity] = time
+            self._values[:, i] = self._values[:, i + self.capacity] = values
+            self._count += 1
+
+    def update_last(self, values):
+        """更新最后一根（尚未完成的）K线"""
+        with self._lock:
+            if self._count == 0:
+                raise IndexError('缓冲区为空')
+            i = (self._count - 1) % self.capacity
+            self._values[:, i] = self._values[:, i + self.capacity] = values
+
+    def extend(self, times, values):
+        """批量追加K线，只写入最后 capacity 根
+
+        Args:
+            times: K线时间数组
+            values: 形状为 (字段数, K线数) 的数组
+        """
+        times = np.asarray(times, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            skipped = max(len(times) - self.capacity, 0)
+            times, values = times[skipped:], values[:, skipped:]
+            self._count += skipped
+            positions = (self._count + np.arange(len(times))) % self.capacity
+            self._times[positions] = self._times[positions + self.capacity] = times
+            self._values[:, positions] = values
+            self._values[:, positions + self.capacity] = values
+            self._count += len(times)
+
+    def window(self, count=None):
+        """返回最近count根K线的 (时间, 字段值) 视图
+
+        Returns:
+            (times, values) 元组，values形状为 (字段数, K线数)，均为内部数组的切片
+        """
+        with self._lock:
+            size = len(self)
+            count = size if count is None else min(int(count), size)
+            end = (self._count - 1) % self.capacity + self.capacity + 1 if self._count else self.capacity
+            return self._times[end - count:end], self._values[:, end - count:end]
+
+    def to_frame(self, count=None):
+        """返回最近count根K线的DataFrame，以Date为索引，列数据引用缓冲区"""
+        times, values = self.window(count)
+        return pd.DataFrame(values.T, index=pd.DatetimeIndex(times, name='Date'), columns=list(self.fields),
+                            copy=False)
@@ -1,14 +1,26 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app, render_template
+from flask import Blueprint, request, jsonify, send_from_directory, current_app, render_template, Response
 import os
 import uuid
 import markdown
 import re
 import logging
+import hashlib
+import json
+import numpy as np
 from werkzeug.utils import secure_filename
 from app.ai_client import AIClient
 import datetime
 from PIL import Image
 from app.akshare_client import AKShareClient  # 导入AKShare客户端
+from app.prefetch_scheduler import PrefetchScheduler
+from app.spot_poller import SpotQuotePoller
+from app.bar_aggregator import BarAggregator
+from app.bar_resampler import bucket_start, minute_period, parse_period, period_sessions
+from app.market_analytics import MarketAnalytics, AnalyticsUnavailableError, QueryParameterError
+from app.downsampler import DOWNSAMPLE_METHODS, downsample_ohlcv
+from app.frame_serializers import (
+    FORMATS, frame_to_records, frame_to_columns, frame_to_arrow, frame_to_float32, float32_columns, time_unit
+)
 
 # 创建蓝图
 main = Blueprint('main', __name__)
@@ -18,12 +30,161 @@ ai_client = AIClient()
 # AKShare客户端实例
 akshare_client = AKShareClient()
 
+# 收盘后预取自选股及常用指数，PREFETCH_ENABLED=1 时在第一次请求时启动
+prefetch_scheduler = PrefetchScheduler(akshare_client)
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+# 所有浏览器共用的实时行情轮询器
+spot_poller = SpotQuotePoller(akshare_client.provider, akshare_client.calendar)
+# 由实时行情合成分钟线及当日日线，更新分钟线缓冲区和本地存储
+bar_aggregator = BarAggregator(akshare_client.calendar, on_bars=akshare_client.on_live_bars)
+spot_poller.add_listener(bar_aggregator.update)
+# 本地行情存储上的只读分析查询（需安装duckdb）
+market_analytics = MarketAnalytics(akshare_client.store.base_path)
+# 实时行情推送的心跳间隔（秒），防止代理断开空闲连接
+SPOT_KEEPALIVE_SECONDS = 15
+
 # 允许的图片扩展名
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# K线图页面绘制的K线数（同 generate_kline_chart 的默认值）
+KLINE_DAYS = 60
+
+# 批量行情接口单次最多查询的股票数量
+MAX_BATCH_SYMBOLS = int(os.getenv('MAX_BATCH_SYMBOLS', '100'))
+# 全市场指标扫描单次最多返回的交易日数
+MAX_SCAN_DAYS = int(os.getenv('MAX_SCAN_DAYS', '20'))
+# 股票及指数代码：交易所前缀加6位数字
+SYMBOL_PATTERN = re.compile(r'(sh|sz|bj)\d{6}')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def make_etag(*parts):
+    """由请求参数和数据版本生成ETag"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    """返回304响应"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def parse_date(value):
+    """解析YYYY-MM-DD或YYYYMMDD格式日期"""
+    return datetime.datetime.strptime(value.replace('-', ''), '%Y%m%d')
+
+def parse_since(value, period):
+    """解析增量同步参数since：分钟线为客户端最后一根K线的时间（YYYY-MM-DD HH:MM[:SS]，也可只给日期），
+    其他周期为日期
+
+    Raises:
+        ValueError: 格式错误
+    """
+    try:
+        return parse_date(value)
+    except ValueError:
+        if not minute_period(period):
+            raise
+    value = value.strip().replace('T', ' ')
+    for date_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise ValueError(f"K线时间格式错误，应为YYYY-MM-DD HH:MM:SS: {value}")
+
+def parse_days(default):
+    """读取K线数量参数days
+
+    Returns:
+        (K线数, 错误响应)，不是正整数时K线数为None，错误响应为400
+    """
+    days = request.args.get('days', str(default))
+    if not days.isdigit() or int(days) <= 0:
+        return None, (jsonify({'error': f"days 应为正整数: {days}"}), 400)
+    return int(days), None
+
+def parse_max_points():
+    """读取降采样参数max_points（最多返回或绘制的K线数）
+
+    Returns:
+        (K线数, 错误响应)，未提供时K线数为None；不是非负整数时错误响应为400
+    """
+    max_points = request.args.get('max_points')
+    if max_points is None or max_points == '':
+        return None, None
+    if not max_points.isdigit():
+        return None, (jsonify({'error': f"max_points 应为非负整数: {max_points}"}), 400)
+    return int(max_points), None
+
+def parse_limit(default, maximum):
+    """读取返回条数参数limit，限制在1到maximum之间
+
+    Returns:
+        (条数, 错误响应)，不是整数时条数为None，错误响应为400
+    """
+    limit = request.args.get('limit', str(default))
+    try:
+        limit = int(limit)
+    except ValueError:
+        return None, (jsonify({'error': f"limit 应为整数: {limit}"}), 400)
+    return max(1, min(limit, maximum)), None
+
+def date_error(**dates):
+    """校验日期参数，格式错误时返回400响应，全部合法（或未提供）时返回None"""
+    try:
+        for value in dates.values():
+            if value:
+                parse_date(value)
+    except ValueError:
+        names = ', '.join(f"{name}={value}" for name, value in dates.items() if value)
+        return jsonify({'error': f"日期格式错误，应为YYYY-MM-DD或YYYYMMDD: {names}"}), 400
+    return None
+
+def period_error(period):
+    """校验K线周期参数，无法识别时返回400响应，合法时返回None"""
+    try:
+        parse_period(period)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return None
+
+def parse_symbol(value):
+    """标准化并校验单个股票代码（交易所前缀加6位数字，如sz000001）
+
+    Returns:
+        (代码, 错误响应)，不合法时代码为None，错误响应为400
+    """
+    symbol = (value or '').strip().lower()
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        return None, (jsonify({'error': f"股票代码格式错误，应为交易所前缀加6位数字: {value}"}), 400)
+    return symbol, None
+
+def parse_symbols():
+    """读取逗号分隔的股票代码参数symbols，去重并校验格式（交易所前缀加6位数字，如sz000001）
+
+    Returns:
+        (代码列表, 错误响应)，不合法时代码列表为None，错误响应为400
+    """
+    symbols = list(dict.fromkeys(s.strip().lower() for s in request.args.get('symbols', '').split(',')
+                                 if s.strip()))
+    if not symbols:
+        return None, (jsonify({'error': '请提供股票代码列表'}), 400)
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return None, (jsonify({'error': f'单次最多查询{MAX_BATCH_SYMBOLS}只股票'}), 400)
+    invalid = [s for s in symbols if not SYMBOL_PATTERN.fullmatch(s)]
+    if invalid:
+        return None, (jsonify({'error': f"股票代码格式错误，应为交易所前缀加6位数字: {', '.join(invalid)}"}), 400)
+    return symbols, None
+
+@main.before_app_request
+def start_prefetch_scheduler():
+    """在处理请求的进程中启动预取线程（调试模式下重载器的父进程不会启动）"""
+    if PREFETCH_ENABLED:
+        prefetch_scheduler.start()
+
 # 添加状态路由
 @main.route('/api/status')
 def get_status():
@@ -66,7 +227,14 @@ def get_status():
             'path': uploads_folder,
             'exists': os.path.exists(uploads_folder),
             'files_count': uploaded_files_count
-        }
+        },
+        'stock_data_provider': akshare_client.provider.name,
+        'stock_data_sources': akshare_client.provider.source_stats(),
+        'stock_data_cache': akshare_client.cache_stats(),
+        'stock_prefetch': prefetch_scheduler.stats(),
+        'stock_spot': spot_poller.stats(),
+        'stock_live_bars': bar_aggregator.stats(),
+        'stock_analytics': market_analytics.stats()
     })
 
 # 从Markdown生成提示词
@@ -331,43 +499,197 @@ def analyze_image():
 
 @main.route('/api/stock/data', methods=['GET'])
 def get_stock_data():
-    """获取股票数据API"""
+    """获取股票数据API
+    
+    支持增量同步：since=<日期> 只返回客户端最后一根K线之后的数据（分钟线为 since=<K线时间>，
+    从该时间之后的下一根K线开始，同一交易日内轮询也能取到新的分钟线），响应的 delta 字段（二进制格式为
+    响应头 X-Delta）说明如何合并：append 追加在已有K线之后；replace_last 第一根K线替换客户端的最后一根
+    （周线、月线从since所在周期的第一个交易日开始，返回该周期完整的K线）；reset 丢弃已有K线，
+    用返回的最近days根K线替换（新K线超过days根或N日线分组已移动时）。响应带有由股票代码、复权方式、
+    最后一根K线日期等生成的ETag，请求头 If-None-Match 匹配时返回304。
+    
+    format 参数：records(默认，逐行JSON)、columnar(按列JSON，日线时间为天数Day，分钟线为分钟数Minute，
+    单位见 time_unit)、arrow(Arrow IPC流，时间列同columnar)、f32(小端float32按列打包，列名见响应头
+    X-Columns，分钟线时间拆为Day和MinuteOfDay)；二进制格式的时间单位见响应头 X-Time-Unit。
+    
+    max_points 参数：K线数超出时在序列化前降采样，downsample=ohlc(默认，分桶合并)或lttb。
+    """
     try:
-        symbol = request.args.get('symbol', 'sh000001')  # 默认为上证指数
-        days = int(request.args.get('days', 90))  # 默认90天
+        # 代码会拼接进本地存储的文件路径，只接受交易所前缀加6位数字
+        symbol, error = parse_symbol(request.args.get('symbol', 'sh000001'))  # 默认为上证指数
+        if error:
+            return error
         start_date = request.args.get('start_date')  # 可选起始日期
         end_date = request.args.get('end_date')  # 可选结束日期
         adjust = request.args.get('adjust', 'qfq')  # 默认前复权
+        period = request.args.get('period', 'daily')  # K线周期：daily/weekly/monthly/Nd
+        since = request.args.get('since')  # 可选，只返回该日期之后的K线
+        output_format = request.args.get('format', 'records')  # 输出格式
+        method = request.args.get('downsample', 'ohlc')  # 降采样方式
+        
+        if output_format not in FORMATS:
+            return jsonify({'error': f"不支持的格式: {output_format}，可选: {', '.join(FORMATS)}"}), 400
+        if method not in DOWNSAMPLE_METHODS:
+            return jsonify({'error': f"不支持的降采样方式: {method}，可选: {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+        days, error = parse_days(90)  # 默认90天
+        if error:
+            return error
+        max_points, error = parse_max_points()  # 可选，最多返回的K线数
+        if error:
+            return error
+        error = period_error(period) or date_error(start_date=start_date, end_date=end_date)
+        if error:
+            return error
+        try:
+            since_date = parse_since(since, period) if since else None
+        except ValueError:
+            return jsonify({'error': f"since 格式错误，应为YYYY-MM-DD（分钟线可为YYYY-MM-DD HH:MM:SS）: {since}"}), 400
+        
+        # 数据未变化时直接返回304，不再读取和序列化数据
+        version = akshare_client.get_data_version(symbol, period)
+        etag = None
+        if version is not None:
+            etag = make_etag(symbol, adjust, period, days, start_date, end_date, since, output_format,
+                             max_points, method, version)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+        
+        delta = None
+        if since:
+            since_start = bucket_start(since_date, period)
+            if since_start is None:
+                # N日线的分组随新K线移动，已有K线全部可能变化
+                delta = 'reset'
+            elif minute_period(period):
+                # 分钟线从since那根K线之后开始（K线时间精确到分钟）
+                delta = 'append'
+                since_start = since_date + datetime.timedelta(seconds=1)
+            elif period_sessions(period) <= 1:
+                # 日线从since的下一天开始
+                delta = 'append'
+                since_start += datetime.timedelta(days=1)
+            else:
+                # 周线、月线从since所在周期的第一天开始，第一根K线替换客户端的最后一根
+                delta = 'replace_last'
+            if since_start is not None:
+                if start_date:
+                    since_start = max(parse_date(start_date), since_start)
+                start_date = since_start.strftime('%Y-%m-%d %H:%M:%S' if minute_period(period) else '%Y-%m-%d')
+        if not start_date:
+            # 未指定起始日期时按交易日历只获取最近N根K线所需的区间
+            start_date = akshare_client.start_date_for_bars(days, period, end_date)
         
-        # 获取股票数据
-        df = akshare_client.get_stock_data(symbol, start_date=start_date, end_date=end_date, adjust=adjust)
+        # 获取股票数据，只取最近N根K线，在序列化之前完成截取；增量请求多取一根以判断是否超出N根
+        limit = days + 1 if delta in ('append', 'replace_last') else days
+        df = akshare_client.get_stock_data(symbol, period, start_date=start_date, end_date=end_date,
+                                           adjust=adjust, limit=limit)
         
         if df is None:
             return jsonify({'error': '无法获取股票数据'}), 400
+        if len(df) > days:
+            # 新K线超过N根，中间的K线不会返回，客户端需要整体替换
+            df = df.iloc[-days:]
+            delta = 'reset'
         
-        # 转换为JSON格式
-        data = df.reset_index().to_dict(orient='records')
-        data = [{k: str(v) if k == 'Date' else v for k, v in item.items()} for item in data]
+        df = downsample_ohlcv(df, max_points, method)
+        
+        if output_format == 'arrow':
+            response = current_app.response_class(frame_to_arrow(df),
+                                                   mimetype='application/vnd.apache.arrow.stream')
+        elif output_format == 'f32':
+            response = current_app.response_class(frame_to_float32(df), mimetype='application/octet-stream')
+            response.headers['X-Rows'] = str(len(df))
+            response.headers['X-Columns'] = ','.join(float32_columns(df))
+        else:
+            if output_format == 'columnar':
+                data = frame_to_columns(df, date_format='epoch_day')
+            else:
+                data = frame_to_records(df)
+            response = jsonify({
+                'symbol': symbol,
+                'period': period,
+                'since': since,
+                'delta': delta,  # 增量请求的合并方式：append、replace_last或reset，非增量请求为None
+                'time_unit': time_unit(df),  # columnar格式时间列的单位：day(Day天数)或minute(Minute分钟数)
+                'version': version,  # 最后K线日期及复权基准，变化时增量数据需要全量刷新
+                'data': data
+            })
+        if output_format in ('arrow', 'f32'):
+            response.headers['X-Data-Version'] = version or ''
+            response.headers['X-Time-Unit'] = time_unit(df)
+            if delta:
+                response.headers['X-Delta'] = delta
+        if etag:
+            response.set_etag(etag)
+            # 浏览器每次使用前向服务器校验，未变化时只收到304
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    except Exception as e:
+        logging.error(f"获取股票数据出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/stock/batch', methods=['GET'])
+def get_batch_stock_data():
+    """批量获取多只股票数据API，按列返回以减小响应体积"""
+    try:
+        start_date = request.args.get('start_date')  # 可选起始日期
+        end_date = request.args.get('end_date')  # 可选结束日期
+        adjust = request.args.get('adjust', 'qfq')  # 默认前复权
+        
+        symbols, error = parse_symbols()
+        if error:
+            return error
+        days, error = parse_days(90)  # 默认90天
+        if error:
+            return error
+        error = date_error(start_date=start_date, end_date=end_date)
+        if error:
+            return error
+        
+        # 未指定起始日期时按交易日历只获取最近N根K线所需的区间
+        if not start_date:
+            start_date = akshare_client.start_date_for_bars(days, end_date=end_date)
+        
+        frames, errors = akshare_client.get_batch_stock_data(
+            symbols, start_date=start_date, end_date=end_date, adjust=adjust, limit=days)
+        
+        data = {symbol: frame_to_columns(df) for symbol, df in frames.items()}
         
         return jsonify({
-            'symbol': symbol,
-            'data': data[-days:] if len(data) > days else data  # 只返回最近N天数据
+            'symbols': symbols,
+            'data': data,
+            'errors': errors
         })
     
     except Exception as e:
-        logging.error(f"获取股票数据出错: {e}")
+        logging.error(f"批量获取股票数据出错: {e}")
         return jsonify({'error': str(e)}), 500
 
 @main.route('/api/stock/chart', methods=['GET'])
 def generate_stock_chart():
     """生成股票K线图API"""
     try:
-        symbol = request.args.get('symbol', 'sh000001')  # 默认为上证指数
-        days = int(request.args.get('days', 60))  # 默认60天
+        symbol, error = parse_symbol(request.args.get('symbol', 'sh000001'))  # 默认为上证指数
+        if error:
+            return error
         start_date = request.args.get('start_date')  # 可选起始日期
         end_date = request.args.get('end_date')  # 可选结束日期
         adjust = request.args.get('adjust', 'qfq')  # 默认前复权
         show_volume = request.args.get('volume', 'true').lower() == 'true'  # 显示成交量
+        period = request.args.get('period', 'daily')  # K线周期：daily/weekly/monthly/Nd
+        # 技术指标，如 MACD,RSI
+        indicators = [x.strip().upper() for x in request.args.get('indicators', '').split(',') if x.strip()]
+        
+        days, error = parse_days(60)  # 默认60天
+        if error:
+            return error
+        error = period_error(period) or date_error(start_date=start_date, end_date=end_date)
+        if error:
+            return error
+        max_points, error = parse_max_points()  # 可选，最多绘制的K线数
+        if error:
+            return error
         
         # 移动平均线设置
         mav_param = request.args.get('mav', '5,20')
@@ -378,32 +700,20 @@ def generate_stock_chart():
         except:
             mav = (5, 20)  # 默认5日、20日均线
         
-        # 获取股票数据
-        df = akshare_client.get_stock_data(symbol, start_date=start_date, end_date=end_date, adjust=adjust)
-        
-        if df is None:
-            return jsonify({'error': '无法获取股票数据'}), 400
-        
-        # 获取股票名称
-        stock_name = symbol
-        if symbol.startswith('sh'):
-            if symbol == 'sh000001':
-                stock_name = '上证指数'
-            elif symbol == 'sh000300':
-                stock_name = '沪深300'
-            # 可以添加更多常用指数
-        
-        # 生成图表标题
-        title = f"{stock_name} ({symbol}) K线图"
-        
-        # 生成K线图
-        file_path = akshare_client.generate_kline_chart(
-            df, 
-            title=title, 
-            days=days, 
-            show_volume=show_volume, 
-            mav=mav
+        # 生成K线图，参数和数据版本相同时直接复用已生成的图表
+        file_path = akshare_client.render_chart(
+            symbol,
+            period=period,
+            adjust=adjust,
+            days=days,
+            start_date=start_date,
+            end_date=end_date,
+            show_volume=show_volume,
+            mav=mav,
+            max_points=max_points,
+            indicators=indicators
         )
+        title = akshare_client.chart_title(symbol)
         
         if file_path is None:
             return jsonify({'error': '生成K线图失败'}), 500
@@ -414,6 +724,7 @@ def generate_stock_chart():
         
         return jsonify({
             'symbol': symbol,
+            'period': period,
             'title': title,
             'image_url': image_url
         })
@@ -422,6 +733,116 @@ def generate_stock_chart():
         logging.error(f"生成K线图出错: {e}")
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/stock/quality', methods=['GET'])
+def get_stock_quality():
+    """数据质量报告API：入库时清洗的行数及历史中缺失的交易日（含停牌）"""
+    try:
+        symbol, error = parse_symbol(request.args.get('symbol', 'sh000001'))
+        if error:
+            return error
+        report = akshare_client.get_quality_report(symbol)
+        if report is None:
+            return jsonify({'error': '无法获取股票数据'}), 400
+        return jsonify({'symbol': symbol, 'report': report})
+    
+    except Exception as e:
+        logging.error(f"获取数据质量报告出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/stock/scan', methods=['GET'])
+def scan_market_indicators():
+    """全市场技术指标扫描API：在全市场矩阵上一次计算所有股票的指标
+
+    indicators=<指标,指标>（默认全部）；limit 为返回的最近交易日数（默认1，不超过 MAX_SCAN_DAYS）；
+    start_date 为计算的起始日期（之后的K线作为预热期），end_date 为截止日期。
+    data 中每个指标列为 [日期][股票] 的二维数组，没有K线或处于预热期时为null。
+    """
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        names = [x.strip() for x in request.args.get('indicators', '').split(',') if x.strip()] or None
+        
+        limit, error = parse_limit(1, MAX_SCAN_DAYS)
+        if error:
+            return error
+        error = date_error(start_date=start_date, end_date=end_date)
+        if error:
+            return error
+        
+        result = akshare_client.get_market_indicators(names, start_date=start_date, end_date=end_date, last=limit)
+        if result is None:
+            return jsonify({'error': '无法计算全市场技术指标'}), 400
+        dates, symbols, results = result
+        
+        data = {}
+        for column, values in results.items():
+            values = np.round(values.astype(np.float64), 4)
+            data[column] = np.where(np.isnan(values), None, values).tolist()
+        return jsonify({
+            'dates': [str(date) for date in dates],
+            'symbols': [str(symbol) for symbol in symbols],
+            'data': data
+        })
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"全市场技术指标扫描出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/stock/analytics', methods=['GET'])
+def run_stock_analytics():
+    """行情分析查询API：在本地行情存储上执行具名查询
+
+    name为空时返回可用查询列表；其余参数按查询定义校验，另支持 limit（不超过 ANALYTICS_MAX_ROWS）
+    及 as_of（截止日期）。
+    """
+    try:
+        name = request.args.get('name')
+        if not name:
+            return jsonify({'available': market_analytics.available(), 'queries': market_analytics.describe()})
+        return jsonify(market_analytics.run(name, request.args.to_dict()))
+    
+    except QueryParameterError as e:
+        return jsonify({'error': str(e)}), 400
+    except AnalyticsUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logging.error(f"行情分析查询出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/stock/stream', methods=['GET'])
+def stream_spot_quotes():
+    """实时行情推送（Server-Sent Events）
+    
+    symbols=<代码,代码>；连接建立后先推送当前行情，之后只推送有变化的代码，
+    事件名为 quote，数据为 {代码: {price, change, change_pct, ...}}。
+    """
+    # 代码会拼接进上游行情请求的URL，只接受交易所前缀加6位数字
+    symbols, error = parse_symbols()
+    if error:
+        return error
+    
+    def generate():
+        subscription = spot_poller.subscribe(symbols)
+        try:
+            # 提示浏览器断线后3秒重连
+            yield 'retry: 3000\n\n'
+            while True:
+                quotes = subscription.get(timeout=SPOT_KEEPALIVE_SECONDS)
+                if quotes:
+                    yield f"event: quote\ndata: {json.dumps(quotes, ensure_ascii=False)}\n\n"
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            # 浏览器断开时生成器被关闭，释放订阅
+            spot_poller.unsubscribe(subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 关闭Nginx缓冲
+    return response
+
 @main.route('/api/stock/list', methods=['GET'])
 def get_stock_list():
     """获取股票列表API"""
@@ -450,6 +871,24 @@ def get_stock_list():
         logging.error(f"获取股票列表出错: {e}")
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/stock/search', methods=['GET'])
+def search_stocks():
+    """股票代码/名称/拼音首字母前缀搜索API，用于输入自动补全"""
+    try:
+        query = request.args.get('q', '')
+        limit, error = parse_limit(20, 100)
+        if error:
+            return error
+        
+        return jsonify({
+            'query': query,
+            'data': akshare_client.search_stocks(query, limit)
+        })
+    
+    except Exception as e:
+        logging.error(f"搜索股票出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @main.route('/stock/kline', methods=['GET', 'POST'])
 def stock_kline():
     """股票K线图接口"""
@@ -465,16 +904,27 @@ def stock_kline():
             
             if not symbol:
                 return jsonify({'error': '请输入股票代码'})
+            symbol, error = parse_symbol(symbol)
+            if error:
+                return error
+            error = period_error(period) or date_error(start_date=start_date, end_date=end_date)
+            if error:
+                return error
             
-            # 获取股票数据
-            df = akshare_client.get_stock_data(symbol, period, start_date, end_date, adjust)
+            # 与 /api/stock/data 相同：未指定起始日期时按交易日历只获取最近N根K线所需的区间，
+            # 并只保留最近N根，周线、月线的第一根K线完整
+            days = KLINE_DAYS
+            if not start_date:
+                start_date = akshare_client.start_date_for_bars(days, period, end_date or None)
+            df = akshare_client.get_stock_data(symbol, period, start_date, end_date, adjust, limit=days)
             if df is None:
                 return jsonify({'error': '获取股票数据失败'})
             
             # 生成K线图
-            title = f"{symbol} K线图"
+            stock_name = akshare_client.get_stock_name(symbol) or symbol
+            title = f"{stock_name} ({symbol}) K线图" if stock_name != symbol else f"{symbol} K线图"
             chart_path = akshare_client.generate_kline_chart(
-                df, title=title, show_volume=True,
+                df, title=title, days=days, show_volume=True,
                 show_indicators=indicators  # 传递技术指标参数
             )
             
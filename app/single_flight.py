@@ -0,0 +1,70 @@
+"""
+并发请求合并 - 相同键的并发调用只执行一次，其余调用方等待并共享结果
+"""
+import threading
+
+
+class _Call:
+    """一次正在进行的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Single-flight 调用合并器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行调用，若相同键已有调用在进行中则等待其结果
+
+        Args:
+            key: 调用键，如股票代码
+            fn: 实际执行的函数
+
+        Returns:
+            fn的返回值；fn抛出异常时所有等待者都会收到同一异常
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        """返回调用合并统计信息"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,183 @@
+"""
+数据源回退链 - 按顺序尝试同一数据的多个上游接口，带单接口超时、熔断及滚动耗时/错误统计
+
+健康的接口按错误率、平均耗时自动排在前面；连续失败达到阈值的接口熔断一段时间，
+冷却后放行一次试探请求，成功即恢复。
+"""
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class SourceUnavailableError(Exception):
+    """回退链中所有数据源均失败或处于熔断状态"""
+
+
+class SourceStats:
+    """单个数据源的滚动统计及熔断状态"""
+
+    def __init__(self, name, window):
+        self.name = name
+        self.samples = deque(maxlen=window)  # (耗时秒, 是否成功)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # 熔断截止时间（monotonic）
+        self.half_open = False  # 冷却结束后正在试探
+        self.last_error = None
+
+    def record(self, seconds, ok, error=None):
+        self.samples.append((seconds, ok))
+        self.calls += 1
+        if ok:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+        self.half_open = False
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    @property
+    def mean_latency(self):
+        """成功调用的平均耗时，没有成功样本时为无穷大（未试过的接口排在已知可用的接口之后）"""
+        latencies = [seconds for seconds, ok in self.samples if ok]
+        return sum(latencies) / len(latencies) if latencies else math.inf
+
+    def to_dict(self):
+        latencies = sorted(seconds for seconds, ok in self.samples if ok)
+        p95 = latencies[max(math.ceil(len(latencies) * 0.95) - 1, 0)] if latencies else None
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate, 3),
+            'mean_ms': round(self.mean_latency * 1000, 1) if latencies else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'circuit_open': self.open_until > time.monotonic(),
+            'last_error': self.last_error
+        }
+
+
+class SourceChain:
+    """同一数据的有序数据源列表"""
+
+    def __init__(self, name, sources, timeout=None, failure_threshold=None, cooldown=None, window=None,
+                 workers=None):
+        """初始化回退链
+
+        Args:
+            name: 回退链名称，用于状态输出
+            sources: [(接口名称, 函数)] 列表，按优先顺序排列，函数参数与 call 相同
+            timeout: 单个接口的超时秒数，默认读取 SOURCE_TIMEOUT_SECONDS
+            failure_threshold: 连续失败多少次后熔断，默认读取 SOURCE_FAILURE_THRESHOLD
+            cooldown: 熔断持续秒数，默认读取 SOURCE_COOLDOWN_SECONDS
+            window: 滚动统计的调用次数，默认读取 SOURCE_STATS_WINDOW
+            workers: 本链执行线程数（即同时进行的上游调用上限），默认读取 SOURCE_WORKERS，
+                未配置时与 AKSHARE_BATCH_WORKERS 相同
+        """
+        self.name = name
+        self.sources = list(sources)
+        self.timeout = float(timeout or os.getenv('SOURCE_TIMEOUT_SECONDS', '20'))
+        self.failure_threshold = int(failure_threshold or os.getenv('SOURCE_FAILURE_THRESHOLD', '3'))
+        self.cooldown = float(cooldown or os.getenv('SOURCE_COOLDOWN_SECONDS', '60'))
+        window = int(window or os.getenv('SOURCE_STATS_WINDOW', '50'))
+        self._stats = {source_name: SourceStats(source_name, window) for source_name, _ in self.sources}
+        self._lock = threading.Lock()
+        # 每条链独立的线程池，一条链上挂起的调用不会占满其他链的线程；
+        # 调用前先占用一个空闲线程（最多等待一个超时时长），不在线程池队列中排队
+        workers = int(workers or os.getenv('SOURCE_WORKERS') or os.getenv('AKSHARE_BATCH_WORKERS', '8'))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'source-{name}')
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def ordered(self):
+        """按健康程度排序的数据源：错误率（按10%分档）低、平均耗时短的在前，同档保持配置顺序
+
+        没有成功样本的接口耗时按无穷大处理，因此主接口可用时不会被未试过的备用接口抢先
+        """
+        with self._lock:
+            ranked = sorted(
+                enumerate(self.sources),
+                key=lambda item: (round(self._stats[item[1][0]].error_rate, 1),
+                                  self._stats[item[1][0]].mean_latency, item[0]))
+            return [source for _, source in ranked]
+
+    def _acquire(self, stats):
+        """判断熔断状态，冷却结束后只放行一个试探请求"""
+        with self._lock:
+            if stats.consecutive_failures < self.failure_threshold:
+                return True
+            if time.monotonic() < stats.open_until or stats.half_open:
+                return False
+            stats.half_open = True
+            return True
+
+    def _record(self, stats, seconds, ok, error=None):
+        with self._lock:
+            stats.record(seconds, ok, error)
+            if not ok and stats.consecutive_failures >= self.failure_threshold:
+                stats.open_until = time.monotonic() + self.cooldown
+
+    def call(self, *args, **kwargs):
+        """依次调用数据源，返回第一个成功的结果
+
+        Raises:
+            SourceUnavailableError: 所有数据源均失败或处于熔断状态
+        """
+        errors = []
+        for source_name, fn in self.ordered():
+            stats = self._stats[source_name]
+            if not self._acquire(stats):
+                errors.append(f"{source_name}: 熔断中")
+                continue
+            if not self._slots.acquire(timeout=self.timeout):
+                # 等待一个超时时长仍没有空闲线程（通常是被之前超时仍未返回的调用占用），不计入该接口的统计
+                with self._lock:
+                    stats.half_open = False
+                errors.append(f"{source_name}: 执行线程已满")
+                continue
+            started = []
+            begun = threading.Event()
+            future = self._executor.submit(self._run, started, begun, fn, *args, **kwargs)
+            try:
+                # 超时及耗时从接口实际开始执行时计算；超时的调用无法中断，只是不再等待其结果
+                if not begun.wait(self.timeout):
+                    raise FutureTimeout()
+                result = future.result(timeout=max(started[0] + self.timeout - time.monotonic(), 0))
+            except FutureTimeout:
+                self._record(stats, self._elapsed(started), False, f"超时({self.timeout:g}秒)")
+                errors.append(f"{source_name}: 超时")
+                continue
+            except Exception as e:
+                self._record(stats, self._elapsed(started), False, str(e))
+                errors.append(f"{source_name}: {e}")
+                continue
+            self._record(stats, self._elapsed(started), True)
+            return result
+        raise SourceUnavailableError(f"{self.name} 所有数据源均不可用: {'; '.join(errors)}")
+
+    def _run(self, started, begun, fn, *args, **kwargs):
+        """在线程池中执行接口，记录实际开始时间，结束后释放占用的线程"""
+        started.append(time.monotonic())
+        begun.set()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _elapsed(started):
+        return time.monotonic() - started[0] if started else 0.0
+
+    def stats(self):
+        """返回各数据源的统计信息，按当前尝试顺序排列"""
+        return [self._stats[source_name].to_dict() for source_name, _ in self.ordered()]
@@ -0,0 +1,178 @@
+"""
+实时行情轮询 - 所有浏览器共用一个后台轮询线程，按订阅的代码批量获取实时行情，
+与上一次快照比较后只把变化的行情推送给各订阅者
+
+上游请求次数与连接的浏览器数量无关；没有订阅者时轮询线程自动退出。
+"""
+import os
+import time
+import datetime
+import logging
+import threading
+from collections import Counter
+import pandas as pd
+
+class SpotSubscription:
+    """单个订阅者，未取走的变化按代码合并，慢速连接只会收到每个代码最新的行情"""
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._condition = threading.Condition()
+
+    def push(self, quotes):
+        """合并一批变化的行情"""
+        with self._condition:
+            self._pending.update(quotes)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """等待并取走所有未发送的变化，超时返回空字典"""
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(timeout)
+            quotes, self._pending = self._pending, {}
+            return quotes
+
+
+class SpotQuotePoller:
+    """共享实时行情轮询器"""
+
+    def __init__(self, provider, calendar=None, interval=None, idle_interval=None):
+        """初始化轮询器
+
+        Args:
+            provider: 数据源，需实现 fetch_spot
+            calendar: 交易日历，用于判断是否处于交易时段；为None时总按交易时段轮询
+            interval: 交易时段轮询间隔（秒），默认读取 SPOT_POLL_INTERVAL_SECONDS
+            idle_interval: 非交易时段轮询间隔（秒），默认读取 SPOT_IDLE_INTERVAL_SECONDS
+        """
+        self.provider = provider
+        self.calendar = calendar
+        self.interval = float(interval or os.getenv('SPOT_POLL_INTERVAL_SECONDS', '3'))
+        self.idle_interval = float(idle_interval or os.getenv('SPOT_IDLE_INTERVAL_SECONDS', '60'))
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._refcounts = Counter()  # 代码 -> 订阅该代码的连接数
+        self._snapshot = None  # 上一次的行情快照，以代码为索引
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._polls = 0
+        self._errors = 0
+        self._last_poll = None
+        self._listeners = []  # 每次获取到完整快照时调用，如实时K线合成
+
+    def add_listener(self, callback):
+        """注册快照回调 callback(quotes)，quotes为以代码为索引的完整行情快照"""
+        self._listeners.append(callback)
+
+    def subscribe(self, symbols):
+        """订阅代码列表，立即推送已有的行情快照
+
+        Returns:
+            SpotSubscription，使用完毕后需调用 unsubscribe
+        """
+        subscription = SpotSubscription(symbols)
+        with self._lock:
+            new_symbols = [s for s in subscription.symbols if self._refcounts[s] == 0]
+            self._subscriptions.add(subscription)
+            self._refcounts.update(subscription.symbols)
+            snapshot = self._snapshot
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='spot-poller', daemon=True)
+                self._thread.start()
+        if snapshot is not None:
+            subscription.push(_to_quotes(snapshot[snapshot.index.isin(subscription.symbols)]))
+        if new_symbols:
+            # 新代码不等下一个轮询周期
+            self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """取消订阅，代码的订阅计数归零后不再请求该代码"""
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            self._refcounts.subtract(subscription.symbols)
+            for symbol in subscription.symbols:
+                if self._refcounts[symbol] <= 0:
+                    del self._refcounts[symbol]
+            if self._snapshot is not None:
+                self._snapshot = self._snapshot[self._snapshot.index.isin(list(self._refcounts))]
+        # 不唤醒轮询线程：移除代码不需要立即请求，剩余代码按原周期轮询，没有订阅者时线程在下一周期退出
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                symbols = sorted(self._refcounts)
+                if not symbols:
+                    # 没有订阅者时退出，下次订阅时重新启动
+                    self._thread = None
+                    self._snapshot = None
+                    return
+            self._wakeup.clear()
+            self.poll(symbols)
+            self._wakeup.wait(self.interval if self._market_open() else self.idle_interval)
+
+    def poll(self, symbols):
+        """请求一次实时行情，把变化推送给订阅了对应代码的连接"""
+        try:
+            quotes = self.provider.fetch_spot(symbols)
+        except Exception as e:
+            self._errors += 1
+            logging.error(f"获取实时行情出错: {e}")
+            return
+        self._polls += 1
+        self._last_poll = time.time()
+        for callback in self._listeners:
+            try:
+                callback(quotes)
+            except Exception as e:
+                logging.error(f"处理实时行情快照出错: {e}")
+        with self._lock:
+            changed = _changed_rows(self._snapshot, quotes)
+            self._snapshot = quotes
+            subscriptions = list(self._subscriptions)
+        if len(changed) == 0:
+            return
+        changes = _to_quotes(changed)
+        for subscription in subscriptions:
+            mine = {symbol: changes[symbol] for symbol in subscription.symbols if symbol in changes}
+            if mine:
+                subscription.push(mine)
+
+    def _market_open(self):
+        # 交易时段外按空闲间隔轮询
+        return self.calendar is None or self.calendar.is_trading_time()
+
+    def stats(self):
+        """返回轮询器状态"""
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'subscribers': len(self._subscriptions),
+                'symbols': len(self._refcounts),
+                'polls': self._polls,
+                'errors': self._errors,
+                'last_poll': (datetime.datetime.fromtimestamp(self._last_poll).isoformat(timespec='seconds')
+                              if self._last_poll else None)
+            }
+
+
+def _changed_rows(previous, current):
+    """返回与上一次快照相比有变化（含新增代码）的行"""
+    if previous is None or len(previous) == 0:
+        return current
+    aligned = previous.reindex(index=current.index, columns=current.columns)
+    old, new = aligned.values, current.values
+    # NaN与NaN视为相同
+    same = (old == new) | (pd.isna(old) & pd.isna(new))
+    return current[~same.all(axis=1)]
+
+
+def _to_quotes(df):
+    """转换为 {代码: {字段: 值}}，NaN转换为None以便序列化为JSON"""
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    columns = list(df.columns)
+    return {symbol: dict(zip(columns, row)) for symbol, row in zip(df.index, values)}
@@ -0,0 +1,171 @@
+"""
+A股股票列表 - 本地快照、定时刷新及代码/名称/拼音首字母前缀搜索
+"""
+import os
+import bisect
+import datetime
+import threading
+import pandas as pd
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 未安装pypinyin时不支持拼音首字母搜索
+    lazy_pinyin = None
+
+
+def pinyin_initials(name):
+    """返回名称的拼音首字母（小写），未安装pypinyin时返回空字符串"""
+    if lazy_pinyin is None or not name:
+        return ''
+    return ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER, errors='default')).lower()
+
+
+class StockUniverse:
+    """股票列表快照及内存搜索索引"""
+
+    def __init__(self, base_path, fetcher, extra=None, ttl_hours=None):
+        """初始化股票列表
+
+        Args:
+            base_path: 快照文件存放目录
+            fetcher: 无参函数，返回包含 code、name 两列的DataFrame
+            extra: 额外加入搜索索引的DataFrame（如常用指数），不写入快照
+            ttl_hours: 快照有效期（小时），默认读取环境变量 STOCK_UNIVERSE_TTL_HOURS（默认24）
+        """
+        self.file_path = os.path.join(base_path, 'universe.parquet')
+        self._fetcher = fetcher
+        self._extra = extra
+        if ttl_hours is None:
+            ttl_hours = float(os.getenv('STOCK_UNIVERSE_TTL_HOURS', '24'))
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._stocks = None
+        self._snapshot_time = None
+        # 快照加载前先只索引额外条目，保证常用指数名称随时可用
+        self._names, self._index = self._build_index(None)
+
+    def get_list(self):
+        """返回股票列表，快照过期时在后台刷新并先返回旧数据
+
+        快照通常由收盘后预取（PrefetchScheduler）定时刷新，这里的后台刷新只在预取未启用或失败时发生。
+        """
+        if self._stocks is None:
+            self._load_snapshot()
+        if self._stocks is None:
+            self.refresh()
+        elif self._is_stale():
+            self._refresh_in_background()
+        return self._stocks
+
+    def refresh(self):
+        """从上游重新获取股票列表并写入本地快照"""
+        stocks = self._fetcher()
+        if stocks is None or len(stocks) == 0:
+            return self._stocks
+        stocks = stocks[['code', 'name']].reset_index(drop=True)
+        tmp_path = f"{self.file_path}.tmp"
+        stocks.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.file_path)
+        self._set_stocks(stocks, datetime.datetime.now())
+        return stocks
+
+    def search(self, query, limit=20):
+        """按代码、名称或拼音首字母前缀搜索
+
+        Args:
+            query: 搜索词，如"6000"、"sh6000"、"平安"、"payh"
+            limit: 最多返回条数
+
+        Returns:
+            [{'code': ..., 'name': ...}] 列表
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return []
+        self.get_list()
+        keys, records = self._index
+        results, seen = [], set()
+        position = bisect.bisect_left(keys, (query, -1))
+        while position < len(keys) and keys[position][0].startswith(query):
+            row = keys[position][1]
+            if row not in seen:
+                seen.add(row)
+                results.append(records[row])
+            position += 1
+        results.sort(key=lambda item: item['code'])
+        return results[:limit]
+
+    def get_name(self, symbol):
+        """返回股票名称，未知代码返回None（不会同步等待上游）"""
+        if self._stocks is None:
+            self._load_snapshot()
+            if self._stocks is None:
+                self._refresh_in_background()
+        return self._names.get(symbol)
+
+    def _is_stale(self):
+        return self._snapshot_time is None or datetime.datetime.now() - self._snapshot_time > self.ttl
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            stocks = pd.read_parquet(self.file_path)
+            snapshot_time = datetime.datetime.fromtimestamp(os.path.getmtime(self.file_path))
+            self._set_stocks(stocks, snapshot_time)
+        except Exception as e:
+            print(f"读取股票列表快照出错: {e}")
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"刷新股票列表出错: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='stock-universe-refresh', daemon=True).start()
+
+    def _set_stocks(self, stocks, snapshot_time):
+        """更新股票列表并重建搜索索引"""
+        names, index = self._build_index(stocks)
+        # 一次性替换引用，查询线程不会看到半成品索引
+        self._names = names
+        self._index = index
+        self._stocks = stocks
+        self._snapshot_time = snapshot_time
+
+    def _build_index(self, stocks):
+        """构建名称字典和有序前缀索引
+
+        Returns:
+            ({代码: 名称}, (有序的(搜索键, 行号)列表, 记录列表)) 元组
+        """
+        frames = [df for df in (self._extra, stocks) if df is not None]
+        if not frames:
+            return {}, ([], [])
+        indexed = pd.concat(frames, ignore_index=True)
+        records = indexed[['code', 'name']].to_dict(orient='records')
+        keys = []
+        for row, record in enumerate(records):
+            code = str(record['code']).lower()
+            name = str(record['name'])
+            keys.append((code, row))
+            # 同时支持不带市场前缀的数字代码
+            digits = code.lstrip('abcdefghijklmnopqrstuvwxyz')
+            if digits != code:
+                keys.append((digits, row))
+            keys.append((name.lower(), row))
+            initials = pinyin_initials(name)
+            if initials:
+                keys.append((initials, row))
+        keys.sort()
+        names = {record['code']: record['name'] for record in records}
+        return names, (keys, records)
@@ -5,6 +5,57 @@ import talib
 import numpy as np
 import pandas as pd
 
+
+# 各指标的计算函数，price(列名) 返回连续的float64价格数组，返回值依次对应输出列
+def _macd(price, fastperiod, slowperiod, signalperiod):
+    return talib.MACD(price('Close'), fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
+
+
+def _rsi(price, period):
+    return (talib.RSI(price('Close'), timeperiod=period),)
+
+
+def _boll(price, period, nbdevup, nbdevdn):
+    return talib.BBANDS(price('Close'), timeperiod=period, nbdevup=nbdevup, nbdevdn=nbdevdn)
+
+
+def _ma(price, periods):
+    return [talib.MA(price('Close'), timeperiod=period) for period in periods]
+
+
+def _kdj(price, fastk_period, slowk_period, slowd_period):
+    k, d = talib.STOCH(price('High'), price('Low'), price('Close'), fastk_period=fastk_period,
+                       slowk_period=slowk_period, slowk_matype=0, slowd_period=slowd_period, slowd_matype=0)
+    return k, d, 3 * k - 2 * d
+
+
+def _prices(**series):
+    """把价格序列转换为 TA-Lib 要求的连续float64数组，返回供上面各函数使用的 price(列名)"""
+    arrays = {column: np.ascontiguousarray(values, dtype=np.float64) for column, values in series.items()}
+    return arrays.__getitem__
+
+
+# 指标名称 -> (输出列, 默认参数)，calculate_all_indicators 按此顺序输出
+INDICATORS = {
+    'MACD': (('MACD', 'Signal', 'Histogram'), {'fastperiod': 12, 'slowperiod': 26, 'signalperiod': 9}),
+    'RSI': (('RSI',), {'period': 14}),
+    'BOLL': (('BB_Upper', 'BB_Middle', 'BB_Lower'), {'period': 20, 'nbdevup': 2, 'nbdevdn': 2}),
+    'MA': ((), {'periods': (5, 10, 20, 30, 60)}),
+    'KDJ': (('K', 'D', 'J'), {'fastk_period': 9, 'slowk_period': 3, 'slowd_period': 3}),
+}
+
+_COMPUTE = {'MACD': _macd, 'RSI': _rsi, 'BOLL': _boll, 'MA': _ma, 'KDJ': _kdj}
+
+# K线图可显示的指标（均线由 mav 参数绘制）
+CHART_INDICATORS = ('MACD', 'RSI', 'BOLL', 'KDJ')
+
+
+def chart_indicators(names):
+    """从用户选择的指标中取出K线图可显示的指标，忽略未知名称"""
+    selected = {name.strip().upper() for name in names or []}
+    return [name for name in CHART_INDICATORS if name in selected]
+
+
 class TechnicalIndicators:
     """技术指标计算类"""
     
@@ -22,17 +73,13 @@ class TechnicalIndicators:
             包含MACD指标的DataFrame
         """
         try:
-            macd, signal, hist = talib.MACD(
-                close_prices,
-                fastperiod=fastperiod,
-                slowperiod=slowperiod,
-                signalperiod=signalperiod
-            )
+            macd, signal, hist = _macd(_prices(Close=close_prices), fastperiod=fastperiod,
+                                       slowperiod=slowperiod, signalperiod=signalperiod)
             return pd.DataFrame({
                 'MACD': macd,
                 'Signal': signal,
                 'Histogram': hist
-            })
+            }, index=getattr(close_prices, 'index', None))
         except Exception as e:
             print(f"计算MACD出错: {e}")
             return None
@@ -49,8 +96,8 @@ class TechnicalIndicators:
             RSI值序列
         """
         try:
-            rsi = talib.RSI(close_prices, timeperiod=period)
-            return pd.Series(rsi, name='RSI')
+            rsi, = _rsi(_prices(Close=close_prices), period=period)
+            return pd.Series(rsi, index=getattr(close_prices, 'index', None), name='RSI')
         except Exception as e:
             print(f"计算RSI出错: {e}")
             return None
@@ -69,17 +116,13 @@ class TechnicalIndicators:
             包含布林带上中下轨的DataFrame
         """
         try:
-            upper, middle, lower = talib.BBANDS(
-                close_prices,
-                timeperiod=period,
-                nbdevup=nbdevup,
-                nbdevdn=nbdevdn
-            )
+            upper, middle, lower = _boll(_prices(Close=close_prices), period=period,
+                                         nbdevup=nbdevup, nbdevdn=nbdevdn)
             return pd.DataFrame({
                 'BB_Upper': upper,
                 'BB_Middle': middle,
                 'BB_Lower': lower
-            })
+            }, index=getattr(close_prices, 'index', None))
         except Exception as e:
             print(f"计算布林带出错: {e}")
             return None
@@ -96,11 +139,9 @@ class TechnicalIndicators:
             包含多个周期MA的DataFrame
         """
         try:
-            ma_dict = {}
-            for period in periods:
-                ma = talib.MA(close_prices, timeperiod=period)
-                ma_dict[f'MA{period}'] = ma
-            return pd.DataFrame(ma_dict)
+            averages = _ma(_prices(Close=close_prices), periods=periods)
+            return pd.DataFrame({f'MA{period}': ma for period, ma in zip(periods, averages)},
+                                index=getattr(close_prices, 'index', None))
         except Exception as e:
             print(f"计算移动平均线出错: {e}")
             return None
@@ -121,68 +162,105 @@ class TechnicalIndicators:
             包含KDJ指标的DataFrame
         """
         try:
-            k, d = talib.STOCH(
-                high_prices,
-                low_prices,
-                close_prices,
-                fastk_period=fastk_period,
-                slowk_period=slowk_period,
-                slowk_matype=0,
-                slowd_period=slowd_period,
-                slowd_matype=0
-            )
-            
-            # 计算J值
-            j = 3 * k - 2 * d
-            
+            k, d, j = _kdj(_prices(High=high_prices, Low=low_prices, Close=close_prices),
+                           fastk_period=fastk_period, slowk_period=slowk_period, slowd_period=slowd_period)
             return pd.DataFrame({
                 'K': k,
                 'D': d,
                 'J': j
-            })
+            }, index=getattr(close_prices, 'index', None))
         except Exception as e:
             print(f"计算KDJ出错: {e}")
             return None
     
     @staticmethod
-    def calculate_all_indicators(df):
-        """计算所有技术指标
+    def indicator_columns(name, params=None):
+        """返回指标的输出列名
         
         Args:
-            df: 包含OHLCV数据的DataFrame
+            name: 指标名称，见 INDICATORS
+            params: 指标参数，只有MA的列名与参数（periods）有关
             
         Returns:
-            包含所有技术指标的DataFrame
+            列名列表
         """
-        try:
-            result = pd.DataFrame(index=df.index)
-            
-            # 计算MACD
-            macd_df = TechnicalIndicators.calculate_macd(df['Close'])
-            if macd_df is not None:
-                result = pd.concat([result, macd_df], axis=1)
+        if name == 'MA':
+            periods = (params or {}).get('periods', INDICATORS['MA'][1]['periods'])
+            return [f'MA{period}' for period in periods]
+        return list(INDICATORS[name][0])
+    
+    @staticmethod
+    def normalize_indicators(indicators=None):
+        """统一指标参数格式
+        
+        Args:
+            indicators: 指标名称列表（如 ['MACD', 'RSI']），或 {名称: 参数字典}（如 {'RSI': {'period': 6}}），
+                        为None时表示全部指标
             
-            # 计算RSI
-            rsi = TechnicalIndicators.calculate_rsi(df['Close'])
-            if rsi is not None:
-                result['RSI'] = rsi
+        Returns:
+            按 INDICATORS 顺序排列的 [(名称, 参数字典)]，参数已合并默认值
             
-            # 计算布林带
-            bb_df = TechnicalIndicators.calculate_bollinger_bands(df['Close'])
-            if bb_df is not None:
-                result = pd.concat([result, bb_df], axis=1)
+        Raises:
+            ValueError: 未知的指标名称或参数
+        """
+        if indicators is None:
+            indicators = list(INDICATORS)
+        if not isinstance(indicators, dict):
+            indicators = {name: None for name in indicators}
+        requested = {}
+        for name, params in indicators.items():
+            name = name.strip().upper()
+            if name not in INDICATORS:
+                raise ValueError(f"未知的技术指标: {name}")
+            unknown = set(params or {}) - set(INDICATORS[name][1])
+            if unknown:
+                raise ValueError(f"{name} 不支持参数: {', '.join(sorted(unknown))}")
+            requested[name] = dict(INDICATORS[name][1], **(params or {}))
+        return [(name, requested[name]) for name in INDICATORS if name in requested]
+    
+    @staticmethod
+    def calculate_indicators(df, indicators=None):
+        """只计算指定的技术指标，结果直接写入预先分配的数组
+        
+        Args:
+            df: 包含OHLCV数据的DataFrame
+            indicators: 指标名称列表或 {名称: 参数字典}，为None时计算全部指标，格式见 normalize_indicators
             
-            # 计算移动平均线
-            ma_df = TechnicalIndicators.calculate_ma(df['Close'])
-            if ma_df is not None:
-                result = pd.concat([result, ma_df], axis=1)
+        Returns:
+            以df索引为索引的技术指标DataFrame，列顺序按 INDICATORS 排列
+        """
+        try:
+            requested = TechnicalIndicators.normalize_indicators(indicators)
+            columns = [TechnicalIndicators.indicator_columns(name, params) for name, params in requested]
+            values = np.empty((len(df), sum(len(c) for c in columns)), dtype=np.float64)
+            # TA-Lib要求连续的float64数组，每个价格字段只转换一次
+            prices = {}
             
-            # 计算KDJ
-            kdj_df = TechnicalIndicators.calculate_kdj(df['High'], df['Low'], df['Close'])
-            if kdj_df is not None:
-                result = pd.concat([result, kdj_df], axis=1)
+            def price(column):
+                if column not in prices:
+                    prices[column] = np.ascontiguousarray(df[column].values, dtype=np.float64)
+                return prices[column]
             
-            return result
+            position = 0
+            for (name, params), names in zip(requested, columns):
+                for output in _COMPUTE[name](price, **params):
+                    values[:, position] = output
+                    position += 1
+            return pd.DataFrame(values, index=df.index, columns=[c for names in columns for c in names],
+                                copy=False)
         except Exception as e:
             print(f"计算技术指标出错: {e}")
-            return None 
\ No newline at end of file
+            return None
+    
+    @staticmethod
+    def calculate_all_indicators(df):
+        """计算所有技术指标
+        
+        Args:
+            df: 包含OHLCV数据的DataFrame
+            
+        Returns:
+            包含所有技术指标的DataFrame
+        """
+        return TechnicalIndicators.calculate_indicators(df)
+
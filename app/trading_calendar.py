@@ -0,0 +1,143 @@
+"""
+交易日历 - 基于有序交易日数组的二分查找，提供交易日判断、前后交易日及收盘时间计算
+"""
+import os
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+# A股开盘（含集合竞价）及收盘时间
+SESSION_OPEN = datetime.time(9, 15)
+SESSION_CLOSE = datetime.time(15, 0)
+
+
+def _to_day(date):
+    """将字符串、date、datetime、Timestamp 统一转换为 numpy datetime64[D]"""
+    if isinstance(date, np.datetime64):
+        return date.astype('datetime64[D]')
+    return np.datetime64(pd.Timestamp(date).date(), 'D')
+
+
+def _weekdays(start, end):
+    """返回[start, end]区间内的工作日数组"""
+    days = np.arange(_to_day(start), _to_day(end) + 1, dtype='datetime64[D]')
+    return days[np.is_busday(days)]
+
+
+class TradingCalendar:
+    """交易日历
+
+    交易日来自数据源（AKShare为新浪交易日历）并缓存到本地；获取失败时退化为工作日，
+    一小时后重试。日历末尾之后的日期按工作日补齐。
+    """
+
+    def __init__(self, base_path=None, fetcher=None, max_age_days=30):
+        """初始化交易日历
+
+        Args:
+            base_path: 日历缓存目录，为None时不落盘
+            fetcher: 无参函数，返回交易日序列；为None时使用工作日
+            max_age_days: 本地日历缓存的有效天数
+        """
+        self.file_path = os.path.join(base_path, 'trade_calendar.npy') if base_path else None
+        self._fetcher = fetcher
+        self.max_age = datetime.timedelta(days=max_age_days)
+        self._lock = threading.Lock()
+        self._sessions = None
+        self._retry_at = None
+
+    @property
+    def sessions(self):
+        """有序的交易日数组（datetime64[D]）"""
+        if self._sessions is None or (self._retry_at and datetime.datetime.now() >= self._retry_at):
+            self._load()
+        return self._sessions
+
+    def _load(self):
+        with self._lock:
+            now = datetime.datetime.now()
+            if self._sessions is not None and not (self._retry_at and now >= self._retry_at):
+                return
+            sessions = None
+            self._retry_at = None
+            if self.file_path and os.path.exists(self.file_path):
+                modified = datetime.datetime.fromtimestamp(os.path.getmtime(self.file_path))
+                if now - modified < self.max_age:
+                    sessions = np.load(self.file_path)
+            if sessions is None and self._fetcher is not None:
+                try:
+                    fetched = self._fetcher()
+                    if fetched is not None and len(fetched) > 0:
+                        sessions = np.unique(pd.to_datetime(pd.Series(fetched)).values.astype('datetime64[D]'))
+                        if self.file_path:
+                            tmp_path = f"{self.file_path}.tmp.npy"
+                            np.save(tmp_path, sessions)
+                            os.replace(tmp_path, self.file_path)
+                except Exception as e:
+                    print(f"获取交易日历出错，暂时按工作日处理: {e}")
+            if sessions is None:
+                sessions = _weekdays('1990-12-19', now.date())
+                self._retry_at = now + datetime.timedelta(hours=1)
+            # 日历之后的日期按工作日补齐
+            horizon = now.date() + datetime.timedelta(days=366)
+            if sessions[-1] < _to_day(horizon):
+                sessions = np.concatenate([sessions, _weekdays(sessions[-1] + 1, horizon)])
+            self._sessions = sessions
+
+    def is_session(self, date):
+        """是否为交易日"""
+        sessions = self.sessions
+        day = _to_day(date)
+        i = np.searchsorted(sessions, day)
+        return bool(i < len(sessions) and sessions[i] == day)
+
+    def next_session(self, date):
+        """返回date之后（不含）的第一个交易日"""
+        sessions = self.sessions
+        i = np.searchsorted(sessions, _to_day(date), side='right')
+        return pd.Timestamp(sessions[min(i, len(sessions) - 1)])
+
+    def previous_session(self, date):
+        """返回date之前（不含）的最后一个交易日"""
+        sessions = self.sessions
+        i = np.searchsorted(sessions, _to_day(date), side='left')
+        return pd.Timestamp(sessions[max(i - 1, 0)])
+
+    def sessions_in_range(self, start_date, end_date):
+        """返回[start_date, end_date]区间内的交易日（数组视图）"""
+        sessions = self.sessions
+        i = np.searchsorted(sessions, _to_day(start_date), side='left')
+        j = np.searchsorted(sessions, _to_day(end_date), side='right')
+        return sessions[i:j]
+
+    def session_window_start(self, end_date, count):
+        """返回截至end_date（含）最近count个交易日中的第一个交易日"""
+        sessions = self.sessions
+        j = np.searchsorted(sessions, _to_day(end_date), side='right')
+        return pd.Timestamp(sessions[max(j - max(int(count), 1), 0)])
+
+    def is_trading_time(self, now=None):
+        """当前是否处于交易日的交易时段（含集合竞价，收盘后留5分钟等待最后的行情）"""
+        now = now or datetime.datetime.now()
+        close = (datetime.datetime.combine(now.date(), SESSION_CLOSE) + datetime.timedelta(minutes=5)).time()
+        return SESSION_OPEN <= now.time() <= close and self.is_session(now)
+
+    def latest_closed_session(self, now=None):
+        """返回最近一个已收盘的交易日"""
+        now = now or datetime.datetime.now()
+        if now.time() >= SESSION_CLOSE and self.is_session(now):
+            return pd.Timestamp(now.date())
+        return self.previous_session(now)
+
+    def last_session_close(self, now=None):
+        """返回最近一次收盘的时间"""
+        day = self.latest_closed_session(now)
+        return datetime.datetime.combine(day.date(), SESSION_CLOSE)
+
+    def next_session_close(self, now=None):
+        """返回下一次收盘的时间，用于判断缓存何时过期"""
+        now = now or datetime.datetime.now()
+        if now.time() < SESSION_CLOSE and self.is_session(now):
+            return datetime.datetime.combine(now.date(), SESSION_CLOSE)
+        return datetime.datetime.combine(self.next_session(now).date(), SESSION_CLOSE)
@@ -29,6 +29,18 @@ if missing_vars:
 from app import create_app
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'prefetch':
+        # python run.py prefetch：立即同步自选股及常用指数并生成默认K线图，可由定时任务在收盘后调用
+        from app.routes import prefetch_scheduler
+        result = prefetch_scheduler.run_once()
+        sys.exit(1 if result['errors'] else 0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'matrix':
+        # python run.py matrix：由本地存储重建全市场矩阵（收盘后预取结束时也会自动重建）
+        from app.routes import akshare_client
+        matrix = akshare_client.build_market_matrix()
+        logging.info(f"全市场矩阵已重建: {matrix.shape[0]}个交易日 x {matrix.shape[1]}只股票")
+        sys.exit(0)
+    
     logging.info("启动股市分析应用...")
     app = create_app()
     logging.info("应用已启动，访问 http://localhost:8080")
@@ -0,0 +1,91 @@
+"""
+测试公共配置 - 导入app包前补齐必需的环境变量，提供以临时目录为存储的AKShareClient
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app包导入时会初始化OSS客户端，测试中不访问OSS
+os.environ.setdefault('ALIYUN_ACCESS_KEY_ID', 'test-access-key-id')
+os.environ.setdefault('ALIYUN_ACCESS_KEY_SECRET', 'test-access-key-secret')
+
+from app.data_providers import DataProvider  # noqa: E402
+
+
+class FrameProvider(DataProvider):
+    """由测试直接提供数据的行情数据源，记录每次调用"""
+
+    name = 'frames'
+
+    def __init__(self, daily=None, factors=None, minute=None, stocks=None):
+        self.daily = daily or {}
+        self.factors = factors or {}
+        self.minute = minute or {}
+        self.stocks = stocks
+        self.calls = []
+
+    def fetch_daily(self, symbol, start_date=None):
+        self.calls.append(('daily', symbol, start_date))
+        df = self.daily[symbol]
+        if start_date is not None:
+            df = df[pd.to_datetime(df['date']) >= pd.Timestamp(start_date)]
+        return df.copy()
+
+    def fetch_factors(self, symbol):
+        self.calls.append(('factors', symbol))
+        return self.factors.get(symbol)
+
+    def fetch_stock_list(self):
+        self.calls.append(('stock_list',))
+        return self.stocks
+
+    def fetch_minute(self, symbol, minutes):
+        self.calls.append(('minute', symbol, minutes))
+        return self.minute.get((symbol, minutes))
+
+
+def daily_frame(dates, closes, volume=1000.0):
+    """按收盘价序列构造原始日线，开高低由收盘价派生"""
+    closes = pd.Series(closes, dtype=float).values
+    return pd.DataFrame({
+        'date': pd.to_datetime(dates).strftime('%Y-%m-%d'),
+        'open': closes * 0.99,
+        'high': closes * 1.02,
+        'low': closes * 0.97,
+        'close': closes,
+        'volume': volume
+    })
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """以临时目录为本地存储创建AKShareClient"""
+    from app.akshare_client import AKShareClient
+
+    def make(provider):
+        return AKShareClient(image_save_path=str(tmp_path / 'charts'), data_store_path=str(tmp_path / 'market'),
+                             provider=provider)
+    return make
+
+
+@pytest.fixture
+def api(make_client, monkeypatch):
+    """注册main蓝图的Flask测试客户端，行情来自以300个工作日日线构造的FrameProvider
+
+    Returns:
+        (Flask测试客户端, AKShareClient)
+    """
+    from flask import Flask
+    from app import routes
+    from app.trading_calendar import TradingCalendar
+    end = TradingCalendar().latest_closed_session()
+    dates = pd.bdate_range(end=end, periods=300)
+    provider = FrameProvider(daily={'sz000001': daily_frame(dates, 10.0 + pd.Series(range(300)) * 0.01),
+                                    'sh600519': daily_frame(dates, 100.0 + pd.Series(range(300)) * 0.1)})
+    client = make_client(provider)
+    monkeypatch.setattr(routes, 'akshare_client', client)
+    app = Flask(__name__)
+    app.register_blueprint(routes.main)
+    return app.test_client(), client
@@ -0,0 +1,70 @@
+import datetime
+import numpy as np
+import pandas as pd
+from app.bar_aggregator import BarAggregator
+from app.trading_calendar import TradingCalendar
+
+DAY = datetime.date(2025, 3, 10)
+
+
+def quote(price, volume, open_=10.0, high=10.5, low=9.5):
+    return pd.DataFrame({'price': [price], 'open': [open_], 'high': [high], 'low': [low], 'volume': [volume]},
+                        index=['sz000001'])
+
+
+def at(hour, minute, second=0):
+    return datetime.datetime.combine(DAY, datetime.time(hour, minute, second))
+
+
+def collect():
+    bars = []
+
+    def on_bars(kind, symbols, times, values, final):
+        for i, symbol in enumerate(symbols):
+            bars.append((kind, symbol, pd.Timestamp(times[i]), values[:, i].copy(), final))
+    return bars, on_bars
+
+
+def test_first_partial_bar_after_mid_session_subscribe_is_not_emitted():
+    bars, on_bars = collect()
+    aggregator = BarAggregator(TradingCalendar(), minutes=(1, 60), on_bars=on_bars)
+    aggregator.update(quote(10.0, 5_000_000), at(10, 0, 30))
+    aggregator.update(quote(10.1, 5_005_000), at(10, 0, 50))
+    aggregator.update(quote(10.2, 5_010_000), at(10, 1, 10))
+    aggregator.update(quote(9.9, 5_020_000), at(10, 1, 40))
+    aggregator.update(quote(10.0, 5_030_000), at(10, 2, 5))
+
+    minute_bars = [bar for bar in bars if bar[0] == 1]
+    assert pd.Timestamp(at(10, 1)) not in {bar[2] for bar in minute_bars}
+    final = [bar for bar in minute_bars if bar[4]]
+    assert len(final) == 1
+    kind, symbol, time, values, _ = final[0]
+    assert time == pd.Timestamp(at(10, 2))
+    np.testing.assert_array_equal(values, [10.2, 10.2, 9.9, 9.9, 15_000])
+    # 10:30结束的60分钟线是当日第一根，与当日行情一致，正常回调
+    hourly = [bar for bar in bars if bar[0] == 60]
+    assert hourly and hourly[-1][3][4] == 5_030_000
+
+
+def test_first_bar_of_day_uses_day_open_high_low():
+    bars, on_bars = collect()
+    aggregator = BarAggregator(TradingCalendar(), minutes=(60,), on_bars=on_bars)
+    aggregator.update(quote(10.2, 300_000, open_=10.0, high=10.6, low=9.8), at(10, 0, 30))
+    aggregator.update(quote(10.3, 310_000, open_=10.0, high=10.6, low=9.8), at(10, 31))
+
+    final = [bar for bar in bars if bar[0] == 60 and bar[4]]
+    assert len(final) == 1
+    assert final[0][2] == pd.Timestamp(at(10, 30))
+    np.testing.assert_array_equal(final[0][3], [10.0, 10.6, 9.8, 10.2, 300_000])
+
+
+def test_hourly_bar_after_mid_session_subscribe_is_not_emitted():
+    bars, on_bars = collect()
+    aggregator = BarAggregator(TradingCalendar(), minutes=(60,), on_bars=on_bars)
+    aggregator.update(quote(10.0, 5_000_000), at(10, 40))
+    aggregator.update(quote(10.1, 5_100_000), at(11, 29))
+    aggregator.update(quote(10.2, 5_200_000), at(13, 1))
+
+    hourly = [bar for bar in bars if bar[0] == 60]
+    assert not [bar for bar in hourly if bar[2] == pd.Timestamp(at(11, 30))]
+    assert hourly[-1][2] == pd.Timestamp(at(14, 0)) and hourly[-1][3][4] == 100_000
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.bar_resampler import bucket_start, parse_period, period_sessions, resample_ohlcv
+
+
+def daily(start, end):
+    index = pd.bdate_range(start, end, name='Date')
+    values = np.arange(1, len(index) + 1, dtype=float)
+    return pd.DataFrame({'Open': values, 'High': values + 1, 'Low': values - 1, 'Close': values + 0.5,
+                         'Volume': values * 100}, index=index)
+
+
+def reference(df, rule):
+    grouped = df.groupby(df.index.to_period(rule))
+    expected = grouped.agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    expected.index = grouped.apply(lambda group: group.index[-1]).values
+    return expected
+
+
+@pytest.mark.parametrize('period, rule', [('weekly', 'W-SUN'), ('monthly', 'M')])
+def test_buckets_match_pandas_groupby(period, rule):
+    # 跨年、跨月且首尾均为不完整区间
+    df = daily('2023-11-29', '2024-02-07').drop(pd.Timestamp('2024-01-01'))
+    result = resample_ohlcv(df, period)
+    expected = reference(df, rule)
+    np.testing.assert_array_equal(result.values, expected.values)
+    assert list(result.index) == list(expected.index)
+
+
+def test_ndays_anchor_on_latest_bar():
+    df = daily('2024-01-01', '2024-01-10')
+    result = resample_ohlcv(df, '3d')
+    # 8根日线分为 2+3+3，最新一根K线完整
+    assert len(result) == 3
+    assert result['Volume'].tolist() == [300.0, 1200.0, 2100.0]
+    assert result.index[-1] == df.index[-1]
+
+
+def test_parse_period():
+    assert parse_period('weekly') == ('weekly', 1)
+    assert parse_period('1d') == ('daily', 1)
+    assert parse_period('5d') == ('ndays', 5)
+    assert parse_period('15min') == ('minute', 15)
+    assert parse_period(None) == ('daily', 1)
+    for period in ('7min', 'bogus', '0d'):
+        with pytest.raises(ValueError):
+            parse_period(period)
+    assert period_sessions('60min') == 0.25
+
+
+def test_bucket_start():
+    assert bucket_start('2024-01-04', 'weekly') == pd.Timestamp('2024-01-01')
+    assert bucket_start('2024-02-29', 'monthly') == pd.Timestamp('2024-02-01')
+    assert bucket_start('2024-01-04', 'daily') == pd.Timestamp('2024-01-04')
+    assert bucket_start('2024-01-04', '3d') is None
+
+
+@pytest.mark.parametrize('path', ['/api/stock/data?symbol=sz000001&period=bogus',
+                                  '/api/stock/chart?symbol=sz000001&period=7min'])
+def test_api_rejects_unknown_period(api, path):
+    http, _ = api
+    response = http.get(path)
+    assert response.status_code == 400
+    assert '不支持的周期' in response.get_json()['error']
+
+
+def test_kline_rejects_unknown_period(api):
+    http, _ = api
+    response = http.post('/stock/kline', data={'symbol': 'sz000001', 'period': 'bogus'})
+    assert response.status_code == 400
+
+
+def test_kline_fetches_only_complete_weekly_bars(api, monkeypatch):
+    from app import routes
+    http, client = api
+    captured = {}
+    monkeypatch.setattr(client, 'generate_kline_chart', lambda df, **kwargs: captured.update(df=df) or 'chart.png')
+    response = http.post('/stock/kline', data={'symbol': 'sz000001', 'period': 'weekly'})
+    assert response.get_json()['image_url'].endswith('chart.png')
+    df = captured['df']
+    assert len(df) == routes.KLINE_DAYS
+    # 第一根周线包含完整的一周
+    daily = client.get_stock_data('sz000001', start_date='2000-01-01', adjust='qfq')
+    first_week = daily[(daily.index > df.index[0] - pd.Timedelta(days=7)) & (daily.index <= df.index[0])]
+    assert df['Volume'].iloc[0] == first_week['Volume'].sum() == 5000.0
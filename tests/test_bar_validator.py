@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from app.bar_validator import MAX_GAP_RANGES, find_gaps, validate_bars
+
+SESSIONS = pd.bdate_range('2024-01-01', '2024-03-29').values.astype('datetime64[D]')
+
+
+def test_validate_bars_report():
+    index = pd.DatetimeIndex(['2024-01-03', '2024-01-02', '2024-01-03', '2024-01-06', '2024-01-04', '2024-01-05',
+                              '2024-01-08', '2024-01-09'], name='Date')
+    df = pd.DataFrame({
+        'Open':   [10.0, 10.0, 10.5, 10.0, np.nan, 9.0, 10.0, 10.0],
+        'High':   [11.0, 11.0, 11.0, 11.0, 11.0, 9.0, 10.5, 10.5],
+        'Low':    [9.0, 9.0, 10.0, 9.0, 9.0, 9.0, 10.0, 9.5],
+        'Close':  [10.0, 10.5, 11.5, 10.0, 10.0, 9.0, 10.0, 10.0],
+        'Volume': [100.0, 100.0, 100.0, 100.0, 100.0, 0.0, 0.0, -1.0],
+    }, index=index)
+    cleaned, report = validate_bars(df, SESSIONS)
+    assert report == {'rows': 8, 'duplicates': 1, 'invalid': 2, 'suspended': 1, 'non_session': 1,
+                      'ohlc_repaired': 1, 'zero_volume': 1}
+    assert list(cleaned.index.strftime('%Y-%m-%d')) == ['2024-01-02', '2024-01-03', '2024-01-08']
+    # 重复日期保留最后一条，High按四个价格修正
+    assert cleaned.loc['2024-01-03', 'High'] == 11.5
+    assert cleaned.index.is_monotonic_increasing
+
+
+def test_find_gaps_merges_consecutive_sessions():
+    days = pd.DatetimeIndex(SESSIONS).delete([5, 6, 7, 20])
+    gaps = find_gaps(days, SESSIONS)
+    assert gaps['missing_sessions'] == 4
+    assert gaps['gap_ranges'] == [[str(SESSIONS[5]), str(SESSIONS[7])], [str(SESSIONS[20]), str(SESSIONS[20])]]
+    assert find_gaps(pd.DatetimeIndex(SESSIONS), SESSIONS) == {'missing_sessions': 0, 'gap_ranges': []}
+
+
+def test_find_gaps_keeps_latest_ranges():
+    days = pd.DatetimeIndex(SESSIONS).delete(list(range(1, 60, 2)))
+    gaps = find_gaps(days, SESSIONS)
+    assert len(gaps['gap_ranges']) == MAX_GAP_RANGES
+    assert gaps['gap_ranges'][-1][0] == str(SESSIONS[59])
+
+
+def test_quality_report_api(api):
+    http, _ = api
+    report = http.get('/api/stock/quality?symbol=sz000001').get_json()['report']
+    assert report['rows'] == report['bars'] == 300
+    assert report['missing_sessions'] == 0 and report['duplicates'] == 0
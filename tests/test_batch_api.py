@@ -0,0 +1,24 @@
+import pytest
+
+
+def test_batch_returns_columns_per_symbol(api):
+    http, _ = api
+    body = http.get('/api/stock/batch?symbols=sz000001,sh600519,sz000001&days=5').get_json()
+    assert body['symbols'] == ['sz000001', 'sh600519']
+    assert set(body['data']) == {'sz000001', 'sh600519'}
+    assert len(body['data']['sz000001']['Close']) == 5
+    assert body['errors'] == {}
+
+
+@pytest.mark.parametrize('query', [
+    'symbols=',
+    'symbols=sz000001&days=abc',
+    'symbols=sz000001&days=0',
+    'symbols=sz000001&start_date=2024-02-30',
+    'symbols=../etc,sz000001',
+])
+def test_batch_rejects_bad_input_with_400(api, query):
+    http, _ = api
+    response = http.get(f'/api/stock/batch?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
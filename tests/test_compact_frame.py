@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from app.compact_frame import day_number, from_compact, index_days, is_compact, to_compact
+
+
+def daily(volume):
+    index = pd.bdate_range('2024-01-02', periods=len(volume), name='Date')
+    close = np.round(np.linspace(9.87, 1234.567, len(volume)), 3)
+    return pd.DataFrame({'Open': close, 'High': close + 0.011, 'Low': close - 0.009, 'Close': close,
+                         'Volume': np.asarray(volume, dtype=float)}, index=index)
+
+
+def test_round_trip_restores_prices_and_dates():
+    df = daily(np.arange(50) * 1000.0)
+    compact = to_compact(df)
+    assert is_compact(compact)
+    assert compact.index.dtype == np.int32
+    assert compact['Close'].dtype == np.float32
+    assert compact['Volume'].dtype == np.uint32
+    pd.testing.assert_frame_equal(from_compact(compact), df, check_freq=False)
+    assert to_compact(compact) is compact and from_compact(df) is df
+
+
+def test_five_digit_index_keeps_float64_prices():
+    index = pd.bdate_range('2024-01-02', periods=3, name='Date')
+    close = np.array([9876.543, 10234.567, 18211.763])
+    df = pd.DataFrame({'Open': close, 'High': close + 12.345, 'Low': close - 7.891, 'Close': close,
+                       'Volume': [1e10, 2e10, 3e10]}, index=index)
+    # float32下5位数点位按3位小数无法还原
+    assert np.round(np.float32(18211.763).astype(np.float64), 3) != 18211.763
+    compact = to_compact(df)
+    assert compact['Close'].dtype == np.float64
+    pd.testing.assert_frame_equal(from_compact(compact), df, check_freq=False)
+
+
+def test_volume_dtype_widens_or_stays_float():
+    assert to_compact(daily([1.0, 5e9]))['Volume'].dtype == np.uint64
+    assert to_compact(daily([1.0, 2.5]))['Volume'].dtype == np.float64
+    assert to_compact(daily([1.0, np.nan]))['Volume'].dtype == np.float64
+
+
+def test_day_numbers():
+    assert day_number('1970-01-02') == 1
+    df = daily([1.0, 2.0])
+    assert (index_days(df.index) == index_days(to_compact(df).index)).all()
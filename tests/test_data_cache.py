@@ -0,0 +1,42 @@
+import datetime
+import pandas as pd
+from app.data_cache import DataFrameCache
+from app.trading_calendar import TradingCalendar
+
+
+def frame(rows=10):
+    return pd.DataFrame({'Close': [1.0] * rows}, index=pd.bdate_range('2024-01-01', periods=rows))
+
+
+def test_entries_expire_at_next_session_close():
+    calendar = TradingCalendar()
+    cache = DataFrameCache(max_bytes=1 << 20, calendar=calendar)
+    df = frame()
+    cache.put('sz000001', df)
+    close = calendar.next_session_close()
+    assert cache.get('sz000001', now=close - datetime.timedelta(seconds=1)) is df
+    assert cache.get('sz000001', now=close) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_explicit_expiry():
+    cache = DataFrameCache(max_bytes=1 << 20)
+    now = datetime.datetime(2024, 1, 5, 10, 0)
+    cache.put('sz000001', frame(), expires_at=now + datetime.timedelta(seconds=60))
+    assert cache.get('sz000001', now=now) is not None
+    assert cache.get('sz000001', now=now + datetime.timedelta(seconds=61)) is None
+
+
+def test_lru_eviction_by_bytes():
+    size = int(frame().memory_usage(index=True, deep=True).sum())
+    cache = DataFrameCache(max_bytes=size * 2)
+    cache.put('a', frame())
+    cache.put('b', frame())
+    cache.get('a')
+    cache.put('c', frame())
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+    # 单个条目超过上限时不缓存
+    cache.put('big', frame(1000))
+    assert cache.get('big') is None
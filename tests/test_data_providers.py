@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from app.data_providers import FixtureProvider, LatencyProvider, SyntheticProvider, create_data_provider
+from conftest import daily_frame
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    dates = pd.bdate_range('2024-01-02', periods=30)
+    daily_frame(dates, range(10, 40)).to_csv(tmp_path / 'sz000001.csv', index=False)
+    daily_frame(dates, range(100, 130)).rename(columns=str.upper).to_parquet(tmp_path / 'sh000001.parquet')
+    pd.DataFrame({'date': ['1900-01-01', '2024-01-10'], 'hfq_factor': [1.0, 1.5]}).to_csv(
+        tmp_path / 'sz000001_hfq_factor.csv', index=False)
+    return FixtureProvider(str(tmp_path))
+
+
+def test_fixture_provider_reads_local_files(fixtures):
+    df = fixtures.fetch_daily('sz000001', start_date='2024-02-01')
+    assert df['date'].iloc[0] == '2024-02-01' and df['close'].iloc[-1] == 39
+    assert fixtures.fetch_daily('sh000001')['close'].iloc[0] == 100
+    assert fixtures.fetch_factors('sz000001')['hfq_factor'].tolist() == [1.0, 1.5]
+    assert fixtures.fetch_factors('sh000001') is None
+    # 没有 stock_list.csv 时由文件名生成，不含指数
+    assert fixtures.fetch_stock_list()['code'].tolist() == ['sz000001']
+    assert fixtures.fetch_spot(['sz000001']).loc['sz000001', 'prev_close'] == 38
+    with pytest.raises(FileNotFoundError):
+        fixtures.fetch_daily('sz000002')
+    with pytest.raises(ValueError):
+        fixtures.fetch_daily('../sz000001')
+
+
+def test_client_serves_fixture_data_offline(make_client, fixtures):
+    client = make_client(fixtures)
+    df = client.get_stock_data('sz000001', start_date='2024-01-01', end_date='2024-02-12', adjust='hfq')
+    assert len(df) == 30
+    assert df['Close'].iloc[-1] == 39 * 1.5 and df['Close'].iloc[0] == 10
+
+
+def test_synthetic_provider_is_deterministic():
+    provider = SyntheticProvider(symbol_count=10, years=1)
+    first, second = provider.fetch_daily('sz000001'), provider.fetch_daily('sz000001')
+    pd.testing.assert_frame_equal(first, second)
+    assert (first['high'] >= first[['open', 'close']].max(axis=1)).all()
+    assert not first['close'].equals(provider.fetch_daily('sz000002')['close'])
+    assert len(provider.fetch_stock_list()) == 10
+    minute = provider.fetch_minute('sz000001', 5, count=100)
+    assert len(minute) == 100 and minute['day'].is_monotonic_increasing
+
+
+def test_create_data_provider(monkeypatch):
+    monkeypatch.setenv('STOCK_PROVIDER_LATENCY_MS', '1')
+    provider = create_data_provider('synthetic')
+    assert isinstance(provider, LatencyProvider) and provider.name == 'synthetic'
+    with pytest.raises(ValueError):
+        create_data_provider('bloomberg')
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.downsampler import downsample_ohlcv, lttb_indices
+
+
+def bars(count=1000, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.1, count))
+    index = pd.bdate_range('2015-01-01', periods=count, name='Date')
+    return pd.DataFrame({'Open': close, 'High': close + 0.2, 'Low': close - 0.2, 'Close': close,
+                         'Volume': np.ones(count)}, index=index)
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    y = np.zeros(1000)
+    y[333], y[777] = 50.0, -50.0
+    selected = lttb_indices(y, 20)
+    assert len(selected) == 20
+    assert selected[0] == 0 and selected[-1] == 999
+    assert (np.diff(selected) > 0).all()
+    assert 333 in selected and 777 in selected
+    assert lttb_indices(y[:10], 20).tolist() == list(range(10))
+    assert lttb_indices(y, 2).tolist() == [0, 999]
+
+
+@pytest.mark.parametrize('max_points', [7, 100, 999])
+def test_ohlc_buckets_preserve_range_and_volume(max_points):
+    df = bars()
+    result = downsample_ohlcv(df, max_points)
+    assert len(result) <= max_points
+    assert result['High'].max() == df['High'].max()
+    assert result['Low'].min() == df['Low'].min()
+    assert result['Volume'].sum() == df['Volume'].sum()
+    assert result.index[-1] == df.index[-1]
+
+
+def test_lttb_returns_original_rows():
+    df = bars()
+    result = downsample_ohlcv(df, 50, method='lttb')
+    assert len(result) == 50
+    pd.testing.assert_frame_equal(result, df.loc[result.index])
+    assert downsample_ohlcv(df, None) is df
+    with pytest.raises(ValueError):
+        downsample_ohlcv(df, 50, method='foo')
+
+
+def test_api_max_points(api):
+    http, _ = api
+    full = http.get('/api/stock/data?symbol=sz000001&days=200&format=columnar').get_json()['data']
+    ohlc = http.get('/api/stock/data?symbol=sz000001&days=200&format=columnar&max_points=30').get_json()['data']
+    assert len(ohlc['Close']) <= 30
+    assert max(ohlc['High']) == max(full['High'])
+    assert sum(ohlc['Volume']) == sum(full['Volume'])
+    lttb = http.get('/api/stock/data?symbol=sz000001&days=200&format=columnar&max_points=30&downsample=lttb')
+    data = lttb.get_json()['data']
+    assert len(data['Day']) == 30 and set(data['Day']) <= set(full['Day'])
+    assert http.get('/api/stock/data?symbol=sz000001&max_points=30&downsample=foo').status_code == 400
+    for bad in ('abc', '-5', '1.5'):
+        assert http.get(f'/api/stock/data?symbol=sz000001&max_points={bad}').status_code == 400
+        assert http.get(f'/api/stock/chart?symbol=sz000001&max_points={bad}').status_code == 400
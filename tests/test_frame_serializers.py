@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.frame_serializers import (float32_columns, frame_to_arrow, frame_to_columns, frame_to_float32,
+                                   frame_to_records, time_unit)
+
+
+def daily(count=3):
+    index = pd.bdate_range('2024-01-02', periods=count, name='Date')
+    return pd.DataFrame({'Open': [10.0, 10.5, 11.0][:count], 'Close': [10.2, 10.8, 11.1][:count],
+                         'Volume': [1000.0, 2000.0, 3000.0][:count]}, index=index)
+
+
+def minute():
+    index = pd.DatetimeIndex(['2024-01-02 09:31', '2024-01-02 09:32'], name='Date')
+    return pd.DataFrame({'Close': [10.0, 10.1]}, index=index)
+
+
+def test_records_and_columns():
+    df = daily()
+    assert frame_to_records(df)[0] == {'Date': '2024-01-02 00:00:00', 'Open': 10.0, 'Close': 10.2, 'Volume': 1000.0}
+    columns = frame_to_columns(df)
+    assert columns['Date'] == ['2024-01-02', '2024-01-03', '2024-01-04']
+    epoch = frame_to_columns(df, date_format='epoch_day')
+    assert epoch['Day'][0] == 19724 and epoch['Close'] == df['Close'].tolist()
+    assert frame_to_columns(minute(), date_format='epoch_day')['Minute'][0] == 19724 * 1440 + 9 * 60 + 31
+    assert frame_to_columns(minute())['Date'][0] == '2024-01-02 09:31:00'
+
+
+def test_float32_layout():
+    df = daily()
+    assert float32_columns(df) == ['Day', 'Open', 'Close', 'Volume']
+    matrix = np.frombuffer(frame_to_float32(df), dtype='<f4').reshape(4, 3)
+    assert matrix[0].tolist() == [19724, 19725, 19726]
+    np.testing.assert_array_equal(matrix[2], df['Close'].values.astype(np.float32))
+
+    intraday = minute()
+    assert float32_columns(intraday) == ['Day', 'MinuteOfDay', 'Close']
+    matrix = np.frombuffer(frame_to_float32(intraday), dtype='<f4').reshape(3, 2)
+    assert matrix[1].tolist() == [571, 572]
+    assert time_unit(intraday) == 'minute' and time_unit(daily()) == 'day'
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    df = daily()
+    table = pa.ipc.open_stream(frame_to_arrow(df)).read_all()
+    assert table.column_names == ['Day', 'Open', 'Close', 'Volume']
+    assert table.column('Day').type == pa.int32()
+    assert table.column('Close').to_pylist() == df['Close'].tolist()
+
+
+def test_api_formats(api):
+    http, _ = api
+    records = http.get('/api/stock/data?symbol=sz000001&days=5').get_json()['data']
+    columnar = http.get('/api/stock/data?symbol=sz000001&days=5&format=columnar').get_json()
+    assert columnar['time_unit'] == 'day'
+    assert columnar['data']['Close'] == [row['Close'] for row in records]
+
+    response = http.get('/api/stock/data?symbol=sz000001&days=5&format=f32')
+    columns = response.headers['X-Columns'].split(',')
+    assert response.headers['X-Rows'] == '5' and response.headers['X-Time-Unit'] == 'day'
+    matrix = np.frombuffer(response.data, dtype='<f4').reshape(len(columns), 5)
+    np.testing.assert_array_equal(matrix[0], np.array(columnar['data']['Day'], dtype=np.float32))
+
+    assert http.get('/api/stock/data?symbol=sz000001&format=xml').status_code == 400
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import talib
+import pytest
+from app.incremental_indicators import IndicatorEngine, IndicatorStateStore
+
+
+def ohlc(count=400, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    high = close * (1 + rng.uniform(0, 0.03, count))
+    low = close * (1 - rng.uniform(0, 0.03, count))
+    open_ = np.clip(close * (1 + rng.normal(0, 0.01, count)), low, high)
+    index = pd.bdate_range('2020-01-01', periods=count, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                         'Volume': rng.uniform(1e5, 1e6, count)}, index=index)
+
+
+@pytest.mark.parametrize('warmup', [0, 20, 60])
+def test_bar_by_bar_append_matches_batch_talib(warmup):
+    df = ohlc()
+    indicators = {'MA': {'periods': [5, 20]}, 'MACD': {}, 'KDJ': {}}
+    if warmup:
+        engine = IndicatorEngine.from_history(df.iloc[:warmup], indicators)
+    else:
+        engine = IndicatorEngine(indicators)
+    for i in range(warmup, len(df)):
+        engine.append(df.iloc[i:i + 1])
+    frame = engine.frame()
+
+    high, low, close = df['High'].values, df['Low'].values, df['Close'].values
+    k, d = talib.STOCH(high, low, close, fastk_period=9, slowk_period=3, slowk_matype=0, slowd_period=3,
+                       slowd_matype=0)
+    macd, signal, histogram = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    expected = {'MA5': talib.SMA(close, 5), 'MA20': talib.SMA(close, 20), 'MACD': macd, 'Signal': signal,
+                'Histogram': histogram, 'K': k, 'D': d, 'J': 3 * k - 2 * d}
+    for column, values in expected.items():
+        assert np.array_equal(frame[column].values, values, equal_nan=True), column
+
+
+def test_replayed_state_continues_like_batch():
+    df = ohlc()
+    indicators = {'RSI': {}, 'BOLL': {}, 'KDJ': {}}
+    engine = IndicatorEngine.from_history(df.iloc[:300], indicators)
+    engine.append(df.iloc[300:])
+    batch = IndicatorEngine.from_history(df, indicators).frame()
+    pd.testing.assert_frame_equal(engine.frame(), batch, check_exact=False, rtol=1e-12)
+
+
+def test_state_store_round_trip(tmp_path):
+    df = ohlc(100)
+    store = IndicatorStateStore(str(tmp_path))
+    engine = IndicatorEngine.from_history(df.iloc[:80], {'MACD': {}})
+    store.save('sz000001', 'qfq', 'macd', engine, {'rows': 80})
+    loaded, checkpoint = store.load('sz000001', 'qfq', 'macd')
+    assert checkpoint == {'rows': 80}
+    loaded.append(df.iloc[80:])
+    engine.append(df.iloc[80:])
+    pd.testing.assert_frame_equal(loaded.frame(), engine.frame())
+    assert store.load('sz000001', 'qfq', 'other') is None
+    with pytest.raises(ValueError):
+        store.load('../../sz000001', 'qfq', 'macd')
+
+
+def test_client_checkpoints_on_bar_interval(make_client, monkeypatch):
+    from conftest import FrameProvider
+    client = make_client(FrameProvider())
+    client.indicator_checkpoint_bars = 5
+    df = ohlc(200)
+    df['Factor'] = 1.0
+    saved = []
+    save = client.indicator_states.save
+    monkeypatch.setattr(client.indicator_states, 'save', lambda *args: (saved.append(args[4]['rows']), save(*args)))
+    requested = (('MACD', {'fastperiod': 12, 'slowperiod': 26, 'signalperiod': 9}),)
+
+    for rows in range(150, 161):
+        monkeypatch.setattr(client, '_load_history', lambda symbol, end_date=None, rows=rows: df.iloc[:rows])
+        frame = client._indicator_frame('sz000001', 'qfq', requested)
+        assert len(frame) == rows
+    assert saved == [150, 155, 160]
+
+    client.flush_indicator_states()
+    assert saved == [150, 155, 160]
+    monkeypatch.setattr(client, '_load_history', lambda symbol, end_date=None: df.iloc[:162])
+    client._indicator_frame('sz000001', 'qfq', requested)
+    client.flush_indicator_states()
+    assert saved == [150, 155, 160, 162]
+    _, checkpoint = client.indicator_states.load('sz000001', 'qfq', repr(requested))
+    assert checkpoint['rows'] == 162
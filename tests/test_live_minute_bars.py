@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from conftest import FrameProvider
+
+
+def minute_frame(times, closes, volume=100.0):
+    return pd.DataFrame({'day': pd.to_datetime(times), 'open': closes, 'high': closes, 'low': closes,
+                         'close': closes, 'volume': volume})
+
+
+def live_bar(client, time, close, volume, final=True):
+    values = np.array([[close], [close], [close], [close], [volume]], dtype=np.float64)
+    client.on_live_bars(1, ['sz000001'], np.array([time], dtype='datetime64[ns]'), values, final)
+
+
+def test_live_bars_never_replace_upstream_bars(make_client):
+    upstream = minute_frame(['2025-03-10 10:00', '2025-03-10 10:01'], [10.0, 10.1])
+    provider = FrameProvider(minute={('sz000001', 1): upstream})
+    client = make_client(provider)
+    buffer = client._minute_buffer('sz000001', 1)
+    synced_at = client._minute_buffers[('sz000001', 1)][1]
+
+    live_bar(client, '2025-03-10T10:01', 99.0, 5_000_000)
+    live_bar(client, '2025-03-10T10:02', 10.2, 900)
+    frame = buffer.to_frame()
+    assert frame.loc['2025-03-10 10:01', 'Close'] == 10.1
+    assert frame.loc['2025-03-10 10:02', 'Close'] == 10.2
+    # 实时K线不改变同步时间
+    assert client._minute_buffers[('sz000001', 1)][1] == synced_at
+
+    client.flush_live_bars()
+    stored = client.store.load('sz000001', '1min')
+    assert list(stored.index) == [pd.Timestamp('2025-03-10 10:02')]
+
+
+def test_upstream_sync_overrides_live_bars(make_client):
+    provider = FrameProvider(minute={('sz000001', 1): minute_frame(['2025-03-10 10:00'], [10.0])})
+    client = make_client(provider)
+    client._minute_buffer('sz000001', 1)
+    live_bar(client, '2025-03-10T10:01', 10.1, 900)
+    live_bar(client, '2025-03-10T10:02', 10.2, 900, final=False)
+
+    provider.minute[('sz000001', 1)] = minute_frame(['2025-03-10 10:00', '2025-03-10 10:01'], [10.0, 10.05],
+                                                    volume=1000.0)
+    buffer = client._sync_minute('sz000001', 1)
+    frame = buffer.to_frame()
+    assert list(frame['Close']) == [10.0, 10.05, 10.2]
+    assert frame.loc['2025-03-10 10:01', 'Volume'] == 1000.0
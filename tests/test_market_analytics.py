@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.compact_frame import to_compact
+from app.market_analytics import AnalyticsUnavailableError, MarketAnalytics, QueryParameterError
+from app.market_store import MarketDataStore
+from app.price_adjuster import attach_factors
+
+pytest.importorskip('duckdb')
+
+DATES = pd.bdate_range('2024-01-01', periods=80, name='Date')
+
+
+def frame(close, volume):
+    close = np.round(np.asarray(close, dtype=float), 2)
+    return pd.DataFrame({'Open': close, 'High': close + 0.1, 'Low': close - 0.1, 'Close': close,
+                         'Volume': np.asarray(volume, dtype=float)}, index=DATES)
+
+
+@pytest.fixture
+def market(tmp_path):
+    rng = np.random.default_rng(11)
+    steps = np.arange(80)
+    frames = {
+        # 稳步上涨，第40根K线除权价格减半，后复权价格连续
+        'sz000001': frame(np.where(steps < 40, 10 + steps * 0.1, (10 + steps * 0.1) / 2), 1000 + steps * 10),
+        # 横盘，最后一天放量
+        'sh600000': frame(8 + rng.normal(0, 0.05, 80), np.r_[np.full(79, 1000.0), 6000.0]),
+        # 下跌
+        'sz000002': frame(20 - steps * 0.1, rng.uniform(900, 1100, 80)),
+    }
+    factors = {'sz000001': pd.DataFrame({'hfq_factor': [1.0, 2.0]},
+                                        index=pd.DatetimeIndex(['1990-01-01', DATES[40]], name='Date'))}
+    store = MarketDataStore(str(tmp_path))
+    for symbol, df in frames.items():
+        # 紧凑格式与标准格式的文件混合存放
+        store.save(symbol, 'none', to_compact(df) if symbol == 'sz000002' else df)
+    for symbol, df in factors.items():
+        store.save(symbol, 'hfq_factor', df)
+    adjusted = {symbol: attach_factors(df, factors.get(symbol)) for symbol, df in frames.items()}
+    return MarketAnalytics(str(tmp_path)), adjusted
+
+
+def symbols(result):
+    return [row[result['columns'].index('symbol')] for row in result['rows']]
+
+
+def reference(adjusted, window, select):
+    matched = []
+    for symbol, df in adjusted.items():
+        price = (df['Close'] * df['Factor']).values
+        if select(price, df['Volume'].values, window):
+            matched.append(symbol)
+    return sorted(matched)
+
+
+def test_new_high_uses_adjusted_prices(market):
+    analytics, adjusted = market
+    result = analytics.run('new_high', {'window': '30'})
+    expected = reference(adjusted, 30, lambda price, volume, n: price[-1] > price[-n:-1].max())
+    assert sorted(symbols(result)) == expected == ['sz000001']
+
+
+def test_volume_surge(market):
+    analytics, adjusted = market
+    result = analytics.run('volume_surge', {'window': 20, 'ratio': 3})
+    expected = reference(adjusted, 20, lambda price, volume, n: volume[-1] >= volume[-n - 1:-1].mean() * 3)
+    assert sorted(symbols(result)) == expected == ['sh600000']
+    row = dict(zip(result['columns'], result['rows'][0]))
+    assert row['volume_ratio'] == 6.0 and row['date'] == DATES[-1].strftime('%Y-%m-%d')
+
+
+def test_top_return_matches_pandas(market):
+    analytics, adjusted = market
+    result = analytics.run('top_return', {'window': 10, 'volume_window': 20})
+    expected = {}
+    for symbol, df in adjusted.items():
+        price = (df['Close'] * df['Factor']).values
+        volume = df['Volume'].values
+        if volume[-1] > volume[-20:].mean():
+            expected[symbol] = round(price[-1] / price[-11] - 1, 6)
+    returns = {row[0]: row[result['columns'].index('return')] for row in result['rows']}
+    assert returns == pytest.approx(expected)
+    assert symbols(result) == sorted(expected, key=lambda symbol: -expected[symbol])
+
+
+def test_as_of_limit_and_cache(market):
+    analytics, _ = market
+    first = analytics.run('volume_surge', {'as_of': DATES[-2].strftime('%Y-%m-%d')})
+    assert first['row_count'] == 0 and not first['cached']
+    assert analytics.run('volume_surge', {'as_of': DATES[-2].strftime('%Y-%m-%d')})['cached']
+    assert analytics.run('top_return', {'window': 1, 'volume_window': 1, 'limit': 1})['row_count'] <= 1
+    assert analytics.stats()['cache_hits'] == 1
+
+
+@pytest.mark.parametrize('name, args', [
+    ('drop_table', {}),
+    ('new_high', {'window': 'abc'}),
+    ('new_high', {'window': 1}),
+    ('volume_surge', {'ratio': 1000}),
+    ('top_return', {'limit': 'x'}),
+    ('top_return', {'as_of': 'yesterday'}),
+])
+def test_rejects_invalid_parameters(market, name, args):
+    analytics, _ = market
+    with pytest.raises(QueryParameterError):
+        analytics.run(name, args)
+
+
+def test_empty_store_is_unavailable(tmp_path):
+    with pytest.raises(AnalyticsUnavailableError):
+        MarketAnalytics(str(tmp_path)).run('new_high')
+
+
+def test_api_runs_named_queries(api, monkeypatch):
+    from app import routes
+    http, client = api
+    monkeypatch.setattr(routes, 'market_analytics', MarketAnalytics(client.store.base_path))
+    http.get('/api/stock/batch?symbols=sz000001,sh600519&days=5')
+    assert 'new_high' in http.get('/api/stock/analytics').get_json()['queries']
+    # 两只股票均持续上涨
+    body = http.get('/api/stock/analytics?name=new_high&window=20').get_json()
+    assert sorted(symbols(body)) == ['sh600519', 'sz000001']
+    assert http.get('/api/stock/analytics?name=new_high&window=0').status_code == 400
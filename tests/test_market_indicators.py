@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.market_indicators import MarketIndicators
+from app.market_matrix import MarketMatrixStore
+from app.technical_indicators import TechnicalIndicators
+
+DATES = pd.bdate_range('2023-01-02', periods=260, name='Date')
+
+
+def bars(index, seed):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))), 2)
+    high = np.round(close * (1 + rng.uniform(0, 0.03, len(index))), 2)
+    low = np.round(close * (1 - rng.uniform(0, 0.03, len(index))), 2)
+    return pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close,
+                         'Volume': rng.integers(1e5, 1e7, len(index)).astype(float)}, index=index)
+
+
+@pytest.fixture
+def frames():
+    return {
+        'sz000001': bars(DATES, 1),
+        # 上市较晚
+        'sh600000': bars(DATES[100:], 2),
+        # 中间停牌
+        'sz000002': bars(DATES.delete(range(50, 80)), 3),
+        # K线不足以计算长周期指标
+        'bj830001': bars(DATES[-20:], 4),
+    }
+
+
+def test_market_indicators_match_per_symbol_talib(tmp_path, frames):
+    matrix = MarketMatrixStore(str(tmp_path)).build(frames)
+    calculator, dates, symbols = MarketIndicators.from_matrix(matrix)
+    results = calculator.calculate(None)
+    for position, symbol in enumerate(symbols):
+        df = frames[symbol]
+        expected = TechnicalIndicators.calculate_indicators(df, None)
+        rows = np.searchsorted(dates, df.index.values.astype('datetime64[D]'))
+        for column, values in results.items():
+            actual = values[rows, position]
+            reference = expected[column].values
+            assert np.array_equal(np.isnan(actual), np.isnan(reference)), (symbol, column)
+            np.testing.assert_allclose(actual, reference, rtol=1e-4, atol=1e-4, equal_nan=True,
+                                       err_msg=f'{symbol} {column}')
+            # 没有K线的日期为NaN
+            missing = np.setdiff1d(np.arange(len(dates)), rows)
+            assert np.isnan(values[missing, position]).all()
+
+
+def test_last_rows_only(tmp_path, frames):
+    matrix = MarketMatrixStore(str(tmp_path)).build(frames)
+    calculator, _, _ = MarketIndicators.from_matrix(matrix, start_date='2023-03-01')
+    full = calculator.calculate({'MA': {'periods': [5]}, 'RSI': {}})
+    last = calculator.calculate({'MA': {'periods': [5]}, 'RSI': {}}, last=3)
+    for column in full:
+        np.testing.assert_array_equal(last[column], full[column][-3:])
+
+
+def test_client_scan_slices_market_indicators(api):
+    http, client = api
+    for symbol in ('sz000001', 'sh600519'):
+        client.get_stock_data(symbol)
+    requested = ['MA', 'RSI']
+    start = str(client.open_market_matrix(build=True).dates[-120])
+    dates, symbols, results = client.get_market_indicators(requested, start_date=start, last=3)
+
+    calculator, all_dates, all_symbols = MarketIndicators.from_matrix(client.open_market_matrix(), start)
+    expected = calculator.calculate(requested)
+    assert list(symbols) == list(all_symbols) == ['sh600519', 'sz000001']
+    assert list(dates) == list(all_dates[-3:])
+    assert set(results) == set(expected)
+    for column, values in results.items():
+        np.testing.assert_array_equal(values, expected[column][-3:])
+
+    body = http.get(f'/api/stock/scan?indicators=MA,RSI&start_date={start}&limit=3').get_json()
+    assert body['dates'] == [str(date) for date in dates] and body['symbols'] == list(symbols)
+    np.testing.assert_allclose(np.array(body['data']['RSI'], dtype=float), results['RSI'], rtol=1e-4)
+    assert http.get('/api/stock/scan?indicators=BOGUS').status_code == 400
+    assert http.get('/api/stock/scan?limit=abc').status_code == 400
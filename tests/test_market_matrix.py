@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from app.market_matrix import MarketMatrixStore
+
+DATES = pd.bdate_range('2023-01-02', periods=260, name='Date')
+
+
+def bars(index, seed):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))), 2)
+    high = np.round(close * (1 + rng.uniform(0, 0.03, len(index))), 2)
+    low = np.round(close * (1 - rng.uniform(0, 0.03, len(index))), 2)
+    return pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close,
+                         'Volume': rng.integers(1e5, 1e7, len(index)).astype(float)}, index=index)
+
+
+@pytest.fixture
+def frames():
+    return {
+        'sz000001': bars(DATES, 1),
+        # 上市较晚
+        'sh600000': bars(DATES[100:], 2),
+        # 中间停牌
+        'sz000002': bars(DATES.delete(range(50, 80)), 3),
+        # K线不足以计算长周期指标
+        'bj830001': bars(DATES[-20:], 4),
+    }
+
+
+def test_build_matches_pandas_pivot(tmp_path, frames):
+    store = MarketMatrixStore(str(tmp_path))
+    assert store.open() is None
+    matrix = store.build(frames)
+    expected = pd.concat({symbol: df['Close'] for symbol, df in frames.items()}, axis=1).sort_index(axis=1)
+    assert list(matrix.symbols) == list(expected.columns)
+    assert (matrix.dates == expected.index.values.astype('datetime64[D]')).all()
+    np.testing.assert_array_equal(matrix['close'], expected.values.astype(np.float32))
+    assert matrix['close'].dtype == np.float32 and matrix['volume'].dtype == np.float64
+
+    rows = matrix.date_range('2023-06-01', '2023-06-30')
+    assert (matrix.dates[rows] == expected.loc['2023-06'].index.values.astype('datetime64[D]')).all()
+    assert matrix.symbol_position('sz000002') == list(expected.columns).index('sz000002')
+
+
+def test_rebuild_switches_version(tmp_path, frames):
+    store = MarketMatrixStore(str(tmp_path))
+    first = store.build(frames)
+    second = store.build({'sz000001': frames['sz000001']})
+    assert store.open().path == second.path
+    assert list(store.open().symbols) == ['sz000001']
+    # 被替换的版本保留到下一次构建，之后才删除
+    assert os.path.exists(first.path)
+    third = store.build(frames)
+    assert not os.path.exists(first.path)
+    assert os.path.exists(second.path) and store.open().path == third.path
+
+
+def test_rebuild_keeps_incomplete_versions(tmp_path, frames):
+    store = MarketMatrixStore(str(tmp_path))
+    store.build(frames)
+    # 其他进程正在写入、尚未写完成标记的版本
+    building = tmp_path / 'vbuilding0000'
+    building.mkdir()
+    store.build(frames)
+    store.build(frames)
+    assert building.exists()
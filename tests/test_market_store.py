@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+from app.market_store import MarketDataStore
+from app.trading_calendar import TradingCalendar
+from conftest import FrameProvider, daily_frame
+
+
+@pytest.fixture
+def history():
+    dates = pd.bdate_range(end=TradingCalendar().latest_closed_session(), periods=60)
+    return daily_frame(dates, 10.0 + pd.Series(range(60)) * 0.1)
+
+
+def daily_calls(provider):
+    return [call for call in provider.calls if call[0] == 'daily']
+
+
+def test_save_load_round_trip(tmp_path):
+    store = MarketDataStore(str(tmp_path))
+    df = pd.DataFrame({'Close': [1.0, 2.0]}, index=pd.DatetimeIndex(['2024-01-03', '2024-01-02'], name='Date'))
+    store.save('sz000001', 'none', df)
+    loaded = store.load('sz000001', 'none')
+    assert list(loaded.index) == sorted(df.index)
+    assert store.list_symbols() == ['sz000001']
+    assert store.load('sz000002', 'none') is None
+
+
+def test_symbol_cannot_escape_store_directory(tmp_path):
+    store = MarketDataStore(str(tmp_path / 'market'))
+    df = pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2024-01-02'], name='Date'))
+    for symbol in ('../../x', 'sz000001/../x', ''):
+        with pytest.raises(ValueError):
+            store.save(symbol, 'none', df)
+        with pytest.raises(ValueError):
+            store.load(symbol, 'none')
+    assert list(tmp_path.iterdir()) == [tmp_path / 'market']
+
+
+def test_is_fresh_uses_last_bar_date():
+    df = pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2024-01-05'], name='Date'))
+    assert MarketDataStore.is_fresh(df, pd.Timestamp('2024-01-05'))
+    assert not MarketDataStore.is_fresh(df, pd.Timestamp('2024-01-08'))
+    assert not MarketDataStore.is_fresh(df.iloc[:0], pd.Timestamp('2024-01-05'))
+
+
+def test_merge_prefers_fresh_rows():
+    index = pd.DatetimeIndex(['2024-01-02', '2024-01-03', '2024-01-04'], name='Date')
+    stored = pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=index)
+    fresh = pd.DataFrame({'Close': [30.0, 4.0]}, index=index[2:].append(pd.DatetimeIndex(['2024-01-05'])))
+    merged = MarketDataStore.merge(stored, fresh)
+    assert merged['Close'].tolist() == [1.0, 2.0, 30.0, 4.0]
+    assert MarketDataStore.merge(None, fresh) is fresh
+    assert MarketDataStore.merge(stored, None) is stored
+
+
+def test_first_sync_downloads_full_history(make_client, history):
+    provider = FrameProvider(daily={'sz000001': history})
+    client = make_client(provider)
+    df = client.get_stock_data('sz000001', start_date='2000-01-01', adjust='none')
+    assert len(df) == 60
+    assert daily_calls(provider) == [('daily', 'sz000001', None)]
+    assert client.store.load('sz000001', 'none') is not None
+
+
+def test_fresh_store_skips_download(make_client, history):
+    make_client(FrameProvider(daily={'sz000001': history})).get_stock_data('sz000001')
+    # 新进程：内存缓存为空，本地存储已包含最近交易日
+    provider = FrameProvider(daily={'sz000001': history})
+    df = make_client(provider).get_stock_data('sz000001', start_date='2000-01-01', adjust='none')
+    assert len(df) == 60
+    assert daily_calls(provider) == []
+
+
+def test_stale_store_fetches_only_after_last_date(make_client, history):
+    make_client(FrameProvider(daily={'sz000001': history.iloc[:55]})).get_stock_data('sz000001')
+    provider = FrameProvider(daily={'sz000001': history})
+    df = make_client(provider).get_stock_data('sz000001', start_date='2000-01-01', adjust='none')
+    last_stored = pd.Timestamp(history['date'].iloc[54])
+    assert daily_calls(provider) == [('daily', 'sz000001', last_stored)]
+    assert len(df) == 60
+    assert df['Close'].iloc[-1] == pytest.approx(history['close'].iloc[-1])
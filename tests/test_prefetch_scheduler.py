@@ -0,0 +1,24 @@
+import pandas as pd
+from conftest import FrameProvider, daily_frame
+from app.prefetch_scheduler import PrefetchScheduler
+from app.trading_calendar import TradingCalendar
+
+INDICES = ['sh000001', 'sz399001', 'sz399006', 'sh000300', 'sh000016', 'sh000905', 'sh000852']
+
+
+def test_run_once_refreshes_universe_and_prefetches(make_client):
+    end = TradingCalendar().latest_closed_session()
+    dates = pd.bdate_range(end=end, periods=120)
+    stocks = pd.DataFrame({'code': ['sz000001', 'sh600519'], 'name': ['平安银行', '贵州茅台']})
+    provider = FrameProvider(daily={symbol: daily_frame(dates, 10.0 + pd.Series(range(120)) * 0.01)
+                                    for symbol in ['sz000001'] + INDICES}, stocks=stocks)
+    client = make_client(provider)
+    scheduler = PrefetchScheduler(client, symbols=['sz000001'], workers=1, min_interval=0)
+
+    result = scheduler.run_once()
+    assert result['universe'] == 2
+    assert result['errors'] == {}
+    assert ('stock_list',) in provider.calls
+    assert client.search_stocks('payh') == [{'code': 'sz000001', 'name': '平安银行'}]
+    assert client.cache.get('sz000001') is not None
+    assert scheduler.next_run_time() > end.to_pydatetime()
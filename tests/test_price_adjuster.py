@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app.data_providers import _normalize_factors
+from app.price_adjuster import apply_adjustment, attach_factors, normalize_adjust
+
+
+def raw_daily(count=300, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=count)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, count))), 2)
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': np.round(close * 1.001, 2),
+                         'high': np.round(close * 1.02, 2), 'low': np.round(close * 0.98, 2), 'close': close,
+                         'volume': rng.integers(100000, 1000000, count).astype(float),
+                         'amount': rng.uniform(1e6, 1e7, count)})
+
+
+def bars_of(raw):
+    bars = raw.set_index(pd.to_datetime(raw['date']).rename('Date'))[['open', 'high', 'low', 'close', 'volume']]
+    bars.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    return bars
+
+
+def test_normalize_adjust():
+    assert normalize_adjust('QFQ ') == 'qfq'
+    assert normalize_adjust('none') == normalize_adjust(None) == ''
+
+
+def test_attach_factors_uses_latest_factor_not_after_bar():
+    bars = bars_of(raw_daily(5))
+    factors = pd.DataFrame({'hfq_factor': [2.0, 3.0]},
+                           index=pd.DatetimeIndex([bars.index[1], bars.index[3]], name='Date'))
+    # 早于第一个因子的K线使用第一个因子
+    assert attach_factors(bars, factors)['Factor'].tolist() == [2.0, 2.0, 2.0, 3.0, 3.0]
+    assert attach_factors(bars, None)['Factor'].tolist() == [1.0] * 5
+
+
+def test_qfq_uses_base_factor():
+    bars = bars_of(raw_daily(3))
+    bars['Factor'] = [1.0, 1.0, 2.0]
+    qfq = apply_adjustment(bars, 'qfq')
+    assert qfq['Close'].iloc[0] == round(bars['Close'].iloc[0] / 2, 2)
+    assert qfq['Close'].iloc[-1] == bars['Close'].iloc[-1]
+    hfq = apply_adjustment(bars, 'hfq', base_factor=4.0)
+    assert hfq['Close'].iloc[-1] == round(bars['Close'].iloc[-1] * 2, 2)
+    assert 'Factor' not in apply_adjustment(bars, 'none').columns
+
+
+@pytest.mark.parametrize('adjust', ['qfq', 'hfq'])
+def test_index_without_factors_keeps_raw_prices(adjust):
+    bars = pd.DataFrame({'Open': [3021.456, 3030.112], 'High': [3040.987, 3041.305], 'Low': [3010.004, 3022.718],
+                         'Close': [3030.112, 3035.791], 'Volume': [2.1e10, 2.3e10]},
+                        index=pd.DatetimeIndex(['2024-03-01', '2024-03-04'], name='Date'))
+    adjusted = apply_adjustment(attach_factors(bars, None), adjust)
+    pd.testing.assert_frame_equal(adjusted, bars)
+    assert adjusted['Close'].iloc[-1] == 3035.791
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_sina(monkeypatch, raw, hfq):
+    """以固定的原始日线及后复权因子替换AKShare新浪日线接口的网络请求及JS解码"""
+    sina = pytest.importorskip('akshare.stock.stock_zh_a_sina')
+    latest = hfq['hfq_factor'].iloc[-1]
+    descending = hfq.iloc[::-1]
+    tables = {
+        'hfq': [{'d': d, 'f': repr(float(f))} for d, f in zip(descending['date'], descending['hfq_factor'])],
+        'qfq': [{'d': d, 'f': repr(float(latest / f))} for d, f in zip(descending['date'], descending['hfq_factor'])],
+    }
+    rows = raw.to_dict(orient='records')
+
+    def get(url, *args, **kwargs):
+        for name, data in tables.items():
+            if url.endswith(f'{name}.js'):
+                return _Response(f'var {name}=' + json.dumps({'total': len(data), 'data': data}) + '\n')
+        if 'getAmountBySymbol' in url:
+            return _Response('x([{"date":"%s","amount":"100000"}])' % raw['date'].iloc[0])
+        return _Response('var KLC_KL_0="x";')
+
+    class MiniRacer:
+        def eval(self, code):
+            pass
+
+        def call(self, name, data):
+            return [dict(row) for row in rows]
+
+    monkeypatch.setattr(sina.requests, 'get', get)
+    monkeypatch.setattr(sina.py_mini_racer, 'MiniRacer', MiniRacer)
+    return sina
+
+
+@pytest.mark.parametrize('adjust', ['qfq', 'hfq'])
+def test_local_adjustment_matches_akshare(monkeypatch, adjust):
+    raw = raw_daily()
+    dates = raw['date']
+    hfq = pd.DataFrame({'date': ['1900-01-01', dates[50], dates[180]], 'hfq_factor': [1.0, 1.0734, 1.2311]})
+    sina = fake_sina(monkeypatch, raw, hfq)
+
+    factors = _normalize_factors(sina.stock_zh_a_daily('sz000001', adjust='hfq-factor'))
+    ours = apply_adjustment(attach_factors(bars_of(raw), factors), adjust)
+    reference = sina.stock_zh_a_daily('sz000001', start_date='19000101', end_date='21000101', adjust=adjust)
+    assert len(reference) == len(ours)
+    np.testing.assert_array_equal(ours[['Open', 'High', 'Low', 'Close']].values,
+                                  reference[['open', 'high', 'low', 'close']].values.astype(float))
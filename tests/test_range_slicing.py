@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+from app.akshare_client import AKShareClient
+from app.compact_frame import from_compact, index_days, to_compact
+
+SESSIONS = pd.bdate_range('2023-12-25', '2024-01-31').drop(pd.Timestamp('2024-01-01'))
+
+
+def test_slice_range_matches_boolean_mask():
+    close = np.round(10 + np.arange(len(SESSIONS)) * 0.13, 2)
+    df = pd.DataFrame({'Open': close, 'High': close + 0.05, 'Low': close - 0.05, 'Close': close,
+                       'Volume': np.arange(len(SESSIONS)) * 100.0 + 1000}, index=SESSIONS.rename('Date'))
+    for start, end in [('2023-12-30', '2024-01-03'), ('2024-01-05', '2024-01-05'), ('2020-01-01', '2030-01-01'),
+                       ('2024-01-06', '2024-01-07')]:
+        expected = df[(df.index >= start) & (df.index <= end)]
+        sliced = AKShareClient._slice_range(df, start, end)
+        pd.testing.assert_frame_equal(sliced, expected)
+        compact = AKShareClient._slice_range(to_compact(df), start, end)
+        np.testing.assert_array_equal(compact.index.values, index_days(expected.index))
+        pd.testing.assert_frame_equal(from_compact(compact), expected, check_freq=False)
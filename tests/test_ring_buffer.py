@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.ring_buffer import BarRingBuffer
+
+
+def times(count, start='2024-01-02 09:31'):
+    return pd.date_range(start, periods=count, freq='min').values
+
+
+def bars(count):
+    return np.vstack([np.arange(count, dtype=float) + offset for offset in range(5)])
+
+
+def test_window_is_contiguous_after_wrap_around():
+    buffer = BarRingBuffer(4)
+    stamps, values = times(10), bars(10)
+    for i in range(10):
+        buffer.append(stamps[i], values[:, i])
+    assert len(buffer) == 4
+    assert buffer.last_time == stamps[-1]
+    window_times, window_values = buffer.window(3)
+    assert (window_times == stamps[-3:]).all()
+    np.testing.assert_array_equal(window_values, values[:, -3:])
+    # 窗口为内部数组的视图
+    assert window_values.base is not None
+    np.testing.assert_array_equal(buffer.window(100)[1], values[:, -4:])
+
+
+def test_extend_keeps_last_capacity_bars():
+    buffer = BarRingBuffer(5)
+    buffer.extend(times(3), bars(3))
+    stamps, values = times(12, '2024-01-02 10:00'), bars(12)
+    buffer.extend(stamps, values)
+    frame = buffer.to_frame()
+    assert list(frame.index) == list(pd.DatetimeIndex(stamps[-5:]))
+    np.testing.assert_array_equal(frame.values.T, values[:, -5:])
+    buffer.append(times(1, '2024-01-02 11:00')[0], np.full(5, 99.0))
+    assert buffer.to_frame(2)['Close'].tolist() == [values[3, -1], 99.0]
+
+
+def test_update_last():
+    buffer = BarRingBuffer(3)
+    with pytest.raises(IndexError):
+        buffer.update_last(np.zeros(5))
+    buffer.extend(times(4), bars(4))
+    buffer.update_last(np.full(5, 7.0))
+    assert buffer.to_frame()['Close'].tolist() == [4.0, 5.0, 7.0]
+    assert BarRingBuffer(3).last_time is None
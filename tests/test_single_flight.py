@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.single_flight import SingleFlight
+
+
+def run_concurrently(flight, fn, callers=8):
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [executor.submit(flight.do, 'sz000001', leader_fn)]
+        started.wait(5)
+        futures += [executor.submit(flight.do, 'sz000001', leader_fn) for _ in range(callers - 1)]
+        # 等待其余调用方进入等待状态后再放行
+        while flight.stats()['coalesced'] < callers - 1:
+            threading.Event().wait(0.001)
+        release.set()
+        return futures
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    futures = run_concurrently(flight, lambda: calls.append(1) or 'data')
+    assert [future.result() for future in futures] == ['data'] * 8
+    assert calls == [1]
+    assert flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 7}
+
+
+def test_waiters_receive_the_leader_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    for future in run_concurrently(flight, fail, callers=4):
+        with pytest.raises(RuntimeError, match='upstream down'):
+            future.result()
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_sequential_calls_execute_again():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('a', lambda: 2) == 2
+    assert flight.stats()['executed'] == 2
@@ -0,0 +1,152 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from app.source_chain import SourceChain, SourceUnavailableError
+from app.trading_calendar import TradingCalendar
+from conftest import FrameProvider, daily_frame
+
+
+class Source:
+    """可切换成功/失败的测试接口"""
+
+    def __init__(self, result, fail=False, delay=0.0):
+        self.result = result
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('upstream error')
+        return self.result
+
+
+def test_falls_back_in_order():
+    primary, backup = Source('primary', fail=True), Source('backup')
+    chain = SourceChain('daily', [('primary', primary), ('backup', backup)], failure_threshold=5)
+    assert chain.call('sz000001') == 'backup'
+    assert primary.calls == 1
+    stats = {item['name']: item for item in chain.stats()}
+    assert stats['primary']['failures'] == 1 and stats['backup']['calls'] == 1
+
+
+def test_timeout_moves_to_next_source():
+    slow = Source('slow', delay=0.5)
+    chain = SourceChain('daily', [('slow', slow), ('fast', Source('fast'))], timeout=0.05)
+    assert chain.call() == 'fast'
+    assert '超时' in {item['name']: item for item in chain.stats()}['slow']['last_error']
+
+
+def test_unhealthy_source_is_ranked_last():
+    primary, backup = Source('primary', fail=True), Source('backup')
+    chain = SourceChain('daily', [('primary', primary), ('backup', backup)], failure_threshold=100)
+    chain.call()
+    chain.call()
+    assert [name for name, _ in chain.ordered()] == ['backup', 'primary']
+    # 未试过的备用接口不会排到可用的主接口之前
+    fresh = SourceChain('daily', [('primary', Source('primary')), ('backup', Source('backup'))])
+    fresh.call()
+    assert [name for name, _ in fresh.ordered()] == ['primary', 'backup']
+
+
+def test_breaker_opens_then_half_open_trial_recovers():
+    primary = Source('primary', fail=True)
+    chain = SourceChain('daily', [('primary', primary)], failure_threshold=2, cooldown=0.1)
+    for _ in range(2):
+        with pytest.raises(SourceUnavailableError):
+            chain.call()
+    # 熔断期间不再调用
+    with pytest.raises(SourceUnavailableError, match='熔断'):
+        chain.call()
+    assert primary.calls == 2 and chain.stats()[0]['circuit_open']
+
+    time.sleep(0.15)
+    # 冷却结束后的试探请求失败，再次熔断
+    with pytest.raises(SourceUnavailableError):
+        chain.call()
+    assert primary.calls == 3
+    with pytest.raises(SourceUnavailableError, match='熔断'):
+        chain.call()
+
+    time.sleep(0.15)
+    primary.fail = False
+    assert chain.call() == 'primary'
+    assert chain.call() == 'primary'
+    assert not chain.stats()[0]['circuit_open']
+
+
+def test_half_open_admits_one_trial():
+    chain = SourceChain('daily', [('primary', Source('primary', fail=True))], failure_threshold=1, cooldown=0.01)
+    with pytest.raises(SourceUnavailableError):
+        chain.call()
+    time.sleep(0.02)
+    stats = chain._stats['primary']
+    assert chain._acquire(stats)
+    assert not chain._acquire(stats)
+
+
+
+def test_hung_calls_only_occupy_their_own_chain():
+    hung = SourceChain('minute', [('slow', Source('slow', delay=0.3))], timeout=0.05, workers=1)
+    with pytest.raises(SourceUnavailableError, match='超时'):
+        hung.call()
+    # 唯一的线程在一个超时时长内仍被挂起的调用占用，不计入统计
+    with pytest.raises(SourceUnavailableError, match='执行线程已满'):
+        hung.call()
+    assert hung.stats()[0]['calls'] == 1
+    other = SourceChain('daily', [('fast', Source('fast'))], workers=1)
+    assert other.call() == 'fast'
+    # 挂起的调用返回后释放线程
+    time.sleep(0.3)
+    with pytest.raises(SourceUnavailableError, match='超时'):
+        hung.call()
+    assert hung.stats()[0]['calls'] == 2
+
+
+def test_callers_beyond_workers_wait_for_a_thread():
+    sina, em = Source('sina', delay=0.3), Source('em', delay=0.3)
+    chain = SourceChain('stock_daily', [('sina', sina), ('em', em)], timeout=2, workers=4)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: chain.call(), range(8)))
+    assert results == ['sina'] * 8
+    assert sina.calls == 8 and em.calls == 0
+
+
+def test_default_workers_cover_batch_pool(monkeypatch):
+    monkeypatch.delenv('SOURCE_WORKERS', raising=False)
+    monkeypatch.setenv('AKSHARE_BATCH_WORKERS', '12')
+    assert SourceChain('daily', [('fast', Source('fast'))])._executor._max_workers == 12
+
+class FactorOutageProvider(FrameProvider):
+    """日线可用、复权因子接口故障的数据源"""
+
+    factors_down = True
+
+    def fetch_factors(self, symbol):
+        self.calls.append(('factors', symbol))
+        if self.factors_down:
+            raise SourceUnavailableError('factors 所有数据源均不可用')
+        return self.factors.get(symbol)
+
+
+def test_factor_outage_keeps_daily_bars(make_client):
+    dates = pd.bdate_range(end=TradingCalendar().latest_closed_session(), periods=30)
+    factors = pd.DataFrame({'hfq_factor': [1.0, 2.0]}, index=pd.DatetimeIndex(['1900-01-01', dates[10]], name='Date'))
+    provider = FactorOutageProvider(daily={'sz000001': daily_frame(dates, range(10, 40))},
+                                    factors={'sz000001': factors})
+    client = make_client(provider)
+    df = client.get_stock_data('sz000001', start_date='2000-01-01', adjust='hfq')
+    # 新股票没有本地因子时按不复权返回
+    assert len(df) == 30 and df['Close'].iloc[-1] == 39
+
+    # 因子恢复后，日线已是最新也会重新获取因子
+    provider.factors_down = False
+    client.cache.invalidate('sz000001')
+    df = client.get_stock_data('sz000001', start_date='2000-01-01', adjust='hfq')
+    assert df['Close'].iloc[-1] == 78
+    assert [call[0] for call in provider.calls] == ['daily', 'factors', 'factors']
+    assert client.store.load('sz000001', 'hfq_factor') is not None
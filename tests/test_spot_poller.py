@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from app.data_providers import SPOT_COLUMNS
+from app.spot_poller import SpotQuotePoller
+
+
+class SpotProvider:
+    """返回测试设置的当前行情快照的数据源"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def fetch_spot(self, symbols):
+        return self.snapshot[self.snapshot.index.isin(symbols)]
+
+
+def quotes(prices):
+    rows = {symbol: [price, 0, 0, price, price, price, price, 100, 1000] for symbol, price in prices.items()}
+    return pd.DataFrame.from_dict(rows, orient='index', columns=SPOT_COLUMNS)
+
+
+def test_poll_pushes_only_changed_subscribed_quotes():
+    provider = SpotProvider(quotes({'sz000001': 10.0, 'sh600519': 100.0}))
+    poller = SpotQuotePoller(provider, interval=3600, idle_interval=3600)
+    first = poller.subscribe(['sz000001'])
+    second = poller.subscribe(['sh600519'])
+    assert set(first.get(timeout=5)) == {'sz000001'}
+    assert set(second.get(timeout=5)) == {'sh600519'}
+    # 一次上游请求覆盖所有订阅的代码，只推送有变化的行情
+    provider.snapshot = quotes({'sz000001': 10.1, 'sh600519': 100.0})
+    poller.poll(['sh600519', 'sz000001'])
+    assert first.get(timeout=5)['sz000001']['price'] == 10.1
+    assert second.get(timeout=0) == {}
+
+    poller.unsubscribe(first)
+    poller.unsubscribe(second)
+    assert poller.stats()['symbols'] == 0
+
+
+@pytest.mark.parametrize('query', ['symbols=', 'symbols=sz000001%26list%3Dx', 'symbols=SZ000001,foo'])
+def test_stream_rejects_bad_symbols(api, query):
+    http, _ = api
+    response = http.get(f'/api/stock/stream?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,84 @@
+import pandas as pd
+
+
+def dates(response):
+    return [row['Date'][:10] for row in response.get_json()['data']]
+
+
+def test_since_appends_daily_bars(api):
+    http, _ = api
+    full = dates(http.get('/api/stock/data?symbol=sz000001&days=10'))
+    response = http.get(f'/api/stock/data?symbol=sz000001&days=10&since={full[-4]}')
+    assert response.get_json()['delta'] == 'append'
+    assert dates(response) == full[-3:]
+
+
+def test_since_replaces_partial_week(api):
+    http, _ = api
+    full = http.get('/api/stock/data?symbol=sz000001&days=10&period=weekly').get_json()['data']
+    # 客户端的最后一根周线截止于上周中间某天
+    last_week = pd.Timestamp(full[-2]['Date'])
+    since = (last_week - pd.Timedelta(days=last_week.weekday()) + pd.Timedelta(days=2)).strftime('%Y-%m-%d')
+    body = http.get(f'/api/stock/data?symbol=sz000001&days=10&period=weekly&since={since}').get_json()
+    assert body['delta'] == 'replace_last'
+    assert body['data'] == full[-2:]
+
+
+def test_since_polls_minute_bars_within_the_same_day(api):
+    http, client = api
+    today = pd.Timestamp.today().normalize()
+    times = today + pd.to_timedelta([9 * 60 + 31 + i for i in range(5)], unit='min')
+    client.provider.minute[('sz000001', 1)] = pd.DataFrame({
+        'day': times, 'open': 10.0, 'high': 10.0, 'low': 10.0, 'close': 10.0 + pd.Series(range(5)) * 0.01,
+        'volume': 100.0})
+    query = {'symbol': 'sz000001', 'period': '1min', 'adjust': 'none', 'days': 10}
+    # 只给日期时返回当天全部分钟线
+    body = http.get('/api/stock/data', query_string={**query, 'since': f'{today:%Y-%m-%d}'}).get_json()
+    assert body['delta'] == 'append' and len(body['data']) == 5
+    # 以客户端最后一根K线的时间轮询，只返回其后的分钟线
+    since = body['data'][2]['Date']
+    body = http.get('/api/stock/data', query_string={**query, 'since': since}).get_json()
+    assert body['delta'] == 'append'
+    assert [row['Date'] for row in body['data']] == [f'{t:%Y-%m-%d %H:%M:%S}' for t in times[3:]]
+    assert http.get('/api/stock/data', query_string={**query, 'since': 'garbage'}).status_code == 400
+
+def test_since_beyond_days_resets(api):
+    http, _ = api
+    full = dates(http.get('/api/stock/data?symbol=sz000001&days=5'))
+    body = http.get('/api/stock/data?symbol=sz000001&days=5&since=2000-01-01').get_json()
+    assert body['delta'] == 'reset'
+    assert [row['Date'][:10] for row in body['data']] == full
+
+
+def test_since_on_ndays_resets(api):
+    http, _ = api
+    body = http.get('/api/stock/data?symbol=sz000001&days=5&period=3d&since=2000-01-01').get_json()
+    assert body['delta'] == 'reset' and len(body['data']) == 5
+
+
+def test_etag_returns_not_modified(api):
+    http, _ = api
+    response = http.get('/api/stock/data?symbol=sz000001&days=10')
+    etag = response.headers['ETag']
+    again = http.get('/api/stock/data?symbol=sz000001&days=10', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+
+
+def test_malformed_parameters_return_400(api):
+    http, _ = api
+    assert http.get('/api/stock/data?days=abc').status_code == 400
+    assert http.get('/api/stock/data?since=2024-13-45').status_code == 400
+    assert http.get('/api/stock/data?end_date=garbage').status_code == 400
+    assert http.get('/api/stock/data?start_date=2024-02-30').status_code == 400
+    assert http.get('/api/stock/chart?days=abc').status_code == 400
+    assert http.get('/api/stock/chart?start_date=2024-02-30').status_code == 400
+    assert http.get('/api/stock/chart?end_date=garbage').status_code == 400
+
+
+def test_symbol_is_validated_on_every_route(api):
+    http, _ = api
+    for url in ('/api/stock/data', '/api/stock/chart', '/api/stock/quality'):
+        assert http.get(f'{url}?symbol=../../x').status_code == 400
+    assert http.post('/stock/kline', data={'symbol': '../../x'}).status_code == 400
+    # 大写代码按小写处理
+    assert http.get('/api/stock/data?symbol=SZ000001&days=5').get_json()['symbol'] == 'sz000001'
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from app.stock_universe import StockUniverse, pinyin_initials
+
+STOCKS = pd.DataFrame({'code': ['sz000001', 'sz000002', 'sh600000', 'sh600519'],
+                       'name': ['平安银行', '万科A', '浦发银行', '贵州茅台']})
+
+
+@pytest.fixture
+def universe(tmp_path):
+    fetches = []
+    universe = StockUniverse(str(tmp_path), lambda: fetches.append(1) or STOCKS,
+                             extra=pd.DataFrame({'code': ['sh000001'], 'name': ['上证指数']}))
+    return universe, fetches
+
+
+def codes(results):
+    return [item['code'] for item in results]
+
+
+def test_search_by_code_name_and_initials(universe):
+    universe, _ = universe
+    assert codes(universe.search('sz00000')) == ['sz000001', 'sz000002']
+    assert codes(universe.search('6000')) == ['sh600000']
+    assert codes(universe.search('平安')) == ['sz000001']
+    # 只按前缀匹配
+    assert universe.search('银行') == []
+    assert codes(universe.search('sh000001')) == ['sh000001']
+    if pinyin_initials('平安'):
+        assert codes(universe.search('gzmt')) == ['sh600519']
+    assert len(universe.search('s', limit=2)) == 2
+    assert universe.get_name('sh600519') == '贵州茅台'
+
+
+def test_snapshot_is_reused_until_stale(universe, tmp_path):
+    universe, fetches = universe
+    universe.get_list()
+    again = StockUniverse(str(tmp_path), lambda: pytest.fail('快照未过期时不应请求上游'))
+    assert len(again.get_list()) == len(STOCKS)
+    assert fetches == [1]
+
+
+@pytest.mark.parametrize('limit, status, count', [('abc', 400, None), ('-2', 200, 1), ('1000', 200, 2)])
+def test_search_api_limit(api, limit, status, count):
+    http, client = api
+    client.universe = StockUniverse(client.store.base_path, lambda: STOCKS)
+    response = http.get(f'/api/stock/search?q=sz&limit={limit}')
+    assert response.status_code == status
+    if count is not None:
+        assert len(response.get_json()['data']) == count
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.technical_indicators import TechnicalIndicators
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(7)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, 120)))
+    return pd.DataFrame({'Open': close, 'High': close * 1.02, 'Low': close * 0.98, 'Close': close,
+                         'Volume': rng.integers(1e5, 1e6, 120).astype(float)},
+                        index=pd.bdate_range('2024-01-02', periods=120, name='Date'))
+
+
+def test_single_indicator_methods_match_calculate_indicators(df):
+    combined = TechnicalIndicators.calculate_all_indicators(df)
+    parts = pd.concat([
+        TechnicalIndicators.calculate_macd(df['Close']),
+        TechnicalIndicators.calculate_rsi(df['Close']),
+        TechnicalIndicators.calculate_bollinger_bands(df['Close']),
+        TechnicalIndicators.calculate_ma(df['Close']),
+        TechnicalIndicators.calculate_kdj(df['High'], df['Low'], df['Close']),
+    ], axis=1)
+    pd.testing.assert_frame_equal(parts, combined)
+
+
+def test_calculate_indicators_with_params(df):
+    result = TechnicalIndicators.calculate_indicators(df, {'RSI': {'period': 6}, 'MA': {'periods': [3]}})
+    assert list(result.columns) == ['RSI', 'MA3']
+    pd.testing.assert_series_equal(result['RSI'], TechnicalIndicators.calculate_rsi(df['Close'], period=6))
+    with pytest.raises(ValueError):
+        TechnicalIndicators.normalize_indicators(['VWAP'])
@@ -0,0 +1,53 @@
+import datetime
+import pandas as pd
+from app.trading_calendar import TradingCalendar
+
+# 2024年元旦（周一）休市
+SESSIONS = pd.bdate_range('2023-12-25', '2024-01-31').drop(pd.Timestamp('2024-01-01'))
+
+
+def calendar(tmp_path=None):
+    return TradingCalendar(str(tmp_path) if tmp_path else None, fetcher=lambda: SESSIONS.strftime('%Y-%m-%d'))
+
+
+def test_session_lookups():
+    cal = calendar()
+    assert not cal.is_session('2024-01-01')
+    assert cal.is_session('2024-01-02')
+    assert cal.next_session('2023-12-29') == pd.Timestamp('2024-01-02')
+    assert cal.previous_session('2024-01-02') == pd.Timestamp('2023-12-29')
+    assert len(cal.sessions_in_range('2023-12-28', '2024-01-03')) == 4
+    assert cal.session_window_start('2024-01-03', 3) == pd.Timestamp('2023-12-29')
+
+
+def test_latest_closed_session_and_trading_time():
+    cal = calendar()
+    assert cal.latest_closed_session(datetime.datetime(2024, 1, 2, 14, 59)) == pd.Timestamp('2023-12-29')
+    assert cal.latest_closed_session(datetime.datetime(2024, 1, 2, 15, 0)) == pd.Timestamp('2024-01-02')
+    assert cal.is_trading_time(datetime.datetime(2024, 1, 2, 9, 30))
+    assert not cal.is_trading_time(datetime.datetime(2024, 1, 1, 10, 0))
+    assert not cal.is_trading_time(datetime.datetime(2024, 1, 2, 15, 10))
+
+
+def test_calendar_is_cached_on_disk(tmp_path):
+    calendar(tmp_path).sessions
+    fetches = []
+    cached = TradingCalendar(str(tmp_path), fetcher=lambda: fetches.append(1))
+    assert not cached.is_session('2024-01-01')
+    assert fetches == []
+
+
+def test_fetch_failure_falls_back_to_weekdays():
+    def fail():
+        raise RuntimeError('offline')
+    cal = TradingCalendar(fetcher=fail)
+    assert cal.is_session('2024-01-01')
+    assert cal._retry_at is not None
+
+
+def test_next_session_close_skips_weekend():
+    cal = TradingCalendar()
+    # 2024-01-05 为周五
+    friday_evening = datetime.datetime(2024, 1, 5, 16, 0)
+    assert cal.next_session_close(friday_evening) == datetime.datetime(2024, 1, 8, 15, 0)
+    assert cal.next_session_close(datetime.datetime(2024, 1, 5, 10, 0)) == datetime.datetime(2024, 1, 5, 15, 0)